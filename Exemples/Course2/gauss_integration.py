@@ -0,0 +1,111 @@
+"""
+Intégration de Gauss-Legendre composite, vectorisée et distribuée
+#################################################################
+    - integrateIntervals : intègre f sur un ensemble de sous-intervalles [a_s, b_s]. Tous les points de Gauss d'un
+      paquet de sous-intervalles sont évalués en un seul appel de f sur un tableau (nsub, order) : f doit donc être
+      une fonction numpy (vectorisée) ;
+    - localRange : partage de nbItems éléments entre nbp processus, les nbItems % nbp premiers processus ont un
+      élément de plus ;
+    - refineInterval : raffinement adaptatif d'un intervalle. L'erreur d'un sous-intervalle est estimée par
+      |I_n - I_{n/2}| (formules d'ordre n et n/2) ; les sous-intervalles dont l'erreur dépasse leur part de la
+      tolérance (proportionnelle à leur longueur) sont coupés en deux ;
+    - integrate : intégrale distribuée. Une première passe uniforme est partagée statiquement entre les processus,
+      puis les sous-intervalles à raffiner (peu nombreux et concentrés là où l'intégrande n'est pas négligeable)
+      sont redistribués dynamiquement avec task_scheduler.TaskScheduler.
+"""
+from functools import lru_cache
+import numpy as np
+from numpy import polynomial
+from mpi4py import MPI
+from task_scheduler import CostModel, TaskScheduler
+
+@lru_cache(maxsize=None)
+def gaussLegendre( order : int ):
+    """ (points, poids) de Gauss-Legendre d'ordre order sur [-1;1], calculés une seule fois par ordre """
+    return polynomial.legendre.leggauss(order)
+
+def localRange( nbItems : int, nbp : int, rank : int ):
+    """ (premier élément, nombre d'éléments) du processus rank """
+    nbLoc, reste = divmod(nbItems, nbp)
+    return rank * nbLoc + min(rank, reste), nbLoc + (1 if rank < reste else 0)
+
+def integrateIntervals( f, ai, bi, quadrature, blockSize : int = 4096 ):
+    """
+    Intégrales de f sur chaque [ai[s], bi[s]] par la formule de Gauss quadrature = (points, poids) sur [-1;1].
+    Les sous-intervalles sont traités par paquets de blockSize pour borner la mémoire des tableaux (nsub, order).
+    """
+    points, weights = quadrature
+    ai = np.asarray(ai, dtype=np.double)
+    bi = np.asarray(bi, dtype=np.double)
+    integrals = np.empty(len(ai))
+    for beg in range(0, len(ai), blockSize):
+        end  = min(beg + blockSize, len(ai))
+        half = 0.5*(bi[beg:end] - ai[beg:end])
+        mid  = 0.5*(bi[beg:end] + ai[beg:end])
+        x    = mid[:, None] + half[:, None] * points[None, :]
+        integrals[beg:end] = half * f(x).dot(weights)
+    return integrals
+
+def errorEstimate( f, ai, bi, order : int ):
+    """ (intégrales d'ordre order, estimation d'erreur |I_order - I_{order/2}|) sur chaque sous-intervalle """
+    fine   = integrateIntervals(f, ai, bi, gaussLegendre(order))
+    coarse = integrateIntervals(f, ai, bi, gaussLegendre(max(order//2, 1)))
+    return fine, np.abs(fine - coarse)
+
+def refineInterval( f, a : float, b : float, order : int, tolPerLength : float, maxDepth : int = 30 ):
+    """
+    Raffinement adaptatif de [a, b] : tous les sous-intervalles d'un même niveau sont traités ensemble.
+    Retourne (intégrale, estimation d'erreur, nombre de sous-intervalles finaux).
+    """
+    ai, bi = np.array([a]), np.array([b])
+    integral = error = 0.
+    nbIntervals = 0
+    for depth in range(maxDepth + 1):
+        values, errors = errorEstimate(f, ai, bi, order)
+        accepted = (errors <= tolPerLength * (bi - ai)) | (depth == maxDepth)
+        integral += values[accepted].sum()
+        error    += errors[accepted].sum()
+        nbIntervals += int(accepted.sum())
+        if accepted.all():
+            break
+        ai, bi = ai[~accepted], bi[~accepted]
+        mi = 0.5*(ai + bi)
+        ai, bi = np.concatenate((ai, mi)), np.concatenate((mi, bi))
+    return integral, error, nbIntervals
+
+def integrate( f, a : float, b : float, nbSubIntervals : int, order : int, comm, tol : float = 0. ):
+    """
+    Intégrale de f sur [a, b] avec nbSubIntervals sous-intervalles uniformes et la formule d'ordre order.
+    Si tol > 0, les sous-intervalles dont l'erreur estimée dépasse tol*longueur/(b-a) sont raffinés : l'erreur
+    totale estimée reste alors de l'ordre de tol.
+    Retourne sur tous les processus (intégrale, erreur estimée, nombre de sous-intervalles raffinés, statistiques
+    locales : nombre de sous-intervalles traités par ce processus dans la passe uniforme et dans le raffinement).
+    """
+    h = (b - a) / nbSubIntervals
+    begSub, nbSubLoc = localRange(nbSubIntervals, comm.size, comm.rank)
+    ai = a + h*np.arange(begSub, begSub + nbSubLoc)
+    bi = ai + h
+    stats = {"uniform": nbSubLoc, "refinementTasks": 0, "refinedIntervals": 0}
+    if tol <= 0.:
+        local = integrateIntervals(f, ai, bi, gaussLegendre(order)).sum()
+        return comm.allreduce(local, op=MPI.SUM), 0., 0, stats
+
+    tolPerLength = tol / (b - a)
+    values, errors = errorEstimate(f, ai, bi, order)
+    toRefine = errors > tolPerLength * h
+    local    = np.array([values[~toRefine].sum(), errors[~toRefine].sum()])
+    # Les sous-intervalles à raffiner sont connus de tous les processus, puis distribués dynamiquement : leur coût
+    # est imprévisible (profondeur de raffinement), chaque tâche a la même taille nominale
+    starts = np.array(ai[toRefine])
+    counts = np.array(comm.allgather(len(starts)))
+    allStarts = np.empty(counts.sum())
+    comm.Allgatherv(starts, [allStarts, counts, MPI.DOUBLE])
+    scheduler = TaskScheduler(comm, np.ones(len(allStarts)), CostModel(0., 0., 1.), tailFraction=1.)
+    for iTask in scheduler.tasks():
+        integral, error, nbIntervals = refineInterval(f, allStarts[iTask], allStarts[iTask] + h, order, tolPerLength)
+        local += (integral, error)
+        stats["refinementTasks"]  += 1
+        stats["refinedIntervals"] += nbIntervals
+    scheduler.free()
+    comm.Allreduce(MPI.IN_PLACE, local, op=MPI.SUM)
+    return local[0], local[1], len(allStarts), stats
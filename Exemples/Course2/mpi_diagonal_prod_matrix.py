@@ -1,62 +1,67 @@
-from math import pi, sin, cos
+from math import pi
 import numpy as np
 import time
+import argparse
 from mpi4py import MPI
+from task_scheduler import CostModel, TaskScheduler, makespanReport
 
 twoPi : float = 2*pi
 
-def generateDiagonalBlock(  t_dim : int, t_freq : float, t_firstInd : int ):
-    ibeg : int = t_firstInd
-    iend : int = ibeg + t_dim
-    Ua = np.sin([twoPi * t_freq * iGlob for iGlob in range(ibeg,iend)])
-    Va = np.cos([twoPi * t_freq * iGlob for iGlob in range(ibeg,iend)])
+def generateFactors( t_dim : int, t_freq : float, t_firstInd : int ):
+    """ Facteurs (U, V) du bloc diagonal U.V^T : U_i = sin(2.pi.freq.i), V_i = cos(2.pi.freq.i), i indice global """
+    angles = twoPi * t_freq * np.arange(t_firstInd, t_firstInd + t_dim)
+    return np.sin(angles), np.cos(angles)
+
+def generateDiagonalBlock(  t_dim : int, t_freq : float, t_firstInd : int, factored : bool = False ):
+    U, V = generateFactors(t_dim, t_freq, t_firstInd)
+    if factored:
+        return U, V
     # Génère le block diagonal :
-    B = np.outer(Ua, Va)
-    return B
+    return np.outer(U, V)
+
+def productOfBlocks( Aii, Bii ):
+    """
+    Produit de deux blocs diagonaux. Sous forme factorisée (U, V), C_ii = (Va^{T}.Ub) Ua.Vb^{T}
+    ne coûte que O(n) : le résultat est encore un couple de facteurs (s.Ua, Vb).
+    """
+    if isinstance(Aii, tuple):
+        return Aii[1].dot(Bii[0]) * Aii[0], Bii[1]
+    return Aii.dot(Bii)
+
+def applyBlock( block, X ):
+    """ block.X pour un bloc plein ou factorisé (U, V) : U.(V^{T}.X) """
+    if isinstance(block, tuple):
+        return np.outer(block[0], block[1].dot(X))
+    return block.dot(X)
 
 def verifyBlockOfC(indFirstRow : int, freqA : float, freqB : float,
-                   Cii):
-    dim : int = Cii.shape[0]
-    ibeg = indFirstRow
-    iend = indFirstRow + dim
-    # Calcul de s = V_a^{T}.U_b
-    icos = np.cos([twoPi * freqA * iGlob for iGlob in range(ibeg, iend)])
-    jsin = np.sin([twoPi * freqB * iGlob for iGlob in range(ibeg, iend)])
-    prodScal : float = icos.dot(jsin)
-
-    jcos = prodScal * np.cos([twoPi * freqB * iGlob for iGlob in range(ibeg, iend)])
-    isin = np.sin([twoPi * freqA * iGlob for iGlob in range(ibeg, iend)])
-
-    V = np.outer(isin,jcos)
-    error = (Cii-V > 1.E-10)
-
-    if np.any(error):
-        print(f"Erreur dans le produit matrice-matrice : {Cii}  et matrice attendue : {V}")
+                   Cii, nbProbes : int = 3):
+    """
+    Vérification à la Freivalds : au lieu de former la matrice attendue, on compare C_ii.X et
+    (Va^{T}.Ub) Ua.(Vb^{T}.X) pour quelques vecteurs aléatoires X. Coût O(n^2) par vecteur pour un bloc
+    plein (au lieu de O(n^2) en mémoire et d'un produit tensoriel complet), O(n) pour un bloc factorisé.
+    """
+    dim : int = Cii[0].shape[0] if isinstance(Cii, tuple) else Cii.shape[0]
+    Ua, Va = generateFactors(dim, freqA, indFirstRow)
+    Ub, Vb = generateFactors(dim, freqB, indFirstRow)
+    X = np.random.standard_normal((dim, nbProbes))
+    expected = applyBlock(productOfBlocks((Ua, Va), (Ub, Vb)), X)
+    computed = applyBlock(Cii, X)
+
+    error = np.abs(computed - expected).max()
+    if error > 1.E-10 * max(np.abs(expected).max(), 1.):
+        print(f"Erreur dans le produit matrice-matrice : écart maximal {error} sur {nbProbes} vecteurs de test")
         return False
 
     return True
 
-def distribBlocks( t_dimensions, nbp : int, rank : int ):
-    weights = np.zeros(nbp, dtype=np.double)
-    # On fait un tri du tableau d'index de sorte de trier indirectement le tableau des dimensions
-    # de façon décroissante
-    sort_index = np.flip(np.argsort(t_dimensions))
-
-    indexBlock = []
-
-    # Initialisation des poids en distribuant les plus grandes dimensions sur les processus :
-    weights = t_dimensions[sort_index[0:nbp]]**3
-    print(weights)
-    indexBlock.append(sort_index[rank])
-    for p in range(nbp, len(t_dimensions)):
-        dim = t_dimensions[sort_index[p]]
-        # Recherche du poids le plus petit :
-        iterMin = np.argmin(weights)
-        weights[iterMin] += dim**3
-        if iterMin == rank:
-            indexBlock.append(sort_index[p])
-
-    return indexBlock
+parser = argparse.ArgumentParser(description="Produit de matrices diagonales par blocs")
+parser.add_argument("--factored", action="store_true",
+                    help="garde les blocs de A, B et C sous forme de facteurs (U, V) : produit en O(n) au lieu de O(n^3)")
+parser.add_argument("--probes", type=int, default=3, help="nombre de vecteurs aléatoires pour la vérification")
+parser.add_argument("--tail", type=float, default=0.1,
+                    help="fraction du coût prédit laissée à la file dynamique (0 : répartition purement statique)")
+args = parser.parse_args()
 
 nbBlocks : int   = 180
 freq1    : float = 0.125
@@ -74,45 +79,66 @@ out = open(bufferFilename, 'w')
 # Calcul des dimensions et début de blocs et partage des tâches :
 # ---------------------------------------------------------------
 dimensions = np.array([10*(iBlock+1) for iBlock in range(nbBlocks)])
-begRows    = np.zeros(nbBlocks, dtype=np.int32)
-begRows[0] = 0
-for i in range(1,nbBlocks):
-    begRows[i] = begRows[i-1] + dimensions[i]
-
-# Distributions des blocs pour optimiser l'équilibrage :
-indexLocalBlocks = distribBlocks( dimensions, nbp, rank )
-out.write(f"Distribution : {indexLocalBlocks}\n")
-
-out.write(f"Nombre de blocs locaux : {len(indexLocalBlocks)}\n")
-# Initialisation des blocs diagonaux locaux de A et B
-# ---------------------------------------------------
+begRows    = np.zeros(nbBlocks, dtype=np.int64)
+begRows[1:] = np.cumsum(dimensions[:-1])
+
+def computeBlock( index : int ):
+    """ Assemble les blocs diagonaux A_ii, B_ii et calcule C_ii. Retourne (C_ii, temps d'assemblage, temps du produit) """
+    debut = time.time()
+    Aii = generateDiagonalBlock(dimensions[index], freq1, begRows[index], args.factored)
+    Bii = generateDiagonalBlock(dimensions[index], freq2, begRows[index], args.factored)
+    milieu = time.time()
+    Cii = productOfBlocks(Aii, Bii)
+    return Cii, milieu - debut, time.time() - milieu
+
+# Modèle de coût a.n^3 + b.n^2 + c calibré sur quelques blocs, au lieu de supposer un coût en n^3
+# (en mode factorisé, le coût est dominé par n^2 ... ou par le surcoût constant). Les tailles forment une suite
+# géométrique jusqu'au plus grand bloc : un modèle ajusté sur les seuls petits blocs extrapole mal aux grands.
+# Chaque taille n'est mesurée que par un processus (voir CostModel.calibrate).
+calibrationSizes = np.unique(np.geomspace(min(40, dimensions.max()), dimensions.max(), 5).astype(np.int64))
+model = CostModel.calibrate(lambda n : productOfBlocks(generateDiagonalBlock(n, freq1, 0, args.factored),
+                                                       generateDiagonalBlock(n, freq2, 0, args.factored)),
+                            calibrationSizes, comm=comGlobal)
+# Répartition LPT calculée une seule fois sur le processus 0 et diffusée, les plus petits blocs sont distribués
+# dynamiquement
+scheduler = TaskScheduler(comGlobal, dimensions, model, tailFraction=args.tail)
+out.write(f"Modèle de coût (a, b, c) : {model.coefficients}\n")
+out.write(f"Distribution statique : {np.flatnonzero(scheduler.owners == rank).tolist()}\n")
+
+# Initialisation des blocs diagonaux locaux de A et B et calcul des blocs de C = A.B
+# ---------------------------------------------------------------------------------
 # A_ii est sous la forme U_{a}.V_{a}^{T} (produit tensoriel de deux vecteurs)
 # B_ii est sous la forme U_{b}.V_{b}^{T} (produit tensoriel de deux vecteurs)
 #
+comGlobal.Barrier()
 debut = time.time()
-nbBlocksLoc = len(indexLocalBlocks)
-A = []
-B = []
-for index in indexLocalBlocks:
-    A.append(generateDiagonalBlock(dimensions[index], freq1, begRows[index]))
-    B.append(generateDiagonalBlock(dimensions[index], freq2, begRows[index]))
-fin = time.time()
-out.write(f"Temps d'assemblage des blocs : {fin-debut} secondes\n")
-out.write(f"Nombre blocs stockés local : {len(A)} \n")
-# Calcul des blocs diagonaux de C = A.B
-debut = time.time()
+indexLocalBlocks = []
 C = []
-for iBlock in range(nbBlocksLoc):
-    C.append(A[iBlock].dot(B[iBlock]))
-fin   = time.time()
-out.write(f"Temps produit des blocs diagonaux : {fin-debut} secondes\n")
+assemblyTime = productTime = 0.
+for index in scheduler.tasks():
+    Cii, tAssembly, tProduct = computeBlock(index)
+    indexLocalBlocks.append(index)
+    C.append(Cii)
+    assemblyTime += tAssembly
+    productTime  += tProduct
+localTime = time.time() - debut
+nbBlocksLoc = len(indexLocalBlocks)
+out.write(f"Distribution (y compris la file dynamique) : {indexLocalBlocks}\n")
+out.write(f"Nombre de blocs locaux : {nbBlocksLoc}\n")
+out.write(f"Temps d'assemblage des blocs : {assemblyTime} secondes\n")
+out.write(f"Temps produit des blocs diagonaux : {productTime} secondes\n")
+report = makespanReport(scheduler, localTime)
+if rank == 0:
+    print(report)
+scheduler.free()
 
 # Vérification des blocs diagonaux calculés pour C :
 # -------------------------------------------------
 # Un bloc de C se calcul en fait comme : C_{ii} = (Va^{T}.Ub) Ua.Vb^{T}
 debut = time.time()
 for iBlock in range(nbBlocksLoc):
-    if (not verifyBlockOfC(begRows[indexLocalBlocks[iBlock]], freq1, freq2, C[iBlock])) :
-        print(f"Erreur dans le calcul du bloc numero {iBlock}")
+    if (not verifyBlockOfC(begRows[indexLocalBlocks[iBlock]], freq1, freq2, C[iBlock], args.probes)) :
+        print(f"Erreur dans le calcul du bloc numero {indexLocalBlocks[iBlock]}")
 fin = time.time()
 out.write(f"Temps pris pour la verification des blocs diagonaux de C : {fin-debut} secondes\n")
+out.close()
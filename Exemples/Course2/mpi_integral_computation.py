@@ -1,53 +1,42 @@
-from mpi4py import MPI
-from math import sin, exp
-from numpy import polynomial
-import time
-order=64
-
-def f(x : float) -> float:
-    return abs(sin(x*x))*exp(-x*x)
-
-a              : float = -100.
-b              : float = +100.
-nbSubIntervals : int   = 10_000
-h              : float = (b-a)/nbSubIntervals
-
-comGlobal = MPI.COMM_WORLD.Dup()
-nbp       = comGlobal.size
-rank      = comGlobal.rank
-
-bufferFileName = f"output{rank:03d}.txt"
-out = open(bufferFileName, 'w')
-
-# Récupération du schéma de quadrature de Gauss-Legendre d'ordre order
-#  quadrature contient deux tableaux : 
-#     quadrature[0] contient les points d'intégration (dans [-1;1])
-#     quadrature[1] contient les poids d'intégration
-quadrature = polynomial.legendre.leggauss(order)
-
-debut = time.time()
-sumLoc   : float = 0.
-nbSubLoc : int   = nbSubIntervals//nbp
-reste    : int   = nbSubIntervals%nbp
-if reste > rank :
-    nbSubLoc += 1
-# Calcul du premier intervalle concerné par le processus :
-begSub : int = rank * nbSubLoc
-if reste < rank :
-    begSub += reste
-for s in range(begSub, begSub+nbSubLoc):
-    ai : float = a + h*s
-    bi : float = ai + h
-    mi : float = 0.5*(ai+bi)
-    si : float = 0.
-    # Gauss quadrature :
-    for iGauss in range(len(quadrature[0])):
-        gi : float = mi + 0.5*h*quadrature[0][iGauss]
-        si += quadrature[1][iGauss] * f(gi)
-    si = 0.5*h*si
-    sumLoc += si
-sum : float = comGlobal.reduce(sumLoc, MPI.SUM, 0)
-fin = time.time()
-if rank == 0:
-    out.write(f"Integral_[-100;+100] sin(x*x) exp(-x*x) dx = {sum}\n")
-out.write(f"Temps pour calculer l'intégrale : {fin-debut} secondes\n")
+from mpi4py import MPI
+import numpy as np
+import time
+import argparse
+from gauss_integration import integrate
+
+def f(x):
+    """ Intégrande évaluée sur tout un tableau de points de Gauss """
+    return np.abs(np.sin(x*x))*np.exp(-x*x)
+
+parser = argparse.ArgumentParser(description="Intégrale de Gauss-Legendre composite distribuée")
+parser.add_argument("--order", type=int, default=64, help="ordre de la formule de Gauss-Legendre")
+parser.add_argument("--subintervals", type=int, default=10_000, help="nombre de sous-intervalles uniformes")
+parser.add_argument("--tol", type=float, default=0.,
+                    help="tolérance du raffinement adaptatif (ordre n comparé à n/2) ; 0 : pas de raffinement")
+args = parser.parse_args()
+
+a              : float = -100.
+b              : float = +100.
+nbSubIntervals : int   = args.subintervals
+
+comGlobal = MPI.COMM_WORLD.Dup()
+nbp       = comGlobal.size
+rank      = comGlobal.rank
+
+bufferFileName = f"output{rank:03d}.txt"
+out = open(bufferFileName, 'w')
+
+# Les sous-intervalles sont partagés en blocs contigus (les nbSubIntervals % nbp premiers processus en ont un de
+# plus) ; tous les points de Gauss d'un paquet de sous-intervalles sont évalués en un seul appel de f.
+# Avec --tol, les sous-intervalles dont l'erreur estimée est trop grande sont redistribués dynamiquement et raffinés.
+debut = time.time()
+sum, error, nbRefined, stats = integrate(f, a, b, nbSubIntervals, args.order, comGlobal, args.tol)
+fin = time.time()
+if rank == 0:
+    out.write(f"Integral_[-100;+100] sin(x*x) exp(-x*x) dx = {sum}\n")
+    if args.tol > 0.:
+        out.write(f"Erreur estimée : {error}, {nbRefined} sous-intervalles raffinés\n")
+out.write(f"Sous-intervalles uniformes locaux : {stats['uniform']}, tâches de raffinement : {stats['refinementTasks']} "
+          f"({stats['refinedIntervals']} sous-intervalles finaux)\n")
+out.write(f"Temps pour calculer l'intégrale : {fin-debut} secondes\n")
+out.close()
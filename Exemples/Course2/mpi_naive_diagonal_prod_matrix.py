@@ -1,41 +1,65 @@
-from math import pi, sin, cos
+from math import pi
 import numpy as np
 import time
+import argparse
 from mpi4py import MPI
 
 twoPi : float = 2*pi
 
-def generateDiagonalBlock(  t_dim : int, t_freq : float, t_firstInd : int ):
-    ibeg : int = t_firstInd
-    iend : int = ibeg + t_dim
-    Ua = np.sin([twoPi * t_freq * iGlob for iGlob in range(ibeg,iend)])
-    Va = np.cos([twoPi * t_freq * iGlob for iGlob in range(ibeg,iend)])
+def generateFactors( t_dim : int, t_freq : float, t_firstInd : int ):
+    """ Facteurs (U, V) du bloc diagonal U.V^T : U_i = sin(2.pi.freq.i), V_i = cos(2.pi.freq.i), i indice global """
+    angles = twoPi * t_freq * np.arange(t_firstInd, t_firstInd + t_dim)
+    return np.sin(angles), np.cos(angles)
+
+def generateDiagonalBlock(  t_dim : int, t_freq : float, t_firstInd : int, factored : bool = False ):
+    U, V = generateFactors(t_dim, t_freq, t_firstInd)
+    if factored:
+        return U, V
     # Génère le block diagonal :
-    B = np.outer(Ua, Va)
-    return B
+    return np.outer(U, V)
 
-def verifyBlockOfC(indFirstRow : int, freqA : float, freqB : float,
-                   Cii):
-    dim : int = Cii.shape[0]
-    ibeg = indFirstRow
-    iend = indFirstRow + dim
-    # Calcul de s = V_a^{T}.U_b
-    icos = np.cos([twoPi * freqA * iGlob for iGlob in range(ibeg, iend)])
-    jsin = np.sin([twoPi * freqB * iGlob for iGlob in range(ibeg, iend)])
-    prodScal : float = icos.dot(jsin)
+def productOfBlocks( Aii, Bii ):
+    """
+    Produit de deux blocs diagonaux. Sous forme factorisée (U, V), C_ii = (Va^{T}.Ub) Ua.Vb^{T}
+    ne coûte que O(n) : le résultat est encore un couple de facteurs (s.Ua, Vb).
+    """
+    if isinstance(Aii, tuple):
+        return Aii[1].dot(Bii[0]) * Aii[0], Bii[1]
+    return Aii.dot(Bii)
 
-    jcos = prodScal * np.cos([twoPi * freqB * iGlob for iGlob in range(ibeg, iend)])
-    isin = np.sin([twoPi * freqA * iGlob for iGlob in range(ibeg, iend)])
+def applyBlock( block, X ):
+    """ block.X pour un bloc plein ou factorisé (U, V) : U.(V^{T}.X) """
+    if isinstance(block, tuple):
+        return np.outer(block[0], block[1].dot(X))
+    return block.dot(X)
 
-    V = np.outer(isin,jcos)
-    error = (Cii-V > 1.E-10)
+def verifyBlockOfC(indFirstRow : int, freqA : float, freqB : float,
+                   Cii, nbProbes : int = 3):
+    """
+    Vérification à la Freivalds : au lieu de former la matrice attendue, on compare C_ii.X et
+    (Va^{T}.Ub) Ua.(Vb^{T}.X) pour quelques vecteurs aléatoires X. Coût O(n^2) par vecteur pour un bloc
+    plein (au lieu de O(n^2) en mémoire et d'un produit tensoriel complet), O(n) pour un bloc factorisé.
+    """
+    dim : int = Cii[0].shape[0] if isinstance(Cii, tuple) else Cii.shape[0]
+    Ua, Va = generateFactors(dim, freqA, indFirstRow)
+    Ub, Vb = generateFactors(dim, freqB, indFirstRow)
+    X = np.random.standard_normal((dim, nbProbes))
+    expected = applyBlock(productOfBlocks((Ua, Va), (Ub, Vb)), X)
+    computed = applyBlock(Cii, X)
 
-    if np.any(error):
-        print(f"Erreur dans le produit matrice-matrice : {Cii}  et matrice attendue : {V}")
+    error = np.abs(computed - expected).max()
+    if error > 1.E-10 * max(np.abs(expected).max(), 1.):
+        print(f"Erreur dans le produit matrice-matrice : écart maximal {error} sur {nbProbes} vecteurs de test")
         return False
 
     return True
 
+parser = argparse.ArgumentParser(description="Produit de matrices diagonales par blocs")
+parser.add_argument("--factored", action="store_true",
+                    help="garde les blocs de A, B et C sous forme de facteurs (U, V) : produit en O(n) au lieu de O(n^3)")
+parser.add_argument("--probes", type=int, default=3, help="nombre de vecteurs aléatoires pour la vérification")
+args = parser.parse_args()
+
 nbBlocks : int   = 180
 freq1    : float = 0.125
 freq2    : float = 0.0134
@@ -70,8 +94,8 @@ for iBlock in range(nbBlocks):
     locDim : int = 10*(iBlock+1)
     if iBlock == firstBlock : firstRowLoc = begRow
     if (iBlock >= firstBlock) and (iBlock < firstBlock + NBlockLoc):
-        A.append(generateDiagonalBlock(locDim, freq1, begRow))
-        B.append(generateDiagonalBlock(locDim, freq2, begRow))
+        A.append(generateDiagonalBlock(locDim, freq1, begRow, args.factored))
+        B.append(generateDiagonalBlock(locDim, freq2, begRow, args.factored))
     begRow += locDim
 fin = time.time()
 out.write(f"Temps d'assemblage des blocs : {fin-debut} secondes\n")
@@ -80,7 +104,7 @@ out.write(f"Nombre blocs stockés local : {len(A)} \n")
 debut = time.time()
 C = []
 for iBlock in range(NBlockLoc):
-    C.append(A[iBlock].dot(B[iBlock]))
+    C.append(productOfBlocks(A[iBlock], B[iBlock]))
 fin   = time.time()
 out.write(f"Temps produit des blocs diagonaux : {fin-debut} secondes\n")
 
@@ -89,8 +113,8 @@ out.write(f"Temps produit des blocs diagonaux : {fin-debut} secondes\n")
 # Un bloc de C se calcul en fait comme : C_{ii} = (Va^{T}.Ub) Ua.Vb^{T}
 debut = time.time()
 for iBlock in range(NBlockLoc):
-    if (not verifyBlockOfC(firstRowLoc, freq1, freq2, C[iBlock])) :
+    if (not verifyBlockOfC(firstRowLoc, freq1, freq2, C[iBlock], args.probes)) :
         print(f"Erreur dans le calcul du bloc numero {iBlock}")
-    firstRowLoc += C[iBlock].shape[0]
+    firstRowLoc += 10*(firstBlock+iBlock+1)
 fin = time.time()
 out.write(f"Temps pris pour la verification des blocs diagonaux de C : {fin-debut} secondes\n")
@@ -0,0 +1,154 @@
+"""
+Ordonnancement de tâches indépendantes de tailles connues
+#########################################################
+Réutilisable pour toute liste de tâches indépendantes dont on connaît la taille n (blocs diagonaux, sous-intervalles,
+...) :
+    - CostModel : modèle de coût a.n^3 + b.n^2 + c calibré par un court micro-benchmark. Les tailles mesurées sont
+      réparties entre les processus (chacune n'est mesurée qu'une fois en tout), puis les temps sont mis en commun ;
+    - lptSchedule : répartition gloutonne LPT (la tâche la plus coûteuse restante va au processus le moins chargé) ;
+    - TaskScheduler : la répartition est calculée une seule fois par le processus root puis diffusée. Les tâches
+      les plus petites (fraction tailFraction du coût prédit total) ne sont pas réparties à l'avance : elles forment
+      une file partagée dans laquelle chaque processus puise dès qu'il a fini ses tâches statiques, grâce à un
+      compteur atomique (fenêtre RMA et Fetch_and_op). Les erreurs du modèle de coût sont ainsi rattrapées en fin
+      de calcul ;
+    - makespanReport : durée prédite et mesurée du processus le plus lent.
+
+Usage :
+    model     = CostModel.calibrate(lambda n : kernel(n), sizes=(32, 64, 128, 256), comm=comm)
+    scheduler = TaskScheduler(comm, taskSizes, model)
+    for iTask in scheduler.tasks():
+        ...
+    scheduler.free()
+"""
+import heapq
+import time
+import numpy as np
+from mpi4py import MPI
+
+class CostModel:
+    """ Coût prédit (en secondes) d'une tâche de taille n : a.n^3 + b.n^2 + c """
+    def __init__(self, a : float, b : float, c : float):
+        self.coefficients = np.array([a, b, c])
+
+    def __call__(self, sizes):
+        n = np.asarray(sizes, dtype=np.double)
+        a, b, c = self.coefficients
+        return a*n**3 + b*n**2 + c
+
+    @staticmethod
+    def calibrate(kernel, sizes=(32, 64, 128, 256), repeat : int = 3, comm=None):
+        """
+        Mesure kernel(n) pour chaque taille (meilleur temps sur repeat essais, un seul essai pour la plus grande
+        taille, dont la mesure est assez longue pour être stable) et ajuste a, b, c par moindres carrés sur l'erreur
+        relative. Les coefficients négatifs (bruit de mesure) sont ramenés à zéro.
+        Avec comm, les tailles sont réparties entre les processus (la plus grande sur le processus 0, les suivantes
+        en tourniquet) et les temps mis en commun avant l'ajustement : tous obtiennent le même modèle, et le coût de
+        la calibration diminue avec le nombre de processus au lieu d'être payé par chacun.
+        """
+        sizes = np.sort(np.asarray(sizes, dtype=np.double))
+        nbp, rank = (1, 0) if comm is None else (comm.size, comm.rank)
+        times = np.zeros(len(sizes))
+        for i in range(len(sizes) - 1 - rank, -1, -nbp):
+            best = np.inf
+            for _ in range(repeat if i < len(sizes) - 1 else 1):
+                debut = time.time()
+                kernel(int(sizes[i]))
+                best = min(best, time.time() - debut)
+            times[i] = max(best, 1.E-9)
+        if comm is not None:
+            # Chaque temps n'est non nul que sur le processus qui l'a mesuré
+            comm.Allreduce(MPI.IN_PLACE, times, op=MPI.SUM)
+        X = np.column_stack((sizes**3, sizes**2, np.ones(len(sizes))))
+        coefficients = np.linalg.lstsq(X / times[:, None], np.ones(len(sizes)), rcond=None)[0]
+        return CostModel(*np.maximum(coefficients, 0.))
+
+def lptSchedule( costs, nbp : int ):
+    """
+    Longest Processing Time : tâches triées par coût décroissant, chacune donnée au processus le moins chargé.
+    Retourne (processus de chaque tâche, charge prédite de chaque processus).
+    """
+    owners = np.empty(len(costs), dtype=np.int64)
+    heap = [(0., p) for p in range(nbp)]
+    for iTask in np.argsort(costs)[::-1]:
+        load, p = heapq.heappop(heap)
+        owners[iTask] = p
+        heapq.heappush(heap, (load + costs[iTask], p))
+    loads = np.zeros(nbp)
+    np.add.at(loads, owners, costs)
+    return owners, loads
+
+class TaskScheduler:
+    """
+    Répartition LPT des tâches calculée une fois sur root et diffusée, plus une file dynamique pour les plus petites
+    tâches (environ tailFraction du coût total ; 0 pour une répartition purement statique).
+    Attributs (identiques sur tous les processus) : costs (coûts prédits), owners (-1 pour une tâche de la file),
+    predictedLoads (charge statique de chaque processus) et predictedMakespan (charge maximale si la file
+    dynamique se répartit idéalement).
+    """
+    def __init__(self, comm, sizes, model : CostModel, tailFraction : float = 0.1, root : int = 0):
+        self.comm = comm
+        self.root = root
+        nbTasks = len(sizes)
+        self.costs = model(sizes)
+        self.owners = np.empty(nbTasks, dtype=np.int64)
+        self.predictedLoads = np.empty(comm.size)
+        if comm.rank == root:
+            # Les plus petites tâches, dont le coût cumulé reste sous tailFraction du total, vont dans la file
+            order = np.argsort(self.costs)
+            nbTail = int(np.searchsorted(np.cumsum(self.costs[order]), tailFraction * self.costs.sum(), side='right'))
+            tail = order[:nbTail]
+            static = order[nbTail:]
+            self.owners[tail] = -1
+            self.owners[static], self.predictedLoads[:] = lptSchedule(self.costs[static], comm.size)
+        comm.Bcast(self.owners, root=root)
+        comm.Bcast(self.predictedLoads, root=root)
+        # File dynamique : les plus grandes tâches d'abord, pour finir par les plus courtes
+        self.tail = np.flatnonzero(self.owners == -1)
+        self.tail = self.tail[np.argsort(self.costs[self.tail])[::-1]]
+        # Prévision : la file comble les processus les moins chargés
+        loads = self.predictedLoads.copy()
+        for iTask in self.tail:
+            loads[np.argmin(loads)] += self.costs[iTask]
+        self.predictedMakespan = loads.max()
+        # Compteur partagé de la file, sur le processus root
+        self.window = MPI.Win.Allocate(8 if comm.rank == root else 0, 8, comm=comm)
+        if comm.rank == root:
+            self.window.Lock(root, MPI.LOCK_EXCLUSIVE)
+            self.window.Put(np.zeros(1, dtype=np.int64), root)
+            self.window.Unlock(root)
+        comm.Barrier()
+
+    def nextTailTask(self):
+        """ Indice de la prochaine tâche de la file (incrément atomique du compteur), None si elle est vide """
+        one  = np.ones(1, dtype=np.int64)
+        slot = np.empty(1, dtype=np.int64)
+        self.window.Lock(self.root, MPI.LOCK_SHARED)
+        self.window.Fetch_and_op(one, slot, self.root, 0, MPI.SUM)
+        self.window.Unlock(self.root)
+        return int(self.tail[slot[0]]) if slot[0] < len(self.tail) else None
+
+    def tasks(self):
+        """ Tâches à exécuter par ce processus : ses tâches statiques puis celles qu'il prend dans la file """
+        yield from np.flatnonzero(self.owners == self.comm.rank).tolist()
+        iTask = self.nextTailTask()
+        while iTask is not None:
+            yield iTask
+            iTask = self.nextTailTask()
+
+    def free(self):
+        self.window.Free()
+
+def makespanReport( scheduler : TaskScheduler, localTime : float, root : int = 0 ):
+    """
+    Rassemble sur root les temps mesurés de chaque processus et retourne un texte comparant la durée prédite
+    et la durée mesurée du processus le plus lent (None sur les autres processus).
+    """
+    times = scheduler.comm.gather(localTime, root=root)
+    if scheduler.comm.rank != root:
+        return None
+    times = np.array(times)
+    return (f"Durée prédite : {scheduler.predictedMakespan:.4f} s, mesurée : {times.max():.4f} s "
+            f"(moyenne {times.mean():.4f} s, déséquilibre max/moyenne {times.max()/max(times.mean(), 1.E-12):.3f})\n"
+            f"Charges statiques prédites : {np.round(scheduler.predictedLoads, 4).tolist()}, "
+            f"{len(scheduler.tail)} tâches dans la file dynamique\n"
+            f"Temps mesurés par processus : {np.round(times, 4).tolist()}")
@@ -1,107 +1,273 @@
 import numpy as np
 import time
 from mpi4py import MPI
-import sys
+import argparse
 from math import sqrt, log2
+import records
 
-commCubes = []
-out       = None
+out        = None
+localMerge = "linear"
 
 def sortBitonicSequence( bitonicSequence, increasingSort : bool = True ):
+    """
+    Trie sur place une séquence bitonique locale (à une rotation près : croissante puis décroissante).
+    En temps linéaire : on fait tourner la séquence pour commencer par le minimum, on la coupe au maximum
+    en une partie croissante et une partie décroissante que l'on retourne, puis on fusionne les deux séquences
+    triées (le tri stable de NumPy, timsort, détecte les deux séquences et les fusionne en O(n)).
+    """
+    if localMerge == "network":
+        return bitonicMergeNetwork(bitonicSequence, increasingSort)
     nbLocalVals = bitonicSequence.shape[0]
-    if nbLocalVals==1 : return bitonicSequence
-    if nbLocalVals==2:
-        if increasingSort:
-            if bitonicSequence[0] > bitonicSequence[1]:  bitonicSequence[0] , bitonicSequence[1] = bitonicSequence[1] , bitonicSequence[0]
-        else:
-            if bitonicSequence[0] < bitonicSequence[1]:  bitonicSequence[0] , bitonicSequence[1] = bitonicSequence[1] , bitonicSequence[0]
+    if nbLocalVals <= 1 : return bitonicSequence
+    keys = records.keys(bitonicSequence)
+    start = np.argmin(keys)
+    rotated = np.roll(bitonicSequence, -start)
+    peak = np.argmax(records.keys(rotated))
+    rotated[peak+1:] = rotated[peak+1:][::-1].copy()
+    records.local_sort(rotated, kind="stable")
+    bitonicSequence[:] = rotated if increasingSort else rotated[::-1]
+    return bitonicSequence
+# ====================================================================================================================
+def bitonicMergeNetwork( bitonicSequence, increasingSort : bool = True ):
+    """
+    Réseau de fusion bitonique : log2(n) étages de comparaisons-échanges vectorisées sur des vues (-1, 2, h)
+    du tableau, h = n/2, n/4, ..., 1. Pour un tableau simple de taille puissance de deux, chaque étage est un
+    np.minimum/np.maximum sur place. Sinon (enregistrements ou taille quelconque), on trie la permutation :
+    la séquence est complétée jusqu'à une puissance de deux par des sentinelles plus grandes que toutes les
+    valeurs, insérées juste après le maximum pour que la séquence reste bitonique.
+    """
+    nbLocalVals = bitonicSequence.shape[0]
+    if nbLocalVals <= 1 : return bitonicSequence
+    if bitonicSequence.dtype.names is None and nbLocalVals & (nbLocalVals-1) == 0:
+        h = nbLocalVals//2
+        while h >= 1:
+            stage = bitonicSequence.reshape(-1, 2, h)
+            lower = np.minimum(stage[:, 0], stage[:, 1])
+            if increasingSort:
+                np.maximum(stage[:, 0], stage[:, 1], out=stage[:, 1])
+                stage[:, 0] = lower
+            else:
+                np.maximum(stage[:, 0], stage[:, 1], out=stage[:, 0])
+                stage[:, 1] = lower
+            h //= 2
         return bitonicSequence
-    Nd2 : int = nbLocalVals//2
-    if increasingSort:
-        for i in range(Nd2):
-            if bitonicSequence[i] > bitonicSequence[Nd2+i] : bitonicSequence[i], bitonicSequence[Nd2+i] = bitonicSequence[Nd2+i], bitonicSequence[i]
-    else:
-        for i in range(Nd2):
-            if bitonicSequence[i] < bitonicSequence[Nd2+i] : bitonicSequence[i], bitonicSequence[Nd2+i] = bitonicSequence[Nd2+i], bitonicSequence[i]
-    bitonicSequence[:Nd2] = sortBitonicSequence(bitonicSequence[:Nd2], increasingSort)
-    bitonicSequence[Nd2:] = sortBitonicSequence(bitonicSequence[Nd2:], increasingSort)
+    keys = records.keys(bitonicSequence)
+    size = 1 << (nbLocalVals-1).bit_length()
+    peak = np.argmax(keys) + 1
+    keys = np.insert(keys, peak, np.full(size-nbLocalVals, keys[peak-1]))
+    perm = np.insert(np.arange(nbLocalVals), peak, np.full(size-nbLocalVals, -1))
+    sentinel = perm < 0
+    h = size//2
+    while h >= 1:
+        k, s, p = keys.reshape(-1, 2, h), sentinel.reshape(-1, 2, h), perm.reshape(-1, 2, h)
+        # Ordre (sentinelle, clé) : une sentinelle est plus grande que toute valeur
+        swap = (s[:, 0] > s[:, 1]) | ((s[:, 0] == s[:, 1]) & (k[:, 0] > k[:, 1]))
+        for stage in (k, s, p):
+            lower = np.where(swap, stage[:, 1], stage[:, 0])
+            stage[:, 1] = np.where(swap, stage[:, 0], stage[:, 1])
+            stage[:, 0] = lower
+        h //= 2
+    order = perm[:nbLocalVals] # Les sentinelles sont à la fin
+    bitonicSequence[:] = bitonicSequence[order if increasingSort else order[::-1]]
     return bitonicSequence
 # ====================================================================================================================
-def distributedSortBitonicSequence( bitonicSequence, level: int, increasingSort : bool = True ):
-    comm : MPI.Comm = commCubes[level]
-    rank = comm.rank
-    nbp  = comm.size
+def sentinelKey(dtype):
+    """ Clé plus grande (ou égale) que toute clé du type : +inf ou l'entier maximal. """
+    return np.inf if np.issubdtype(dtype, np.floating) else np.iinfo(dtype).max
+# ====================================================================================================================
+class BitonicSorter:
+    """
+    Tri bitonique distribué préparé une fois pour trier de nombreuses fois des données de même forme :
+    les sous-communicateurs de l'hypercube (commCubes[level] regroupe 2^level processus) et, pour chaque
+    niveau, un couple de requêtes persistantes Send_init/Recv_init attachées au bloc de travail sont créés
+    dans le constructeur ; un tri ne fait plus que Startall/Waitall.
+    values est trié sur place : il faut le remplir (values[:] = ...) plutôt que le remplacer.
 
-    exchgRank = rank + nbp//2 if 2*rank < nbp else rank - nbp//2
+    Nombre de processus et tailles de blocs quelconques : seuls les P premiers processus (P plus grande puissance
+    de deux inférieure ou égale à nbp) forment l'hypercube. Chaque processus rank >= P se replie sur le processus
+    rank-P, auquel il envoie ses valeurs avant le tri. Les blocs de l'hypercube doivent avoir la même taille : ils
+    sont complétés par des sentinelles (clé maximale du type, marquées par un champ 'sentinel' pour des
+    enregistrements), qui finissent en fin de tableau et sont retirées. Un Alltoallv redistribue enfin le résultat
+    pour que chaque processus retrouve un bloc de sa taille initiale. Si nbp est une puissance de deux et que tous
+    les blocs ont la même taille, on trie directement values sans repli, sentinelle ni redistribution.
+    Après sort, bytesSent contient le nombre d'octets de données envoyés par ce processus.
+    """
+    def __init__(self, comm : MPI.Comm, values):
+        self.comm   = comm
+        self.values = values
+        self.bytesSent = 0
+        nbp, rank   = comm.size, comm.rank
+        self.nbActive = 1 << (nbp.bit_length()-1)
+        self.dim      = self.nbActive.bit_length()-1
+        self.sizes    = np.array(comm.allgather(values.shape[0]), dtype=np.int64)
+        self.datatype = records.mpi_datatype(values.dtype)
+        P = self.nbActive
+        self.blockSize = max(self.sizes[r] + (self.sizes[r+P] if r+P < nbp else 0) for r in range(P))
+        self.direct = P == nbp and np.all(self.sizes == self.blockSize)
+        self.foldBuffer = None
+        if self.direct:
+            self.work = values
+        elif rank < P:
+            if values.dtype.names is None:
+                workType = values.dtype
+            else:
+                workType = np.dtype([(name, values.dtype.fields[name][0]) for name in values.dtype.names]
+                                    + [('sentinel', np.bool_)])
+            self.work = np.zeros(self.blockSize, dtype=workType)
+            if rank+P < nbp:
+                self.foldBuffer = np.empty(self.sizes[rank+P], dtype=values.dtype)
+        else:
+            self.work = None
+        self.cube = comm.Split(0 if rank < P else MPI.UNDEFINED, rank)
+        self.commCubes = [None]
+        self.requests  = [None]
+        if rank < P:
+            self.buffer  = np.empty_like(self.work)
+            workDatatype = records.mpi_datatype(self.work.dtype)
+            self.commCubes += [self.cube.Split(rank//(1<<idim), rank) for idim in range(1, self.dim)]
+            if self.dim > 0:
+                self.commCubes.append(self.cube.Dup())
+            for level in range(1, self.dim+1):
+                cube = self.commCubes[level]
+                exchgRank = cube.rank + cube.size//2 if 2*cube.rank < cube.size else cube.rank - cube.size//2
+                self.requests.append([cube.Send_init([self.work, workDatatype], exchgRank, 303),
+                                      cube.Recv_init([self.buffer, workDatatype], exchgRank, 303)])
 
-    status = MPI.Status()
-    buffer = np.empty(bitonicSequence.shape[0], dtype=np.int64)
+    def exchange(self, level : int, increasingSort : bool):
+        """ Comparaison-échange avec le processus associé au niveau level de l'hypercube. """
+        cube = self.commCubes[level]
+        MPI.Prequest.Startall(self.requests[level])
+        MPI.Request.Waitall(self.requests[level])
+        self.bytesSent += self.work.nbytes
+        # Les deux processus évaluent la même comparaison (séquence du processus de plus petit rang en premier)
+        if 2*cube.rank < cube.size:
+            lower, upper = records.compare_exchange(self.work, self.buffer)
+            self.work[:] = lower if increasingSort else upper
+        else:
+            lower, upper = records.compare_exchange(self.buffer, self.work)
+            self.work[:] = upper if increasingSort else lower
 
-    comm.Sendrecv(bitonicSequence, exchgRank, 303, buffer, exchgRank, 303, status)
+    def sortCube(self):
+        """ Tri bitonique du bloc de travail sur l'hypercube. """
+        rank = self.cube.rank
+        records.local_sort(self.work)
+        if rank%2 == 1: # Impair, on trie dans l'ordre décroissant
+            self.work[:] = np.flip(self.work)
+        for d in range(self.dim):
+            # Si rank%(2^(d+2)) < 2^{d+1} => increasing sinon decreasing
+            increasingSort = (rank%(1<<(d+2))) < (1<<(d+1))
+            for level in range(d+1, 0, -1):
+                self.exchange(level, increasingSort)
+            sortBitonicSequence(self.work, increasingSort)
 
-    if 2*rank < nbp:
-        if increasingSort:
-            bitonicSequence[:] = np.minimum(bitonicSequence, buffer)
+    def fill(self, dest, source):
+        if source.dtype.names is None:
+            dest[:] = source
         else:
-            bitonicSequence[:] = np.maximum(bitonicSequence, buffer)
-    else:
-        if increasingSort:
-            bitonicSequence[:] = np.maximum(bitonicSequence, buffer)
+            for name in source.dtype.names:
+                dest[name] = source[name]
+            dest['sentinel'] = False
+
+    def sort(self):
+        self.bytesSent = 0
+        if self.direct:
+            self.sortCube()
+            return self.values
+        rank, P = self.comm.rank, self.nbActive
+        values = self.values
+        # Repli des processus surnuméraires et complétion par des sentinelles
+        if rank >= P:
+            self.comm.Send([values, self.datatype], rank-P, 505)
+            self.bytesSent += values.nbytes
         else:
-            bitonicSequence[:] = np.minimum(bitonicSequence, buffer)
- 
-    if level > 1:
-        distributedSortBitonicSequence( bitonicSequence, level-1, increasingSort)
-    else: 
-        sortBitonicSequence( bitonicSequence, increasingSort)
-# ====================================================================================================================
+            nbOwn = values.shape[0]
+            self.fill(self.work[:nbOwn], values)
+            if self.foldBuffer is not None:
+                self.comm.Recv([self.foldBuffer, self.datatype], rank+P, 505)
+                self.fill(self.work[nbOwn:nbOwn+self.foldBuffer.shape[0]], self.foldBuffer)
+                nbOwn += self.foldBuffer.shape[0]
+            records.keys(self.work)[nbOwn:] = sentinelKey(records.keys(values).dtype)
+            if self.work.dtype.names is not None:
+                self.work['sentinel'][nbOwn:] = True
+            self.sortCube()
+        # Valeurs réelles (sans sentinelles), déjà dans l'ordre global des rangs
+        if rank >= P:
+            real = np.empty(0, dtype=values.dtype)
+        elif self.work.dtype.names is None:
+            real = self.work[:max(0, min(self.blockSize, self.sizes.sum() - rank*self.blockSize))]
+        else:
+            kept = self.work[~self.work['sentinel']]
+            real = np.empty(kept.shape[0], dtype=values.dtype)
+            for name in values.dtype.names:
+                real[name] = kept[name]
+        # Redistribution : chaque processus récupère un bloc de sa taille initiale
+        offset = self.comm.exscan(real.shape[0]) or 0
+        targets = np.concatenate(([0], np.cumsum(self.sizes)))
+        begin = np.clip(targets[:-1], offset, offset + real.shape[0])
+        end   = np.clip(targets[1:],  offset, offset + real.shape[0])
+        sendCounts = (end - begin).astype(np.int64)
+        sendDispls = (begin - offset).astype(np.int64)
+        recvCounts = np.empty(self.comm.size, dtype=np.int64)
+        self.comm.Alltoall([sendCounts, MPI.INT64_T], [recvCounts, MPI.INT64_T])
+        recvDispls = np.concatenate(([0], np.cumsum(recvCounts)[:-1])).astype(np.int64)
+        self.comm.Alltoallv([real, sendCounts, sendDispls, self.datatype],
+                            [values, recvCounts, recvDispls, self.datatype])
+        self.bytesSent += (sendCounts.sum() - sendCounts[rank]) * values.itemsize
+        return values
 
-N = 65_536
+    def free(self):
+        for requests in self.requests[1:]:
+            for request in requests:
+                request.Free()
+# ====================================================================================================================
 
-globCom = MPI.COMM_WORLD.Dup()
-nbp     = globCom.size
-rank    = globCom.rank
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tri bitonique distribué")
+    parser.add_argument("N", nargs="?", type=int, default=65_536)
+    parser.add_argument("--payload", type=int, default=0, help="nombre de colonnes float64 attachées à chaque clé")
+    parser.add_argument("--argsort", action="store_true", help="trie les indices globaux d'origine selon les clés")
+    parser.add_argument("--repeat", type=int, default=1, help="nombre de tris successifs de nouvelles données")
+    parser.add_argument("--local-merge", choices=("linear", "network"), default="linear",
+                        help="fusion locale des séquences bitoniques : découpe et fusion linéaire, ou réseau bitonique vectorisé")
+    parser.add_argument("--dump", action="store_true", help="écrit les valeurs initiales et triées dans le fichier de sortie")
+    args = parser.parse_args()
+    N = args.N
+    localMerge = args.local_merge
 
-filename = f"Output{rank:03d}.txt"
-out      = open(filename, mode='w')
+    globCom = MPI.COMM_WORLD.Dup()
+    nbp     = globCom.size
+    rank    = globCom.rank
 
-reste = N%nbp
-NLoc  = N//nbp
-if reste != 0:
-    print("Le nombre de processeur doit diviser le nombre d'éléments à trier.")
-    globCom.Abort(-1)
+    filename = f"Output{rank:03d}.txt"
+    out      = open(filename, mode='w')
 
-# Génération du tableau local de valeurs
-values = np.random.randint(-32768, 32768, size=NLoc,dtype=np.int64)
-out.write(f"Valeurs initiales : {values}\n")
+    reste = N%nbp
+    NLoc  = N//nbp + (1 if rank < reste else 0)
+    offset = rank*(N//nbp) + min(rank, reste) # Indice global de la première valeur locale
 
-# Calcul la dimension de l'hypercube :
-dim = int(log2(nbp)+0.1)
-if (1<<dim) != nbp :
-    print("Le nombre de processeur doit être une puissance de deux !")
-    globCom.Abort(-1)
-out.write(f"Dimension du cube : {dim}\n")
+    # Génération du tableau local de valeurs
+    values = records.generate(NLoc, args.payload, args.argsort, offset=offset)
+    if args.dump:
+        out.write(f"Valeurs initiales : {records.keys(values)}\n")
 
-status = MPI.Status()
-debut = time.time()
-commCubes.append(None)
-for idim in range(1, dim):
-    commCubes.append(globCom.Split(rank//(1<<idim), rank))
-commCubes.append(globCom.Dup())
-if rank%2 == 0: # Pair : on trie dans l'ordre croissant
-    values.sort()
-else: # Impair, on trie dans l'ordre décroissant
-    values.sort()
-    values[:] = np.flip(values)
-for d in range(dim):
-    # out.write(f"Avant itération {d} : {values}\n")
-    # Si rank%(2^(d+2)) < 2^{d+1} => increasing sinon decreasing
-    distributedSortBitonicSequence( values, d+1, ((rank%(1<<(d+2))) < (1<<(d+1)) ) )
-    # out.write(f"Iteration {d} : {values}\n")
-fin = time.time()
-out.write(f"Temps local pour le tri : {fin-debut} secondes\n")
-out.write(f"Première valeurs locale : {values[0]}\n")
-out.write(f"Dernière valeurs locale : {values[-1]}\n")
-out.write(f"values : {values}\n")
+    sorter = BitonicSorter(globCom, values)
+    # Dimension de l'hypercube : les processus au-delà de 2^dim se replient sur les premiers
+    out.write(f"Dimension du cube : {sorter.dim}\n")
+    elapsed = 0.
+    for repeat in range(args.repeat):
+        if repeat > 0: # Nouvelles données de même forme
+            values[:] = records.generate(NLoc, args.payload, args.argsort, offset=offset)
+        debut = time.time()
+        sorter.sort()
+        elapsed += time.time() - debut
+    sorter.free()
+    out.write(f"Temps local pour le tri : {elapsed/args.repeat} secondes\n")
+    if not records.check_payload(values):
+        out.write("Données attachées incohérentes avec les clés !\n")
+    if values.shape[0] > 0:
+        out.write(f"Première valeurs locale : {records.keys(values)[0]}\n")
+        out.write(f"Dernière valeurs locale : {records.keys(values)[-1]}\n")
+    if args.dump:
+        out.write(f"values : {records.result(values)}\n")
 
-out.close()
+    out.close()
@@ -1,93 +1,127 @@
 import numpy as np
 import time
 from mpi4py import MPI
-import sys
+import argparse
 from math import sqrt, log2
+import records
 
 out  = None
 DEBUG= 0
 
-globCom = MPI.COMM_WORLD.Dup()
-nbp     = globCom.size
-rank    = globCom.rank
-name    = MPI.Get_processor_name()
+class HyperQuickSorter:
+    """
+    Hyperquicksort sur un communicateur de 2^dim processus, préparé une fois : les sous-cubes de chaque dimension
+    sont créés dans le constructeur et les tampons de réception et de fusion sont réutilisés d'un tri à l'autre.
+    La taille du bloc local change pendant le tri : sort retourne le nouveau tableau trié.
+    Après sort, bytesSent contient le nombre d'octets de données envoyés par ce processus (hors tailles et pivots).
+    """
+    def __init__(self, comm : MPI.Comm):
+        self.comm = comm
+        self.dim  = int(log2(comm.size)+0.1)
+        if (1<<self.dim) != comm.size:
+            raise ValueError("Le nombre de processeur doit être une puissance de deux !")
+        # Sous-cubes de chaque dimension, créés une seule fois
+        self.subCubes = [comm.Split(comm.rank//(1<<(d+1)), comm.rank) for d in range(self.dim)]
+        self.recvBuffer  = None
+        self.mergeBuffer = None
+        self.bytesSent   = 0
 
-N = 256_000
+    def sort(self, values):
+        rank     = self.comm.rank
+        datatype = records.mpi_datatype(values.dtype)
+        keyType  = records.mpi_datatype(records.keys(values).dtype)
+        self.bytesSent = 0
+        # Fusions en alternance entre le tableau courant et le tampon de fusion
+        initial = values
+        mergeBuffers = [values, self.mergeBuffer]
+        records.local_sort(values)
+        for d in range(self.dim-1,-1,-1):
+            if DEBUG: out.write(f"Dimension {d}\n")
+            subCube = self.subCubes[d]
+            # Pivot : médiane des médianes locales du sous-cube (les processus sans valeur ne votent pas)
+            localKeys = records.keys(values)
+            median = np.array([localKeys[(len(values)-1)//2] if len(values) > 0 else 0], dtype=localKeys.dtype)
+            medians = np.empty(subCube.size, dtype=localKeys.dtype)
+            subCube.Allgather([median, keyType], [medians, keyType])
+            nonEmpty = np.array(subCube.allgather(len(values) > 0))
+            pivot = np.sort(medians[nonEmpty])[(np.count_nonzero(nonEmpty)-1)//2] if np.any(nonEmpty) else median[0]
+            if DEBUG: out.write(f"\tPivot : {pivot}\n"); out.flush()
+            # Partage le tableau (trié) en deux parties axées autour du pivot :
+            split = np.searchsorted(localKeys, pivot, side='right')
+            lowValues = values[:split]  # Valeurs plus petites ou égales au pivot
+            highValues = values[split:] # Valeurs plus grandes que le pivot
+            if DEBUG: out.write(f"\tlowValues = {lowValues}\n"); out.flush()
+            if DEBUG: out.write(f"\tHigh Values = {highValues}\n"); out.flush()
 
-if len(sys.argv) > 1:
-    N = int(sys.argv[1])
+            if (rank & (1<<d)) == 0:
+                partner, keptValues, sentValues = rank + (1<<d), lowValues, highValues
+            else:
+                partner, keptValues, sentValues = rank - (1<<d), highValues, lowValues
+            if DEBUG: out.write(f"\tPairing avec {partner}\n"); out.flush()
+            # Échange de la taille puis des données, envoi et réception simultanés (Sendrecv)
+            recvSize = self.comm.sendrecv(sentValues.shape[0], dest=partner, source=partner)
+            self.recvBuffer = records.reserve(self.recvBuffer, recvSize, values.dtype)
+            received = self.recvBuffer[:recvSize]
+            self.comm.Sendrecv([sentValues, datatype], dest=partner, recvbuf=[received, datatype], source=partner)
+            self.bytesSent += sentValues.nbytes
+            if DEBUG: out.write(f"\tFusion between {keptValues} and buffer {received}\n"); out.flush()
+            # Fusion linéaire dans le tampon qui ne contient pas keptValues
+            mergeBuffers[1] = records.reserve(mergeBuffers[1], keptValues.shape[0] + recvSize, values.dtype)
+            values = records.merge_into(keptValues, received, mergeBuffers[1])
+            mergeBuffers.reverse()
+            if DEBUG :
+                out.write(f"\tValues : {values}\n"); out.flush()
+        # On garde pour le tri suivant un tampon qui n'est ni le tableau d'entrée ni celui du résultat
+        self.mergeBuffer = next((buffer for buffer in mergeBuffers if buffer is not None and buffer is not initial
+                                 and not np.shares_memory(buffer, values)), None)
+        return values
+# ====================================================================================================================
 
-filename = f"Output{rank:03d}.txt"
-out      = open(filename, mode='w')
+if __name__ == "__main__":
+    globCom = MPI.COMM_WORLD.Dup()
+    nbp     = globCom.size
+    rank    = globCom.rank
+    name    = MPI.Get_processor_name()
 
-reste= N % nbp
-assert(reste == 0)
-NLoc = N//nbp
-out.write(f"Nombre de valeurs locales : {NLoc}`\n")
+    parser = argparse.ArgumentParser(description="Hyperquicksort")
+    parser.add_argument("N", nargs="?", type=int, default=256_000)
+    parser.add_argument("--payload", type=int, default=0, help="nombre de colonnes float64 attachées à chaque clé")
+    parser.add_argument("--argsort", action="store_true", help="trie les indices globaux d'origine selon les clés")
+    parser.add_argument("--dump", action="store_true", help="écrit les valeurs initiales et triées dans le fichier de sortie")
+    args = parser.parse_args()
+    N = args.N
 
-# Génération du tableau local de valeurs
-values = np.random.randint(-32768, 32768, size=NLoc,dtype=np.int64)
-out.write(f"Valeurs initiales : {values}\n")
+    filename = f"Output{rank:03d}.txt"
+    out      = open(filename, mode='w')
 
-# Calcul de la dimension de l'hypercube
-dim = int(log2(nbp)+0.1)
-if (1<<dim) != nbp :
-    print("Le nombre de processeur doit être une puissance de deux !")
-    globCom.Abort(-1)
-out.write(f"Dimension du cube : {dim}\n")
+    reste= N % nbp
+    assert(reste == 0)
+    NLoc = N//nbp
+    out.write(f"Nombre de valeurs locales : {NLoc}`\n")
 
+    # Génération du tableau local de valeurs
+    values = records.generate(NLoc, args.payload, args.argsort, offset=rank*NLoc)
+    if args.dump:
+        out.write(f"Valeurs initiales : {records.keys(values)}\n")
 
-debut = time.time()
-status = MPI.Status()
-buffer = None
-values.sort()
-for d in range(dim-1,-1,-1):
-    if DEBUG: out.write(f"Dimension {d}\n")
-    subCube = globCom.Split(rank//(1<<(d+1)), rank)
-    srank = subCube.rank
-    pivot : int = 0
-    if srank == 0:  
-        pivot = values[len(values)//2-1]
-        if DEBUG: out.write(f"\tPivot a envoyé : {pivot}\n"); out.flush()
-    pivot = subCube.bcast(pivot, 0)
-    if DEBUG: out.write(f"\tPivot récupéré : {pivot}\n"); out.flush()
-    # Partage le tableau en deux parties axées autour du pivot :
-    lowBound = values <= pivot # Masque pour les valeurs plus petites ou égales au pivot
-    highBound= values >  pivot # Masque pour les valeurs plus grandes que le pivot
-    lowValues = values[lowBound]
-    highValues = values[highBound]
-    if DEBUG: out.write(f"\tlowValues = {lowValues}\n"); out.flush()
-    if DEBUG: out.write(f"\tHigh Values = {highValues}\n"); out.flush()
+    # Calcul de la dimension de l'hypercube
+    try:
+        sorter = HyperQuickSorter(globCom)
+    except ValueError as error:
+        print(error)
+        globCom.Abort(-1)
+    out.write(f"Dimension du cube : {sorter.dim}\n")
 
-    if (rank & (1<<d)) == 0:
-        if DEBUG: out.write(f"\tPairing avec {rank+ (1<<d)}.Send\n"); out.flush()
-        globCom.Ssend([highValues,MPI.INT64_T], dest=rank + (1<<d))
-        globCom.Probe(source=rank + (1<<d), status=status)
-        recvSize = status.Get_count()//8
-        buffer = np.empty(recvSize, dtype=np.int64)
-        if DEBUG: out.write(f"\tPairing avec {rank+ (1<<d)}.Recv\n"); out.flush()
-        globCom.Recv([buffer, MPI.INT64_T], source=rank + (1<<d))
-        if DEBUG: out.write(f"\tFusion sort between {lowValues} and buffer {buffer}\n"); out.flush()
-        values = np.concatenate((buffer, lowValues))
-        values.sort(kind="mergesort")
-    else:
-        if DEBUG: out.write(f"\tPairing avec {rank-(1<<d)}.Recv.\n"); out.flush()
-        globCom.Probe(source=rank - (1<<d), status = status)
-        recvSize = status.Get_count()//8
-        buffer = np.empty(recvSize, dtype=np.int64)
-        globCom.Recv([buffer,MPI.INT64_T], source=rank-(1<<d))
-        if DEBUG: out.write(f"\tPairing avec {rank-(1<<d)}.Send.\n"); out.flush()
-        globCom.Ssend([lowValues, MPI.INT64_T],  dest=rank-(1<<d))
-        if DEBUG: out.write(f"\tFusion sort between {highValues} and buffer {buffer}\n"); out.flush()
-        values = np.concatenate((buffer, highValues))
-        values.sort(kind="mergesort")
-    if DEBUG :
-        out.write(f"\tValues : {values}\n"); out.flush()
-fin = time.time()
-out.write(f"Temps local pour le tri : {fin-debut} secondes\n")
-if values.shape[0] > 0:
-    out.write(f"Première valeurs locale : {values[0]}\n")
-    out.write(f"Dernière valeurs locale : {values[-1]}\n")
-    out.write(f"values : {values}\n")
+    debut = time.time()
+    values = sorter.sort(values)
+    fin = time.time()
+    out.write(f"Temps local pour le tri : {fin-debut} secondes\n")
+    if not records.check_payload(values):
+        out.write("Données attachées incohérentes avec les clés !\n")
+    if values.shape[0] > 0:
+        out.write(f"Première valeurs locale : {records.keys(values)[0]}\n")
+        out.write(f"Dernière valeurs locale : {records.keys(values)[-1]}\n")
+        if args.dump:
+            out.write(f"values : {records.result(values)}\n")
 
-out.close()
+    out.close()
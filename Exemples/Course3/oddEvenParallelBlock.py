@@ -1,7 +1,8 @@
 import numpy as np
 import time
 from mpi4py import MPI
-import sys
+import argparse
+from oddEvenSorter import OddEvenSorter
 
 
 globCom = MPI.COMM_WORLD.Dup()
@@ -9,10 +10,15 @@ nbp     = globCom.size
 rank    = globCom.rank
 name    = MPI.Get_processor_name()
 
-N = 360_000
-
-if len(sys.argv) > 1:
-    N = int(sys.argv[1])
+parser = argparse.ArgumentParser(description="Tri pair-impair par blocs")
+parser.add_argument("N", nargs="?", type=int, default=360_000)
+parser.add_argument("--repeat", type=int, default=1, help="nombre de tris successifs de nouvelles données")
+parser.add_argument("--perturb", type=float, default=0.,
+                    help="si > 0, les tris suivants retrient le résultat précédent dont cette fraction de valeurs est déplacée")
+parser.add_argument("--check-every", type=int, default=2, help="nombre de phases entre deux tests d'arrêt (Allreduce)")
+parser.add_argument("--dump", action="store_true", help="écrit les valeurs initiales et triées dans le fichier de sortie")
+args = parser.parse_args()
+N = args.N
 
 filename = f"Output{rank:03d}.txt"
 out      = open(filename, mode='w')
@@ -23,50 +29,32 @@ out.write(f"Nombre de valeurs locales : {NLoc}`\n")
 
 
 values = np.random.randint(-32768, 32768, size=NLoc,dtype=np.int64)
-out.write(f"Valeurs initiales : {values}\n")
+if args.dump:
+    out.write(f"Valeurs initiales : {values}\n")
 
-debut = time.time()
-values = np.sort(values)
+# Trieur préparé une fois (tampons et requêtes persistantes), réutilisé pour chaque tri
 prevNbLoc = N//nbp + (1 if reste > rank-1 else 0)
 nextNbLoc = N//nbp + (1 if reste > rank+1 else 0)
-prevBuffer = np.empty((prevNbLoc), dtype=np.int64)
-nextBuffer = np.empty((nextNbLoc), dtype=np.int64)
-status     = MPI.Status()
-for iter in range(nbp):
-    out.write(f"iter {iter}\n")
-    if iter%2 == 1: # Si iter est impair
-        if rank%2 == 0:
-            if rank > 0:
-                globCom.Recv([prevBuffer,MPI.INT64_T], rank-1, status=status )
-                globCom.Ssend([values,MPI.INT64_T], rank-1)
-                fusion = np.concatenate((prevBuffer, values))
-                fusion.sort(kind="mergesort")
-                values = fusion[-NLoc:] # On garde la partie supérieure
-        elif rank<nbp-1: #rank est impair
-            globCom.Ssend([values,MPI.INT64_T], rank+1)
-            globCom.Recv([nextBuffer,MPI.INT64_T], rank+1, status=status)
-            fusion = np.concatenate((values,nextBuffer))
-            fusion.sort(kind="mergesort")
-            values = fusion[:NLoc] # On garde la partie inférieure
-    else: # Si iter est pair
-        if rank%2 ==0:
-            if rank < nbp-1:
-                globCom.Recv([nextBuffer,MPI.INT64_T], rank+1, status=status)
-                globCom.Ssend([values,MPI.INT64_T], rank+1)
-                fusion = np.concatenate((values, nextBuffer))
-                fusion.sort(kind="mergesort")
-                values = fusion[:NLoc] # On garde la partie inférieure
-        else:
-            globCom.Ssend([values,MPI.INT64_T], rank-1)
-            globCom.Recv([prevBuffer,MPI.INT64_T], rank-1, status=status )
-            fusion = np.concatenate((prevBuffer, values))
-            fusion.sort(kind="mergesort")
-            values = fusion[-NLoc:] # On garde la partie supérieure
-fin = time.time()
+sorter = OddEvenSorter(globCom, values, prevNbLoc, nextNbLoc, args.check_every)
+elapsed = 0.
+for repeat in range(args.repeat):
+    if repeat > 0 and args.perturb > 0: # Données presque triées : quelques valeurs déplacées localement
+        moved = np.random.choice(NLoc, int(args.perturb*NLoc), replace=False)
+        values[moved] = values[np.random.permutation(moved)]
+    elif repeat > 0: # Nouvelles données de même forme
+        values[:] = np.random.randint(-32768, 32768, size=NLoc,dtype=np.int64)
+    debut = time.time()
+    values.sort()
+    sorter.sort()
+    elapsed += time.time() - debut
+    out.write(f"Tri {repeat} : {sorter.phases} phases sur {nbp}, {sorter.exchanges} échanges de blocs\n")
 assert(len(values) == NLoc)
-out.write(f"Temps local pour le tri : {fin-debut} secondes\n")
-out.write(f"Première valeurs locale : {values[0]}\n")
-out.write(f"Dernière valeurs locale : {values[-1]}\n")
-out.write(f"values : {values}\n")
+sorter.free()
+out.write(f"Temps local pour le tri : {elapsed/args.repeat} secondes\n")
+if NLoc > 0:
+    out.write(f"Première valeurs locale : {values[0]}\n")
+    out.write(f"Dernière valeurs locale : {values[-1]}\n")
+if args.dump:
+    out.write(f"values : {values}\n")
 
 out.close()
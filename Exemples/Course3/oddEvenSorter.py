@@ -0,0 +1,121 @@
+"""
+Tri pair-impair par blocs préparé une fois pour toutes
+######################################################
+Quand on trie de nombreuses fois des données de même forme, on évite de recréer à chaque phase tampons et
+communications : les tampons de réception et les requêtes persistantes (Send_init/Recv_init) vers les deux
+voisins sont créés une fois, chaque phase ne fait plus que Startall/Waitall.
+Chaque échange est suivi d'une fusion-partage (records.merge_split) qui ne calcule que la moitié conservée au
+lieu de concaténer et retrier les deux blocs.
+
+Arrêt anticipé : avant d'envoyer son bloc, chaque paire échange seulement la valeur de bord (dernière valeur du
+bloc de gauche, première du bloc de droite). Si elles sont dans l'ordre, l'échange ne changerait rien et il
+est sauté. Toutes les checkEvery phases, un Allreduce indique si un échange a eu lieu ; si aucune paire n'a
+échangé pendant deux phases consécutives (une paire, une impaire), tous les bords sont ordonnés et les blocs
+sont triés : le tableau est trié et on s'arrête. Pour des données presque triées, quelques phases suffisent.
+"""
+import numpy as np
+from mpi4py import MPI
+import records
+
+class OddEvenSorter:
+    """
+    Tri pair-impair par blocs du tableau values sur le communicateur comm (ordre croissant selon le rang).
+        - values est le tableau trié sur place ; les requêtes persistantes y sont attachées, il faut donc
+          remplir values[:] avec de nouvelles données plutôt que de le remplacer
+        - prevSize et nextSize sont les tailles des blocs des voisins (par défaut, récupérées par un allgather :
+          les blocs peuvent avoir des tailles différentes, chacun garde la sienne)
+        - checkEvery est le nombre de phases entre deux tests de convergence (au moins 2)
+    Plusieurs trieurs (communicateurs ligne et colonne par exemple) peuvent partager le même tableau values.
+    Après sort, phases contient le nombre de phases effectuées, exchanges le nombre d'échanges de blocs locaux et
+    bytesSent le nombre d'octets de données envoyés par ce processus (hors messages de contrôle : bords, Allreduce).
+    """
+    def __init__(self, comm : MPI.Comm, values, prevSize=None, nextSize=None, checkEvery=2, tag=404):
+        self.comm   = comm
+        self.values = values
+        self.merged = np.empty_like(values)
+        self.checkEvery = max(checkEvery, 2)
+        self.phases    = 0
+        self.exchanges = 0
+        self.bytesSent = 0
+        rank, nbp   = comm.rank, comm.size
+        datatype    = records.mpi_datatype(values.dtype)
+        if prevSize is None or nextSize is None:
+            sizes = comm.allgather(values.shape[0])
+            prevSize = sizes[rank-1] if prevSize is None and rank > 0 else prevSize
+            nextSize = sizes[rank+1] if nextSize is None and rank < nbp-1 else nextSize
+        # Valeur de bord envoyée au voisin, avec la taille du bloc (un bloc vide n'a pas de bord)
+        boundaryType  = np.dtype([('key', records.keys(values).dtype), ('size', np.int64)])
+        self.boundary = np.zeros(1, dtype=boundaryType)
+        self.buffers    = {}
+        self.requests   = {}
+        self.neighbours = {}
+        self.boundaryRequests = {}
+        for side, neighbour, size in ((-1, rank-1, prevSize), (1, rank+1, nextSize)):
+            if 0 <= neighbour < nbp:
+                buffer = np.empty(size, dtype=values.dtype)
+                self.buffers[side]  = buffer
+                self.requests[side] = [comm.Send_init([values, datatype], neighbour, tag),
+                                       comm.Recv_init([buffer, datatype], neighbour, tag)]
+                self.neighbours[side] = np.zeros(1, dtype=boundaryType)
+                self.boundaryRequests[side] = [
+                    comm.Send_init([self.boundary, records.mpi_datatype(boundaryType)], neighbour, tag+1),
+                    comm.Recv_init([self.neighbours[side], records.mpi_datatype(boundaryType)], neighbour, tag+1)]
+
+    def partner(self, iteration):
+        """ -1 (voisin précédent), 1 (voisin suivant) ou None si le processus est inactif pendant cette phase """
+        side = 1 if (iteration + self.comm.rank) % 2 == 0 else -1
+        return side if side in self.requests else None
+
+    def phase(self, iteration):
+        """
+        Phase d'échange numéro iteration (paires (pair, impair) si iteration est pair, (impair, pair) sinon).
+        Retourne True si les blocs ont été échangés (les données ont changé).
+        """
+        side = self.partner(iteration)
+        if side is None:
+            return False
+        # Échange des seules valeurs de bord : les deux processus prennent la même décision
+        keys = records.keys(self.values)
+        self.boundary['size'] = keys.shape[0]
+        if keys.shape[0] > 0:
+            self.boundary['key'] = keys[-1] if side == 1 else keys[0]
+        MPI.Prequest.Startall(self.boundaryRequests[side])
+        MPI.Request.Waitall(self.boundaryRequests[side])
+        low, high = (self.boundary, self.neighbours[side]) if side == 1 else (self.neighbours[side], self.boundary)
+        if low['size'][0] == 0 or high['size'][0] == 0 or low['key'][0] <= high['key'][0]:
+            return False
+        MPI.Prequest.Startall(self.requests[side])
+        MPI.Request.Waitall(self.requests[side])
+        if side == 1: # On garde la partie inférieure
+            records.merge_split(self.values, self.buffers[side], True, self.merged)
+        else:         # On garde la partie supérieure
+            records.merge_split(self.buffers[side], self.values, False, self.merged)
+        self.values[:] = self.merged
+        self.exchanges += 1
+        self.bytesSent += self.values.nbytes
+        return True
+
+    def sort(self):
+        """
+        Les blocs locaux doivent être triés. Avec des blocs de même taille, nbp phases suffisent ; avec des tailles
+        différentes ce n'est plus garanti, on continue donc jusqu'au test d'arrêt (qui prouve que tout est trié).
+        Retourne True si des données ont été échangées (sur au moins un processus du communicateur).
+        """
+        self.phases, self.exchanges, self.bytesSent = 0, 0, 0
+        changed = False
+        recent  = False
+        while True:
+            recent = self.phase(self.phases) or recent
+            self.phases += 1
+            if self.phases % self.checkEvery == 0:
+                recent = self.comm.allreduce(recent, op=MPI.LOR)
+                changed = changed or recent
+                if not recent:
+                    break
+                recent = False
+        return changed
+
+    def free(self):
+        for requests in list(self.requests.values()) + list(self.boundaryRequests.values()):
+            for request in requests:
+                request.Free()
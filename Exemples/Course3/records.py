@@ -0,0 +1,165 @@
+"""
+Tri d'enregistrements
+#####################
+Les tris distribués de ce répertoire trient des valeurs entières, mais les données réelles sont souvent des
+enregistrements : une clé et des données attachées. On les représente par un tableau structuré NumPy de champs
+'key' et 'payload' (et 'index' pour un argsort). Pour ne pas doubler les communications (trier les clés puis
+rapatrier les données), l'enregistrement complet voyage avec sa clé grâce à un type MPI dérivé du dtype, et le tri
+local ne fait qu'un argsort des clés suivi d'une seule permutation.
+
+Les fonctions acceptent aussi bien un tableau simple (la clé est le tableau lui-même) qu'un tableau structuré.
+"""
+import os
+import sys
+import numpy as np
+from mpi4py import MPI
+# Types MPI dérivés et vérification distribuée de l'ordre : implémentation commune avec le tri par paquets du TP3
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "tps", "tp3"))
+import bucket_sort
+from bucket_sort import mpi_datatype
+
+def keys(values):
+    """ Clés de tri : le tableau lui-même ou son champ 'key'. """
+    return values if values.dtype.names is None else values['key']
+
+def local_sort(values, kind=None):
+    """ Trie values sur place selon les clés, en appliquant une seule permutation aux enregistrements. """
+    if values.dtype.names is None:
+        values.sort(kind=kind)
+    else:
+        values[:] = values[np.argsort(values['key'], kind=kind)]
+    return values
+
+def merge(first, second):
+    """ Fusionne deux tableaux triés (le tri stable de NumPy reconnaît les deux séquences déjà triées). """
+    return local_sort(np.concatenate((first, second)), kind="stable")
+
+def reserve(buffer, size, dtype):
+    """
+    Retourne buffer s'il peut contenir size éléments, sinon un nouveau tampon. La marge (doublement) ne s'applique
+    qu'à un tampon trop petit du même type ; pour un autre type, on alloue exactement size éléments.
+    """
+    if buffer is None or buffer.dtype != dtype:
+        return np.empty(size, dtype=dtype)
+    if buffer.shape[0] < size:
+        buffer = np.empty(max(size, 2*buffer.shape[0]), dtype=dtype)
+    return buffer
+
+def merge_into(first, second, out):
+    """
+    Fusionne deux tableaux triés dans le tampon out (réutilisé d'un appel à l'autre) et retourne la vue out[:n].
+    Le tri stable de NumPy (timsort) détecte les deux séquences triées et les fusionne en temps linéaire,
+    sans recopier les données dans un nouveau tableau.
+    """
+    n1 = first.shape[0]
+    merged = out[:n1 + second.shape[0]]
+    merged[:n1] = first
+    merged[n1:] = second
+    return local_sort(merged, kind="stable")
+
+def split_point(low, high, n):
+    """
+    Nombre k d'éléments de low parmi les n premiers éléments de la fusion de low et high (triés ; à égalité,
+    les éléments de low passent en premier). Recherche dichotomique en O(log n).
+    """
+    lowKeys, highKeys = keys(low), keys(high)
+    first, last = max(0, n - highKeys.shape[0]), min(n, lowKeys.shape[0])
+    while first < last:
+        k = (first + last + 1)//2
+        if n - k >= highKeys.shape[0] or lowKeys[k-1] <= highKeys[n-k]:
+            first = k
+        else:
+            last = k - 1
+    return first
+
+def merge_split(low, high, keepLow, out):
+    """
+    Fusion-partage entre le bloc low (processus de plus petit rang) et le bloc high : retourne dans out
+    les len(low) plus petits éléments si keepLow, les len(high) plus grands sinon. Seule la moitié conservée
+    est fusionnée ; les deux processus calculent le même point de coupe, chaque élément est gardé une fois.
+    """
+    n = low.shape[0]
+    k = split_point(low, high, n)
+    if keepLow:
+        return merge_into(low[:k], high[:n-k], out)
+    return merge_into(low[k:], high[n-k:], out)
+
+def compare_exchange(low, high):
+    """
+    Comparaison-échange élément par élément entre la séquence low (côté des petites valeurs) et high.
+    Retourne (minimums, maximums). Les deux processus évaluent le même masque low <= high, ce qui
+    garantit qu'en cas d'égalité chaque enregistrement est conservé exactement une fois.
+    """
+    mask = keys(low) <= keys(high)
+    return np.where(mask, low, high), np.where(mask, high, low)
+
+DISTRIBUTIONS = ("uniform", "skewed", "sorted", "reverse", "duplicates")
+
+def generate(nb_values, payload=0, argsort=False, offset=0, rng=np.random, distribution="uniform"):
+    """
+    Génère nb_values clés entières :
+        - uniform    : uniformes dans [-32768, 32768[ (comportement par défaut)
+        - skewed     : loi log-normale, la plupart des clés dans un petit intervalle
+        - sorted     : déjà triées globalement (clé = indice global offset + i)
+        - reverse    : triées globalement dans l'ordre décroissant
+        - duplicates : seulement 16 valeurs différentes
+    puis éventuellement des enregistrements :
+        - payload > 0 : enregistrements avec payload colonnes float64 (colonne j égale à clé*(j+1), ce qui permet
+          de vérifier que les données ont voyagé avec leur clé)
+        - argsort : enregistrements (clé, indice global) où offset est l'indice global de la première valeur
+    Sans option, retourne un simple tableau d'entiers comme auparavant.
+    """
+    if distribution == "skewed":
+        values = np.minimum(rng.lognormal(0., 3., size=nb_values) * 100, 2.**62).astype(np.int64)
+    elif distribution == "sorted":
+        values = offset + np.arange(nb_values, dtype=np.int64)
+    elif distribution == "reverse":
+        values = -(offset + np.arange(nb_values, dtype=np.int64))
+    elif distribution == "duplicates":
+        values = rng.randint(0, 16, size=nb_values, dtype=np.int64)
+    else:
+        values = rng.randint(-32768, 32768, size=nb_values, dtype=np.int64)
+    if not argsort and payload == 0:
+        return values
+    fields = [('key', np.int64)]
+    if argsort:
+        fields.append(('index', np.int64))
+    if payload > 0:
+        fields.append(('payload', np.float64, (payload,)))
+    records = np.empty(nb_values, dtype=fields)
+    records['key'] = values
+    if argsort:
+        records['index'] = offset + np.arange(nb_values)
+    if payload > 0:
+        records['payload'] = values[:, None] * np.arange(1, payload + 1)
+    return records
+
+def check_payload(values):
+    """ Vérifie que chaque enregistrement a gardé les données attachées à sa clé. """
+    if values.dtype.names is None or 'payload' not in values.dtype.names:
+        return True
+    width = values['payload'].shape[1]
+    return bool(np.all(values['payload'] == values['key'][:, None] * np.arange(1, width + 1)))
+
+def result(values):
+    """ Ce qui est écrit dans le fichier de sortie : les clés, ou les indices globaux d'origine pour un argsort. """
+    if values.dtype.names is not None and 'index' in values.dtype.names:
+        return values['index']
+    return keys(values)
+
+def fingerprint(values, comm):
+    """
+    Empreinte globale (nombre de valeurs, somme des clés entières) : un tri doit la conserver.
+    La somme est faite séparément sur les 32 bits hauts et bas des clés entières pour ne pas déborder.
+    """
+    localKeys = keys(values)
+    localSum = int((localKeys >> 32).sum()) * 2**32 + int((localKeys & 0xFFFFFFFF).sum())
+    return comm.allreduce(localKeys.shape[0], op=MPI.SUM), comm.allreduce(localSum, op=MPI.SUM)
+
+def is_globally_sorted(values, comm):
+    """
+    Vérification distribuée de l'ordre, sans rassembler les données (voir bucket_sort.is_globally_sorted),
+    et des données attachées aux clés.
+    """
+    key = None if values.dtype.names is None else 'key'
+    return bucket_sort.is_globally_sorted(values, comm, key) and comm.allreduce(check_payload(values), op=MPI.LAND)
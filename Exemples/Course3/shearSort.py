@@ -1,107 +1,123 @@
 import numpy as np
 import time
 from mpi4py import MPI
-import sys
+import argparse
 from math import sqrt, log2
+import records
+from oddEvenSorter import OddEvenSorter
 
 out = None
 
-def oddEvenSort( values, comm : MPI.Comm):
-    NLoc = values.shape[0]
-    prevBuffer = np.empty((NLoc), dtype=np.int64)
-    nextBuffer = np.empty((NLoc), dtype=np.int64)
-    status     = MPI.Status()
-    nbp = comm.size
-    rank= comm.rank
+class ShearSorter:
+    """
+    Shear sort sur une grille rectangulaire nbRows x nbRowBlocks la plus carrée possible (tout nombre de processus
+    convient), préparé une fois : les communicateurs ligne et colonne et leurs trieurs pair-impair, attachés au
+    même tableau values, sont créés dans le constructeur. values est trié sur place (ordre serpentin = ordre des
+    rangs). Après sort, nbDone contient le nombre d'itérations ligne+colonne effectuées et bytesSent le nombre
+    d'octets de données envoyés par ce processus.
+    """
+    def __init__(self, comm : MPI.Comm, values, checkEvery=2):
+        self.comm   = comm
+        self.values = values
+        nbp, rank   = comm.size, comm.rank
+        self.nbRows, self.nbRowBlocks = MPI.Compute_dims(nbp, 2)
+        # Création de la grille de processus :
+        self.IProc = rank//self.nbRowBlocks
+        self.JProc = rank % self.nbRowBlocks if self.IProc%2 == 0 else self.nbRowBlocks-1-rank%self.nbRowBlocks
+        self.rowComm = comm.Split(self.IProc, rank)
+        self.colComm = comm.Split(self.JProc, rank)
+        # Trieurs ligne et colonne préparés une fois, attachés au même tableau values
+        self.rowSorter = OddEvenSorter(self.rowComm, values, checkEvery=checkEvery)
+        self.colSorter = OddEvenSorter(self.colComm, values, checkEvery=checkEvery)
+        self.nbIter = int(np.ceil(log2(self.nbRows))) + 1
+        # Passe finale sur tous les processus dans l'ordre serpentin (= ordre des rangs) : avec des blocs de tailles
+        # différentes les passes lignes/colonnes peuvent laisser quelques bords mal ordonnés ; le test d'arrêt rend
+        # cette passe presque gratuite quand tout est déjà trié.
+        self.finalSorter = OddEvenSorter(comm, values, checkEvery=checkEvery)
+        self.nbDone    = 0
+        self.bytesSent = 0
 
-    for iter in range(nbp):
-        if iter%2 == 1: # Si iter est impair
-            if rank%2 == 0:
-                if rank > 0:
-                    comm.Recv([prevBuffer,MPI.INT64_T], rank-1, status=status )
-                    comm.Ssend([values,MPI.INT64_T], rank-1)
-                    fusion = np.concatenate((prevBuffer, values))
-                    fusion.sort(kind="mergesort")
-                    values = fusion[-NLoc:] # On garde la partie supérieure
-            elif rank<nbp-1: #rank est impair
-                comm.Ssend([values,MPI.INT64_T], rank+1)
-                comm.Recv([nextBuffer,MPI.INT64_T], rank+1, status=status)
-                fusion = np.concatenate((values,nextBuffer))
-                fusion.sort(kind="mergesort")
-                values = fusion[:NLoc] # On garde la partie inférieure
-        else: # Si iter est pair
-            if rank%2 ==0:
-                if rank < nbp-1:
-                    comm.Recv([nextBuffer,MPI.INT64_T], rank+1, status=status)
-                    comm.Ssend([values,MPI.INT64_T], rank+1)
-                    fusion = np.concatenate((values, nextBuffer))
-                    fusion.sort(kind="mergesort")
-                    values = fusion[:NLoc] # On garde la partie inférieure
-            else:
-                comm.Ssend([values,MPI.INT64_T], rank-1)
-                comm.Recv([prevBuffer,MPI.INT64_T], rank-1, status=status )
-                fusion = np.concatenate((prevBuffer, values))
-                fusion.sort(kind="mergesort")
-                values = fusion[-NLoc:] # On garde la partie supérieure
-    return values
+    def sort(self):
+        records.local_sort(self.values)
+        self.nbDone = 0
+        self.bytesSent = 0
+        if self.comm.size>1:
+            for iter in range(self.nbIter):
+                # Row sort :
+                changed = self.rowSorter.sort()
+                # Colum sort :
+                changed = self.colSorter.sort() or changed
+                self.nbDone += 1
+                self.bytesSent += self.rowSorter.bytesSent + self.colSorter.bytesSent
+                # Si ni les lignes ni les colonnes n'ont changé nulle part, le tableau est trié
+                if not self.comm.allreduce(changed, op=MPI.LOR):
+                    break
+            self.finalSorter.sort()
+            self.bytesSent += self.finalSorter.bytesSent
+        return self.values
 
-globCom = MPI.COMM_WORLD.Dup()
-nbp     = globCom.size
-rank    = globCom.rank
-name    = MPI.Get_processor_name()
+    def free(self):
+        self.rowSorter.free()
+        self.colSorter.free()
+        self.finalSorter.free()
+# ====================================================================================================================
 
-nbRowBlocks = int(sqrt(nbp+0.1))
-assert(nbRowBlocks*nbRowBlocks == nbp)
+if __name__ == "__main__":
+    globCom = MPI.COMM_WORLD.Dup()
+    nbp     = globCom.size
+    rank    = globCom.rank
+    name    = MPI.Get_processor_name()
 
-N = 360_000
+    parser = argparse.ArgumentParser(description="Shear sort")
+    parser.add_argument("N", nargs="?", type=int, default=360_000)
+    parser.add_argument("--payload", type=int, default=0, help="nombre de colonnes float64 attachées à chaque clé")
+    parser.add_argument("--argsort", action="store_true", help="trie les indices globaux d'origine selon les clés")
+    parser.add_argument("--repeat", type=int, default=1, help="nombre de tris successifs de nouvelles données")
+    parser.add_argument("--perturb", type=float, default=0.,
+                        help="si > 0, les tris suivants retrient le résultat précédent dont cette fraction de valeurs est déplacée")
+    parser.add_argument("--check-every", type=int, default=2, help="nombre de phases entre deux tests d'arrêt (Allreduce)")
+    parser.add_argument("--dump", action="store_true", help="écrit les valeurs initiales et triées dans le fichier de sortie")
+    args = parser.parse_args()
+    N = args.N
 
-if len(sys.argv) > 1:
-    N = int(sys.argv[1])
+    filename = f"Output{rank:03d}.txt"
+    out      = open(filename, mode='w')
 
-filename = f"Output{rank:03d}.txt"
-out      = open(filename, mode='w')
+    reste= N % nbp
+    NLoc = N//nbp + (1 if rank < reste else 0)
+    offset = rank*(N//nbp) + min(rank, reste) # Indice global de la première valeur locale
+    out.write(f"Nombre de valeurs locales : {NLoc}`\n")
 
-reste= N % nbp
-assert(reste == 0)
-NLoc = N//nbp
-out.write(f"Nombre de valeurs locales : {NLoc}`\n")
+    # Génération du tableau local de valeurs
+    values = records.generate(NLoc, args.payload, args.argsort, offset=offset)
+    if args.dump:
+        out.write(f"Valeurs initiales : {records.keys(values)}\n")
 
+    sorter = ShearSorter(globCom, values, args.check_every)
+    out.write(f"Grid coordinate : {sorter.IProc}, {sorter.JProc}\n")
+    out.write(f"Communicateur ligne   : {sorter.rowComm.rank}/{sorter.rowComm.size}\n")
+    out.write(f"Communicateur colonne : {sorter.colComm.rank}/{sorter.colComm.size}\n")
+    elapsed = 0.
+    for repeat in range(args.repeat):
+        if repeat > 0 and args.perturb > 0: # Données presque triées : quelques enregistrements déplacés localement
+            moved = np.random.choice(NLoc, int(args.perturb*NLoc), replace=False)
+            values[moved] = values[np.random.permutation(moved)]
+        elif repeat > 0: # Nouvelles données de même forme
+            values[:] = records.generate(NLoc, args.payload, args.argsort, offset=offset)
+        debut = time.time()
+        sorter.sort()
+        elapsed += time.time() - debut
+        out.write(f"Tri {repeat} : {sorter.nbDone} itérations sur {sorter.nbIter}, "
+                  f"passe finale : {sorter.finalSorter.phases} phases\n")
+    sorter.free()
+    assert(len(values) == NLoc)
+    out.write(f"Temps local pour le tri : {elapsed/args.repeat} secondes\n")
+    if not records.check_payload(values):
+        out.write("Données attachées incohérentes avec les clés !\n")
+    if values.shape[0] > 0:
+        out.write(f"Première valeurs locale : {records.keys(values)[0]}\n")
+        out.write(f"Dernière valeurs locale : {records.keys(values)[-1]}\n")
+    if args.dump:
+        out.write(f"values : {records.result(values)}\n")
 
-# Création de la grille de processus :
-IProc = rank//nbRowBlocks
-JProc = rank % nbRowBlocks if  IProc%2 == 0 else nbRowBlocks-1-rank%nbRowBlocks
-rowComm = globCom.Split(IProc, rank)
-colComm = globCom.Split(JProc, rank)
-out.write(f"Grid coordinate : {IProc}, {JProc}\n")
-nbpRow = rowComm.size
-rankRow= rowComm.rank
-nbpCol = colComm.size
-rankCol= colComm.rank
-out.write(f"Communicateur ligne   : {rankRow}/{nbpRow}\n")
-out.write(f"Communicateur colonne : {rankCol}/{nbpCol}\n")
-
-# Génération du tableau local de valeurs
-values = np.random.randint(-32768, 32768, size=NLoc,dtype=np.int64)
-out.write(f"Valeurs initiales : {values}\n")
-
-
-debut = time.time()
-nbIter = int(log2(nbp)+1)//2 + 1
-values = np.sort(values)
-if nbp>1:
-    for iter in range(nbIter):
-        out.write(f"iter : {iter}\n")
-        # Row sort :
-        values = oddEvenSort( values, rowComm)
-        assert(len(values) == NLoc)
-        # Colum sort :
-        values = oddEvenSort( values, colComm)
-        assert(len(values) == NLoc)
-fin = time.time()
-assert(len(values) == NLoc)
-out.write(f"Temps local pour le tri : {fin-debut} secondes\n")
-out.write(f"Première valeurs locale : {values[0]}\n")
-out.write(f"Dernière valeurs locale : {values[-1]}\n")
-out.write(f"values : {values}\n")
-
-out.close()
+    out.close()
@@ -0,0 +1,165 @@
+"""
+Banc d'essai des tris distribués
+################################
+Compare dans les mêmes conditions les cinq tris parallèles : tri par échantillonnage (tps/tp3/bucket_sort.py),
+hyperquicksort, tri bitonique, tri pair-impair par blocs et shear sort.
+    - mêmes données pour tous les tris : générateur commun (records.generate), graine fonction de
+      (seed, nombre de processus, N, rang, répétition) ; distributions uniform, skewed, sorted, reverse, duplicates
+    - plusieurs nombres de processus dans une même exécution : pour chaque valeur p de --procs, les p premiers
+      processus forment un sous-communicateur, les autres attendent
+    - la préparation (sous-communicateurs, requêtes persistantes) n'est pas chronométrée ; le temps retenu est
+      le maximum sur les processus
+    - vérification distribuée sans rassembler les données : ordre global (exscan du maximum), conservation du
+      nombre de valeurs et de la somme des clés, données attachées
+    - résultats : temps, octets de données envoyés (somme sur les processus), déséquilibre final (taille maximale
+      sur taille moyenne des blocs), dans un fichier CSV et/ou JSON ; aucune valeur n'est écrite dans des fichiers
+
+Usage :
+    mpiexec -np 8 python sortBenchmark.py --sizes 100000 1000000 --procs 1 2 4 8 --csv tris.csv
+    mpiexec -np 4 python sortBenchmark.py --algorithms sample bitonic --distributions sorted reverse --json tris.json
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+import numpy as np
+from mpi4py import MPI
+import records
+from oddEvenSorter import OddEvenSorter
+from bitonicsort_distributed import BitonicSorter
+from hyperquicksort import HyperQuickSorter
+from shearSort import ShearSorter
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "tps", "tp3"))
+from bucket_sort import sample_sort, local_counts
+
+ALGORITHMS = ("sample", "hyperquick", "bitonic", "oddeven", "shear")
+
+def supported(algorithm, nbp):
+    """ Hyperquicksort demande un nombre de processus puissance de deux ; les autres tris acceptent tout nombre. """
+    return algorithm != "hyperquick" or nbp & (nbp-1) == 0
+
+def prepare(algorithm, comm, values, args):
+    """
+    Prépare le tri de values sur comm (hors chronométrage). Retourne (sort, free) : sort() trie les données
+    actuellement dans values et retourne (bloc trié, octets de données envoyés par ce processus).
+    """
+    if algorithm == "sample":
+        def sort():
+            stats = {}
+            key = None if values.dtype.names is None else 'key'
+            result = sample_sort(values, comm, args.oversampling, stats=stats, key=key)
+            return result, stats['bytes_sent']
+        return sort, lambda: None
+    if algorithm == "hyperquick":
+        hyperQuickSorter = HyperQuickSorter(comm)
+        def sort():
+            result = hyperQuickSorter.sort(values)
+            return result, hyperQuickSorter.bytesSent
+        return sort, lambda: None
+    if algorithm == "bitonic":
+        sorter = BitonicSorter(comm, values)
+    elif algorithm == "shear":
+        sorter = ShearSorter(comm, values, args.check_every)
+    else:
+        oddEvenSorter = OddEvenSorter(comm, values, checkEvery=args.check_every)
+        def sort():
+            records.local_sort(values)
+            oddEvenSorter.sort()
+            return values, oddEvenSorter.bytesSent
+        return sort, oddEvenSorter.free
+    def sort():
+        result = sorter.sort()
+        return result, sorter.bytesSent
+    return sort, sorter.free
+
+def benchmark(algorithm, distribution, N, comm, args):
+    """ Mesures d'un tri pour une configuration, une ligne par répétition (retournées sur le processus 0). """
+    nbp, rank = comm.size, comm.rank
+    counts = local_counts(N, nbp)
+    offset = int(counts[:rank].sum())
+    def generate(repeat):
+        rng = np.random.RandomState([args.seed, nbp, N, rank, repeat])
+        return records.generate(int(counts[rank]), args.payload, args.argsort, offset, rng, distribution)
+    values = generate(0)
+    comm.Barrier()
+    debut = MPI.Wtime()
+    sort, free = prepare(algorithm, comm, values, args)
+    setup = comm.allreduce(MPI.Wtime() - debut, op=MPI.MAX)
+    rows = []
+    for repeat in range(args.repeat):
+        if repeat > 0: # Nouvelles données de même forme (les requêtes persistantes sont attachées à values)
+            values[:] = generate(repeat)
+        before = records.fingerprint(values, comm)
+        comm.Barrier()
+        debut = MPI.Wtime()
+        result, bytesSent = sort()
+        elapsed = MPI.Wtime() - debut
+        sizes = np.array(comm.allgather(result.shape[0]))
+        row = {'algorithm': algorithm, 'distribution': distribution, 'N': N, 'nbp': nbp, 'payload': args.payload,
+               'repeat': repeat, 'setup': setup,
+               'time': comm.allreduce(elapsed, op=MPI.MAX),
+               'bytes': comm.allreduce(bytesSent, op=MPI.SUM),
+               'imbalance': sizes.max() / max(sizes.mean(), 1.),
+               'sorted': records.is_globally_sorted(result, comm) and records.fingerprint(result, comm) == before}
+        rows.append(row)
+        if rank == 0:
+            print(f"{algorithm:>10} {distribution:>10} N={N:<10} p={nbp:<3} : {row['time']:.4f} s, "
+                  f"{row['bytes']/2**20:.2f} Mo envoyés, déséquilibre {row['imbalance']:.2f}, trié : {row['sorted']}",
+                  flush=True)
+    free()
+    return rows
+
+if __name__ == "__main__":
+    globCom = MPI.COMM_WORLD.Dup()
+    rank    = globCom.rank
+
+    parser = argparse.ArgumentParser(description="Banc d'essai des tris distribués")
+    parser.add_argument("--algorithms", nargs="+", choices=ALGORITHMS, default=list(ALGORITHMS))
+    parser.add_argument("--distributions", nargs="+", choices=records.DISTRIBUTIONS, default=list(records.DISTRIBUTIONS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100_000], help="nombres total de valeurs N")
+    parser.add_argument("--procs", nargs="+", type=int, default=None,
+                        help="nombres de processus (au plus celui de mpiexec, qui est la valeur par défaut)")
+    parser.add_argument("--repeat", type=int, default=3, help="nombre de tris mesurés par configuration")
+    parser.add_argument("--payload", type=int, default=0, help="nombre de colonnes float64 attachées à chaque clé")
+    parser.add_argument("--argsort", action="store_true", help="trie les indices globaux d'origine selon les clés")
+    parser.add_argument("--oversampling", type=int, default=4, help="échantillons par processus (tri par échantillonnage)")
+    parser.add_argument("--check-every", type=int, default=2, help="phases entre deux tests d'arrêt (pair-impair, shear)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", help="fichier CSV des résultats")
+    parser.add_argument("--json", help="fichier JSON des résultats")
+    args = parser.parse_args()
+    procs = args.procs if args.procs is not None else [globCom.size]
+    if any(p < 1 or p > globCom.size for p in procs):
+        if rank == 0:
+            print(f"Les nombres de processus doivent être compris entre 1 et {globCom.size}")
+        globCom.Abort(-1)
+
+    rows = []
+    for nbp in procs:
+        comm = globCom.Split(0 if rank < nbp else MPI.UNDEFINED, rank)
+        if comm != MPI.COMM_NULL:
+            for N in args.sizes:
+                for distribution in args.distributions:
+                    for algorithm in args.algorithms:
+                        if not supported(algorithm, nbp):
+                            if rank == 0:
+                                print(f"{algorithm:>10} {distribution:>10} N={N:<10} p={nbp:<3} : ignoré")
+                            continue
+                        rows += benchmark(algorithm, distribution, N, comm, args)
+            comm.Free()
+        globCom.Barrier()
+
+    if rank == 0:
+        for row in rows:
+            row.update({key: value.item() for key, value in row.items() if isinstance(value, np.generic)})
+        if args.csv:
+            with open(args.csv, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else [])
+                writer.writeheader()
+                writer.writerows(rows)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(rows, f, indent=1)
+        if not all(row['sorted'] for row in rows):
+            print("Au moins un tri a échoué !")
@@ -0,0 +1,215 @@
+"""
+Micro-benchmarks des primitives MPI illustrées dans ce répertoire
+#################################################################
+Pour chaque primitive (ping-pong point à point, bcast, scatter, gather, allreduce, alltoall, scan) et chaque taille
+de message de --min-size à --max-size octets, on compare :
+    - pickle    : API en minuscules (send, bcast, ...) : l'objet (ici un tableau numpy) est sérialisé ;
+    - buffer    : API en majuscules (Send, Bcast, ...) : les données du tableau sont envoyées directement ;
+    - pickle-nb : isend (non bloquant, sérialisé), point à point seulement ;
+    - buffer-nb : Isend/Irecv, Ibcast, ... suivis de Wait.
+La taille est celle du tableau de chaque processus : message du ping-pong, tableau diffusé, morceau reçu (scatter)
+ou envoyé (gather) par chaque processus, tableau réduit, tampon d'envoi complet (alltoall).
+Latence = temps d'une opération (maximum sur les processus ; pour le ping-pong, moitié de l'aller-retour),
+débit = taille / latence. Pour chaque primitive on indique ensuite la taille de croisement : la plus petite taille
+à partir de laquelle une variante est toujours plus rapide qu'une autre.
+
+Usage :
+    mpiexec -np 4 python microbenchmarks.py
+    mpiexec -np 4 python microbenchmarks.py --primitives p2p bcast --max-size 16M --csv mpi_bench.csv
+"""
+import argparse
+import csv
+import numpy as np
+from mpi4py import MPI
+
+PRIMITIVES = ("p2p", "bcast", "scatter", "gather", "allreduce", "alltoall", "scan")
+VARIANTS   = ("pickle", "pickle-nb", "buffer", "buffer-nb")
+# Comparaisons dont on cherche la taille de croisement : (variante de référence, variante comparée)
+COMPARISONS = (("pickle", "buffer"), ("buffer", "buffer-nb"), ("pickle", "pickle-nb"))
+
+def parseSize( text : str ) -> int:
+    """ "8", "64K", "16M", "1G" -> nombre d'octets """
+    units = {"K": 2**10, "M": 2**20, "G": 2**30}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def formatSize( nbBytes : int ) -> str:
+    for unit, factor in (("G", 2**30), ("M", 2**20), ("K", 2**10)):
+        if nbBytes >= factor:
+            return f"{nbBytes / factor:g}{unit}"
+    return f"{nbBytes}"
+
+def makeOperation( comm, primitive : str, variant : str, nbBytes : int ):
+    """
+    Prépare les tableaux d'un essai et retourne une fonction sans argument qui effectue une opération,
+    ou None si la variante n'existe pas pour cette primitive (ou pour ce nombre de processus).
+    """
+    nbp, rank = comm.size, comm.rank
+    n = max(nbBytes // 8, 1)
+    if primitive == "p2p":
+        if nbp < 2:
+            return None
+        data = np.ones(n)
+        recv = np.empty(n)
+        if rank > 1:
+            return lambda : None
+        other = 1 - rank
+        if variant == "pickle":
+            def operation():
+                if rank == 0:
+                    comm.send(data, dest=other); comm.recv(source=other)
+                else:
+                    comm.send(comm.recv(source=other), dest=other)
+        elif variant == "pickle-nb":
+            def operation():
+                if rank == 0:
+                    request = comm.isend(data, dest=other); comm.recv(source=other); request.wait()
+                else:
+                    received = comm.recv(source=other); comm.isend(received, dest=other).wait()
+        elif variant == "buffer":
+            def operation():
+                if rank == 0:
+                    comm.Send(data, dest=other); comm.Recv(recv, source=other)
+                else:
+                    comm.Recv(recv, source=other); comm.Send(recv, dest=other)
+        else:
+            def operation():
+                if rank == 0:
+                    requests = [comm.Isend(data, dest=other), comm.Irecv(recv, source=other)]
+                    MPI.Request.Waitall(requests)
+                else:
+                    comm.Irecv(recv, source=other).Wait(); comm.Isend(recv, dest=other).Wait()
+        return operation
+    if variant == "pickle-nb":
+        return None  # pas de collectives non bloquantes sérialisées dans mpi4py
+    nb = variant == "buffer-nb"
+    if primitive == "bcast":
+        data = np.ones(n)
+        if variant == "pickle":
+            return lambda : comm.bcast(data if rank == 0 else None, root=0)
+        return (lambda : comm.Ibcast(data, root=0).Wait()) if nb else (lambda : comm.Bcast(data, root=0))
+    if primitive == "scatter":
+        full = np.ones(n * nbp) if rank == 0 else None
+        chunk = np.empty(n)
+        if variant == "pickle":
+            chunks = np.split(full, nbp) if rank == 0 else None
+            return lambda : comm.scatter(chunks, root=0)
+        return (lambda : comm.Iscatter(full, chunk, root=0).Wait()) if nb else (lambda : comm.Scatter(full, chunk, root=0))
+    if primitive == "gather":
+        chunk = np.ones(n)
+        full = np.empty(n * nbp) if rank == 0 else None
+        if variant == "pickle":
+            return lambda : comm.gather(chunk, root=0)
+        return (lambda : comm.Igather(chunk, full, root=0).Wait()) if nb else (lambda : comm.Gather(chunk, full, root=0))
+    if primitive in ("allreduce", "scan"):
+        data = np.ones(n)
+        result = np.empty(n)
+        if variant == "pickle":
+            reduction = comm.allreduce if primitive == "allreduce" else comm.scan
+            return lambda : reduction(data, op=MPI.SUM)
+        if primitive == "allreduce":
+            return (lambda : comm.Iallreduce(data, result, op=MPI.SUM).Wait()) if nb else \
+                   (lambda : comm.Allreduce(data, result, op=MPI.SUM))
+        return (lambda : comm.Iscan(data, result, op=MPI.SUM).Wait()) if nb else (lambda : comm.Scan(data, result, op=MPI.SUM))
+    if primitive == "alltoall":
+        n = max(n // nbp, 1) * nbp
+        data = np.ones(n)
+        result = np.empty(n)
+        if variant == "pickle":
+            chunks = np.split(data, nbp)
+            return lambda : comm.alltoall(chunks)
+        return (lambda : comm.Ialltoall(data, result).Wait()) if nb else (lambda : comm.Alltoall(data, result))
+    raise ValueError(f"unknown primitive {primitive}")
+
+def measure( comm, operation, iterations : int ) -> float:
+    """ Temps moyen d'une opération (une itération d'échauffement, maximum sur les processus) """
+    operation()
+    comm.Barrier()
+    start = MPI.Wtime()
+    for _ in range(iterations):
+        operation()
+    elapsed = (MPI.Wtime() - start) / iterations
+    return comm.allreduce(elapsed, op=MPI.MAX)
+
+def crossover( sizes, reference, candidate ):
+    """
+    Plus petite taille à partir de laquelle candidate est plus rapide que reference pour toutes les tailles
+    suivantes ; None si candidate n'est jamais (ou pas jusqu'au bout) plus rapide.
+    """
+    result = None
+    for size in reversed(sizes):
+        if candidate[size] < reference[size]:
+            result = size
+        else:
+            break
+    return result
+
+if __name__ == "__main__":
+    comm = MPI.COMM_WORLD.Dup()
+    nbp  = comm.size
+    rank = comm.rank
+
+    parser = argparse.ArgumentParser(description="Micro-benchmarks MPI : latence, débit et tailles de croisement")
+    parser.add_argument("--primitives", nargs="+", choices=PRIMITIVES, default=list(PRIMITIVES))
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument("--min-size", default="8", help="plus petite taille de message (ex. 8, 1K)")
+    parser.add_argument("--max-size", default="256M", help="plus grande taille de message (ex. 16M, 256M)")
+    parser.add_argument("--factor", type=int, default=4, help="rapport entre deux tailles successives")
+    parser.add_argument("--volume", default="64M",
+                        help="volume par mesure : nombre d'itérations = volume / taille (entre 3 et --max-iterations)")
+    parser.add_argument("--max-iterations", type=int, default=1000)
+    parser.add_argument("--csv", help="enregistre les mesures (primitive, variante, taille, latence, débit)")
+    args = parser.parse_args()
+
+    minSize, maxSize = parseSize(args.min_size), parseSize(args.max_size)
+    sizes = []
+    size = max(minSize // 8 * 8, 8)
+    while size < maxSize:
+        sizes.append(size)
+        size *= args.factor
+    sizes.append(maxSize // 8 * 8)
+    volume = parseSize(args.volume)
+
+    results = {}  # (primitive, variante) -> {taille : latence}
+    for primitive in args.primitives:
+        for variant in args.variants:
+            for size in sizes:
+                operation = makeOperation(comm, primitive, variant, size)
+                if operation is None:
+                    break
+                iterations = int(min(args.max_iterations, max(3, volume // size)))
+                latency = measure(comm, operation, iterations)
+                if primitive == "p2p":
+                    latency /= 2.  # aller-retour
+                results.setdefault((primitive, variant), {})[size] = latency
+                del operation
+
+    if rank == 0:
+        print(f"Number of processes: {nbp}, MPI library: {MPI.Get_library_version().splitlines()[0]}")
+        for primitive in args.primitives:
+            variants = [v for v in args.variants if (primitive, v) in results]
+            if not variants:
+                continue
+            print(f"\n{primitive} (latency in µs / bandwidth in MB/s)")
+            print(f"{'size':>8} " + " ".join(f"{v:>24}" for v in variants))
+            for size in sizes:
+                cells = []
+                for v in variants:
+                    latency = results[(primitive, v)][size]
+                    cells.append(f"{latency * 1e6:>12.2f} {size / latency / 1e6:>11.1f}")
+                print(f"{formatSize(size):>8} " + " ".join(cells))
+            for reference, candidate in COMPARISONS:
+                if (primitive, reference) in results and (primitive, candidate) in results:
+                    size = crossover(sizes, results[(primitive, reference)], results[(primitive, candidate)])
+                    verdict = (f"faster from {formatSize(size)}B" if size is not None and size > sizes[0] else
+                               "always faster" if size is not None else "not faster at the largest sizes")
+                    print(f"  {candidate} vs {reference}: {verdict}")
+        if args.csv is not None:
+            with open(args.csv, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["nbp", "primitive", "variant", "size", "latency", "bandwidth"])
+                for (primitive, variant), timings in results.items():
+                    for size, latency in timings.items():
+                        writer.writerow([nbp, primitive, variant, size, latency, size / latency])
@@ -12,6 +12,7 @@ out      = open(filename, mode='w')
 # Envoie par sérialisation : le plus simple mais le moins performant !
 # En effet, ce send sérialise et compresse les données afin de pouvoir
 # envoyer toute donnée "sérialisable" sous forme compressée à l'autre processus
+# (écart mesuré en fonction de la taille des messages par microbenchmarks.py --primitives p2p)
 out.write("Envoie/reception donnees heterogenes\n")
 liste_recue = None
 if rank == 0:
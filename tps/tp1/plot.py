@@ -1,54 +1,86 @@
+import argparse
+from pathlib import Path
 import matplotlib.pyplot as plt
-import numpy as np
-
-# 1. 您的表格数据
-threads = [1, 2, 4, 8, 16]
-times = [7.64, 3.77, 3.01, 2.43, 1.94]
-speedups = [1.00, 2.03, 2.54, 3.14, 3.94]
-
-# --- 开始绘图 ---
-
-# 创建一个图形窗口和一个主坐标轴 (ax1)
-# figsize 用于调整图形的大小
-fig, ax1 = plt.subplots(figsize=(10, 7))
-
-# --- 在主坐标轴 ax1 (左Y轴) 上绘制 "执行时间" ---
-# 为线条和标签选择一种颜色
-color_time = 'tab:green'
-ax1.set_xlabel('Nombre de Threads (n)', fontsize=14)
-ax1.set_ylabel('Temps d\'exécution (s)', fontsize=14)
-# 绘制执行时间曲线
-line1 = ax1.plot(threads, times, color=color_time, marker='s', linestyle='-', label='Temps d\'exécution')
-# 设置左Y轴刻度标签的颜色
-ax1.tick_params(axis='y', labelcolor=color_time)
-# 设置X轴刻度，确保所有数据点都清晰显示
-ax1.set_xticks(threads)
-ax1.grid(True, linestyle=':') # 添加网格线
-
-# --- 创建一个共享X轴的次坐标轴 (ax2) 用于 "加速比" ---
-ax2 = ax1.twinx()
-
-# --- 在次坐标轴 ax2 (右Y轴) 上绘制 "加速比" ---
-# 为线条和标签选择另一种颜色
-color_speedup = 'tab:blue'
-ax2.set_ylabel('Accélération', fontsize=14)
-# 绘制实际加速比曲线
-line2 = ax2.plot(threads, speedups, color=color_speedup, marker='o', linestyle='-', label='Accélération Réelle')
-# 绘制理想加速比曲线作为对比
-line3 = ax2.plot(threads, threads, color='tab:red', linestyle='--', marker='x', label='Accélération Idéale')
-# 设置右Y轴刻度标签的颜色
-ax2.tick_params(axis='y', labelcolor=color_speedup)
-
-# --- 添加标题和图例 ---
-plt.title('Performance de la Parallélisation OpenMP', fontsize=18)
-
-# 合并两个坐标轴的图例
-lines = line1 + line2 + line3
-labels = [l.get_label() for l in lines]
-ax1.legend(lines, labels, loc='upper center', fontsize=12)
-
-# 自动调整布局，防止标签被裁切
-fig.tight_layout()
+from scaling import load_results, scaling_metrics
+
+# 1. 数据来自 scaling.py 生成的 CSV (默认：OpenMP 的测量结果)
+parser = argparse.ArgumentParser(description="Courbes de passage à l'échelle à partir d'un CSV de scaling.py")
+parser.add_argument("csv", nargs="?", default=str(Path(__file__).with_name("scaling_omp.csv")))
+parser.add_argument("--output", help="enregistre les figures (nom de fichier, complété par programme, mode et taille de base) au lieu de les afficher")
+args = parser.parse_args()
+
+# 每个 (程序, 模式, 基准规模) 是一个独立的序列 (与 scaling.py --report 相同)
+for (program, mode, base), table in scaling_metrics(load_results(args.csv)).items():
+    procs = [line["procs"] for line in table]
+    times = [line["time"] for line in table]
+    speedups = [line["speedup"] for line in table]
+    efficiencies = [line["efficiency"] for line in table]
+    karp_flatt = [line["karp_flatt"] for line in table]
+
+    # --- 开始绘图 ---
+
+    # 左图：执行时间和加速比；右图：效率和 Karp-Flatt 串行比例
+    # figsize 用于调整图形的大小
+    fig, (ax1, ax3) = plt.subplots(1, 2, figsize=(16, 7))
+
+    # --- 在主坐标轴 ax1 (左Y轴) 上绘制 "执行时间" ---
+    # 为线条和标签选择一种颜色
+    color_time = 'tab:green'
+    ax1.set_xlabel('Nombre de processus / threads (p)', fontsize=14)
+    ax1.set_ylabel('Temps d\'exécution (s)', fontsize=14)
+    # 绘制执行时间曲线
+    line1 = ax1.plot(procs, times, color=color_time, marker='s', linestyle='-', label='Temps d\'exécution')
+    # 设置左Y轴刻度标签的颜色
+    ax1.tick_params(axis='y', labelcolor=color_time)
+    # 设置X轴刻度，确保所有数据点都清晰显示
+    ax1.set_xticks(procs)
+    ax1.grid(True, linestyle=':') # 添加网格线
+
+    # --- 创建一个共享X轴的次坐标轴 (ax2) 用于 "加速比" ---
+    ax2 = ax1.twinx()
+
+    # --- 在次坐标轴 ax2 (右Y轴) 上绘制 "加速比" (weak 模式下为 scaled speedup) ---
+    # 为线条和标签选择另一种颜色
+    color_speedup = 'tab:blue'
+    ax2.set_ylabel('Accélération' if mode == "strong" else 'Accélération (weak scaling)', fontsize=14)
+    # 绘制实际加速比曲线
+    line2 = ax2.plot(procs, speedups, color=color_speedup, marker='o', linestyle='-', label='Accélération Réelle')
+    # 绘制理想加速比曲线作为对比
+    line3 = ax2.plot(procs, [p / procs[0] for p in procs], color='tab:red', linestyle='--', marker='x', label='Accélération Idéale')
+    # 设置右Y轴刻度标签的颜色
+    ax2.tick_params(axis='y', labelcolor=color_speedup)
+
+    # 合并两个坐标轴的图例
+    lines = line1 + line2 + line3
+    labels = [l.get_label() for l in lines]
+    ax1.legend(lines, labels, loc='upper center', fontsize=12)
+
+    # --- 右图：效率 (左Y轴) 和 Karp-Flatt 串行比例 (右Y轴) ---
+    ax3.set_xlabel('Nombre de processus / threads (p)', fontsize=14)
+    ax3.set_ylabel('Efficacité', fontsize=14)
+    line4 = ax3.plot(procs, efficiencies, color='tab:purple', marker='o', linestyle='-', label='Efficacité')
+    ax3.set_xticks(procs)
+    ax3.set_ylim(bottom=0)
+    ax3.grid(True, linestyle=':')
+    ax4 = ax3.twinx()
+    ax4.set_ylabel('Fraction séquentielle (Karp-Flatt)', fontsize=14)
+    # p = 1 时没有定义 (NaN 点不会被画出)
+    line5 = ax4.plot(procs, karp_flatt, color='tab:orange', marker='^', linestyle='-', label='Karp-Flatt e(p)')
+    lines = line4 + line5
+    ax3.legend(lines, [l.get_label() for l in lines], loc='upper center', fontsize=12)
+
+    # --- 添加标题 ---
+    fig.suptitle(f'Performance de la Parallélisation : {program} ({mode} scaling'
+                 + (f', taille de base {base})' if base != "" else ')'), fontsize=18)
+
+    # 自动调整布局，防止标签被裁切
+    fig.tight_layout()
+
+    if args.output is not None:
+        output = Path(args.output)
+        series = f"{program}_{mode}" + (f"_{base}" if base != "" else "")
+        fig.savefig(output.with_name(f"{output.stem}_{series}{output.suffix or '.png'}"))
 
 # 显示最终的图形
-plt.show()
\ No newline at end of file
+if args.output is None:
+    plt.show()
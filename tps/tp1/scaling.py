@@ -0,0 +1,233 @@
+"""
+Étude de passage à l'échelle (strong / weak scaling) des programmes MPI du dépôt.
+Chaque programme est lancé par `mpiexec -n p` pour chaque p demandé, --repeat fois ; le temps est lu dans la sortie
+standard (ligne de temps du programme, ou ligne JSON contenant la clé --json-key) et ajouté au fichier CSV :
+    program, mode, procs, size, base, run, time
+    - strong : taille totale fixe (--size) ;
+    - weak   : taille proportionnelle à p, c.-à-d. size = --size * p^(1/alpha) où le travail du programme croît
+               comme size^alpha (alpha = 2 pour matvec : N^2 coefficients).
+base est la taille demandée (--size) : chaque (programme, mode, base) forme une série distincte, des études faites à
+des tailles différentes ne sont donc pas mélangées.
+plot.py trace ensuite temps, accélération, efficacité et fraction séquentielle de Karp-Flatt à partir du CSV
+(`python scaling.py --report results.csv` affiche le même tableau sans matplotlib).
+
+Usage :
+    python scaling.py pi --procs 1 2 4 8 --size 100000000 --repeat 3 --csv results.csv
+    python scaling.py matvec_row --mode weak --procs 1 2 4 --size 4096 --csv results.csv
+    python scaling.py --command "python ../tp3/bucket_sort.py {size}" --pattern "Time taken: ([0-9.eE+-]+)" --procs 1 2 4
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+# 仓库中 tps 目录 (各程序的路径相对于它)
+TPS = Path(__file__).resolve().parent.parent
+NUMBER = r"([0-9.]+(?:[eE][+-]?[0-9]+)?)"
+FIELDS = ("program", "mode", "procs", "size", "base", "run", "time")
+
+@dataclass
+class Program:
+    script       : str                # 相对于 tps 的路径
+    args         : tuple = ()         # 参数，{size} 替换为问题规模
+    pattern      : str = None         # 计时行的正则表达式 (第一个分组为时间)
+    size         : int = None         # 默认规模；None 表示程序的规模固定 (只能做 strong scaling)
+    alpha        : float = 1.         # 工作量 ~ size^alpha
+    reduce       : str = "last"       # 多个匹配时：last (最后一个) 或 sum (例如逐代的时间)
+    min_procs    : int = 1            # 最少进程数 (master-slave 需要至少 2 个)
+    divisible    : bool = False       # 规模必须是进程数的倍数
+
+PROGRAMS = {
+    "pi"               : Program("tp1/src/partie2/2.2/pi_mpi.py", ("{size}",), r"Temps pour calculer pi : " + NUMBER,
+                                 size=10**8),
+    "mandelbrot_mpi"   : Program("tp2/mandelbrot_mpi.py", pattern=r"Total time spent.*: " + NUMBER),
+    "mandelbrot_cyclic": Program("tp2/mandelbrot_cyclic.py", pattern=r"Total time spent.*: " + NUMBER),
+    "mandelbrot_ms"    : Program("tp2/mandelbrot_ms.py", pattern=r"Total time spent.*: " + NUMBER, min_procs=2),
+    "matvec_row"       : Program("tp2/matvec_row.py", ("{size}",), r"Parallel computation time: " + NUMBER,
+                                 size=4096, alpha=2., divisible=True),
+    "matvec_col"       : Program("tp2/matvec_col.py", ("{size}",), r"Parallel computation time: " + NUMBER,
+                                 size=4096, alpha=2., divisible=True),
+    "matvec_2d"        : Program("tp2/matvec_2d.py", ("{size}", "--layout", "2d"), r"2d.* : time " + NUMBER,
+                                 size=4096, alpha=2.),
+    "matvec_solvers"   : Program("tp2/matvec_solvers.py", ("{size}", "--solver", "power", "--iterations", "20"),
+                                 r"Time per iteration: mean " + NUMBER, size=4096, alpha=2.),
+    "bucket_sort"      : Program("tp3/bucket_sort.py", ("{size}",), r"Time taken: " + NUMBER, size=10**6),
+    "game_of_life"     : Program("tp4/game_of_life_vect_parall.py", ("glider_gun", "--generations", "{size}"),
+                                 r"Temps calcul prochaine generation : " + NUMBER, size=100, reduce="sum"),
+}
+
+def problem_size(program : Program, base, procs : int, mode : str):
+    """ 给定进程数下的问题规模 (weak 模式下每个进程的工作量保持不变) """
+    if base is None:
+        if mode == "weak":
+            raise ValueError(f"{program.script} has a fixed problem size, weak scaling is not possible")
+        return None
+    size = int(round(base * procs ** (1. / program.alpha))) if mode == "weak" else int(base)
+    if program.divisible:
+        size = -(-size // procs) * procs
+    return size
+
+def parse_time(output : str, pattern=None, json_key="time", reduce="last"):
+    """ 从程序输出中读取时间：优先使用含 json_key 的 JSON 行，否则用 pattern 匹配计时行 """
+    lines = re.split(r"[\r\n]+", output)
+    for line in reversed(lines):
+        line = line.strip()
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if json_key in record:
+                return float(record[json_key])
+    if pattern is None:
+        return None
+    values = [float(match.group(1)) for match in (re.search(pattern, line) for line in lines) if match]
+    if not values:
+        return None
+    return sum(values) if reduce == "sum" else values[-1]
+
+def run(program : Program, procs : int, size, mpiexec, timeout=None, json_key="time", workdir=None):
+    """ 用 mpiexec -n procs 运行一次，返回 (时间, 输出) """
+    args = [a.format(size=size) for a in program.args]
+    script = program.script if os.path.isabs(program.script) else str(TPS / program.script)
+    command = mpiexec + ["-n", str(procs), sys.executable, script] + args
+    # 图形程序 (pygame) 在没有显示器的情况下运行
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", MPLBACKEND="Agg")
+    result = subprocess.run(command, capture_output=True, text=True, timeout=timeout, cwd=workdir, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} failed ({result.returncode}):\n{result.stdout}{result.stderr}")
+    return parse_time(result.stdout, program.pattern, json_key, program.reduce), result.stdout
+
+def load_results(filename):
+    with open(filename, newline="") as f:
+        return list(csv.DictReader(f))
+
+def series_key(row):
+    """
+    (program, mode, base)：一个序列 = 一次基准规模固定的研究。
+    没有 base 列的旧 CSV：strong 模式用 size 代替，weak 模式无法区分。
+    """
+    base = row.get("base")
+    if base is None:
+        base = row["size"] if row["mode"] == "strong" else ""
+    return row["program"], row["mode"], base
+
+def scaling_metrics(rows):
+    """
+    对每个 (program, mode, base) 按进程数取最好时间，返回 {(program, mode, base): 每行一个进程数的字典列表}。
+    base 不同的测量属于不同的研究，分开计算 (见 series_key)。
+    参考点为最小的进程数 p0 (通常为 1)：
+        strong : S(p) = p0.T(p0)/T(p)，E(p) = S(p)/p
+        weak   : E(p) = T(p0)/T(p)，S(p) = p.E(p) (scaled speedup)
+        Karp-Flatt : e(p) = (1/S - 1/p)/(1 - 1/p)，实验测得的串行比例 (p > 1)。
+        e 随 p 增加说明开销 (通信、负载不均衡) 在增长，而不是固有的串行部分。
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(series_key(row), {}).setdefault(int(row["procs"]), []).append(
+            (float(row["time"]), row["size"]))
+    metrics = {}
+    for key, by_procs in groups.items():
+        procs = sorted(by_procs)
+        best = {p: min(by_procs[p]) for p in procs}
+        p0, (t0, _) = procs[0], best[procs[0]]
+        table = []
+        for p in procs:
+            t, size = best[p]
+            if key[1] == "weak":
+                efficiency = t0 / t
+                speedup = p / p0 * efficiency
+            else:
+                speedup = p0 * t0 / t
+                efficiency = speedup / p
+            karp_flatt = (1. / speedup - 1. / p) / (1. - 1. / p) if p > 1 and p0 == 1 else float("nan")
+            table.append({"procs": p, "size": size, "time": t, "runs": len(by_procs[p]),
+                          "speedup": speedup, "efficiency": efficiency, "karp_flatt": karp_flatt})
+        metrics[key] = table
+    return metrics
+
+def report(metrics):
+    for (program, mode, base), table in metrics.items():
+        print(f"{program} ({mode}" + (f", base size {base})" if base != "" else ")"))
+        print(f"{'p':>5} {'size':>12} {'time (s)':>12} {'speedup':>9} {'efficiency':>11} {'Karp-Flatt':>11}")
+        for line in table:
+            print(f"{line['procs']:>5} {line['size']:>12} {line['time']:>12.6f} {line['speedup']:>9.3f} "
+                  f"{line['efficiency']:>11.3f} {line['karp_flatt']:>11.4f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Étude de strong / weak scaling des programmes MPI")
+    parser.add_argument("program", nargs="?", choices=sorted(PROGRAMS), help="programme prédéfini")
+    parser.add_argument("--command", help="commande à lancer à la place d'un programme prédéfini "
+                                          "(\"python script.py {size} ...\", chemin relatif au répertoire courant)")
+    parser.add_argument("--pattern", help="expression régulière de la ligne de temps (premier groupe : le temps)")
+    parser.add_argument("--json-key", default="time", help="clé du temps dans une ligne de sortie JSON")
+    parser.add_argument("--alpha", type=float, help="travail ~ size^alpha (pour le weak scaling)")
+    parser.add_argument("--mode", choices=("strong", "weak", "both"), default="strong")
+    parser.add_argument("--procs", type=int, nargs="+", default=[1, 2, 4, 8], help="nombres de processus")
+    parser.add_argument("--size", type=float, help="taille totale (strong) ou taille pour p = 1 (weak)")
+    parser.add_argument("--repeat", type=int, default=3, help="nombre d'exécutions pour chaque p")
+    parser.add_argument("--mpiexec", default="mpiexec", help="lanceur MPI et ses options, ex. \"mpiexec --oversubscribe\"")
+    parser.add_argument("--timeout", type=float, help="durée maximale d'une exécution (s)")
+    parser.add_argument("--csv", default="scaling.csv", help="fichier CSV de résultats (les lignes sont ajoutées)")
+    parser.add_argument("--report", metavar="CSV", help="affiche accélération, efficacité et Karp-Flatt d'un CSV et quitte")
+    args = parser.parse_args()
+
+    if args.report is not None:
+        report(scaling_metrics(load_results(args.report)))
+        sys.exit(0)
+    if args.command is not None:
+        words = shlex.split(args.command)
+        if words and os.path.basename(words[0]).startswith("python"):
+            words = words[1:]
+        name = Path(words[0]).stem
+        if args.size is None and any("{size}" in word for word in words[1:]):
+            parser.error("--size is required when --command contains {size}")
+        program = Program(str(Path(words[0]).resolve()), tuple(words[1:]), args.pattern,
+                          size=None, alpha=args.alpha or 1.)
+    elif args.program is not None:
+        name, program = args.program, PROGRAMS[args.program]
+        if args.pattern is not None:
+            program.pattern = args.pattern
+        if args.alpha is not None:
+            program.alpha = args.alpha
+    else:
+        parser.error("a program name or --command is required")
+    base = args.size if args.size is not None else program.size
+    base_column = "" if base is None else str(int(base)) if float(base).is_integer() else str(base)
+
+    modes = ("strong", "weak") if args.mode == "both" else (args.mode,)
+    new_file = not os.path.exists(args.csv) or os.path.getsize(args.csv) == 0
+    if not new_file:
+        with open(args.csv, newline="") as f:
+            if tuple(next(csv.reader(f), ())) != FIELDS:
+                parser.error(f"{args.csv} does not have the columns {','.join(FIELDS)}, use another --csv file")
+    rows = []
+    # 在临时目录中运行，程序输出的文件 (图像、output*.txt) 不会留在仓库里
+    with open(args.csv, "a", newline="") as f, tempfile.TemporaryDirectory() as workdir:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(FIELDS)
+        for mode in modes:
+            for procs in args.procs:
+                if procs < program.min_procs:
+                    print(f"{name}: skipping p = {procs} (at least {program.min_procs} processes required)")
+                    continue
+                size = problem_size(program, base, procs, mode)
+                for r in range(args.repeat):
+                    elapsed, output = run(program, procs, size, shlex.split(args.mpiexec), args.timeout,
+                                          args.json_key, workdir)
+                    if elapsed is None:
+                        raise RuntimeError(f"no timing line found in the output of {name}:\n{output}")
+                    row = [name, mode, procs, size if size is not None else "", base_column, r, elapsed]
+                    writer.writerow(row)
+                    f.flush()
+                    rows.append(dict(zip(FIELDS, map(str, row))))
+                    print(f"{name} {mode} p={procs} size={size} run {r}: {elapsed:.6f} s")
+    report(scaling_metrics(rows))
@@ -1,4 +1,5 @@
 from mpi4py import MPI
+import argparse
 import time
 import numpy as np
 
@@ -6,28 +7,85 @@ comm = MPI.COMM_WORLD
 nbp = comm.Get_size()  # 总进程数
 rank = comm.Get_rank() # 当前进程编号
 
-# 总样本数
-total_samples = 1000000000
+def positive_int(text):
+    """ argparse 类型：至少为 1 的整数 """
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"{text} must be at least 1")
+    return value
 
-# 每个进程负责的样本数
-samples_per_process = total_samples // nbp
+parser = argparse.ArgumentParser(description="Estimation de pi par Monte-Carlo, échantillons traités par paquets")
+parser.add_argument("total_samples", nargs="?", type=positive_int, default=1000000000,
+                    help="nombre total d'échantillons (maximum si --target est donné)")
+parser.add_argument("--chunk", type=positive_int, default=2**20, help="taille des paquets d'échantillons par processus")
+parser.add_argument("--dtype", choices=("float64", "float32"), default="float64", help="précision des tirages")
+parser.add_argument("--target", type=float, default=0.,
+                    help="erreur standard visée : arrêt dès qu'elle est atteinte (0 : tous les échantillons)")
+parser.add_argument("--check-every", type=positive_int, default=16,
+                    help="nombre de paquets entre deux réductions globales (estimation courante)")
+parser.add_argument("--seed", type=int, default=None, help="graine (les flux des processus en sont dérivés)")
+parser.add_argument("--verbose", action="store_true", help="affiche l'estimation courante à chaque réduction")
+args = parser.parse_args()
 
+total_samples = args.total_samples
+
+def estimate(hits, samples):
+    """ pi ≈ 4p，p = hits/samples 是命中率；标准误差 4*sqrt(p(1-p)/samples) """
+    p = hits / samples
+    return 4. * p, 4. * np.sqrt(p * (1. - p) / samples)
+
+# 每个进程负责的样本数 (前 total_samples % nbp 个进程多一个)
+samples_per_process = total_samples // nbp + (1 if rank < total_samples % nbp else 0)
+# 所有进程执行相同的轮数 (按样本最多的进程计)，样本用完的进程以 0 个样本参加归约
+max_per_process = -(-total_samples // nbp)
+nb_rounds = -(-max_per_process // (args.chunk * args.check_every))
+
+# 每个进程有独立的随机数流 (由同一个 SeedSequence 派生，互不重叠)
+# 没有给定种子时，由 rank 0 生成熵再广播，保证各进程的流来自同一个 SeedSequence
+entropy = args.seed if args.seed is not None else comm.bcast(np.random.SeedSequence().entropy if rank == 0 else None, root=0)
+rng = np.random.default_rng(np.random.SeedSequence(entropy).spawn(nbp)[rank])
+
+# 预先分配的缓冲区：内存占用与总样本数无关，只取决于 --chunk
+x = np.empty(args.chunk, dtype=args.dtype)
+y = np.empty(args.chunk, dtype=args.dtype)
+inside = np.empty(args.chunk, dtype=bool)
+local = np.zeros(2, dtype=np.int64)  # (本进程命中数, 本进程样本数)
+total = np.zeros(2, dtype=np.int64)
+
+comm.Barrier()
 if rank == 0:
     beg = time.time()
 
-# --- 每个进程独立计算自己的部分 ---
-# 注意：并行化后，每个进程创建的数组变小了，节省了单核内存压力
-x = 2. * np.random.random_sample((samples_per_process,)) - 1.
-y = 2. * np.random.random_sample((samples_per_process,)) - 1.
-local_sum = np.sum(x*x + y*y < 1.)
-
-# --- 汇总结果 ---
-# 使用 MPI 的 reduce 操作将所有进程的 local_sum 相加，结果汇总到 rank 0
-total_sum = comm.reduce(local_sum, op=MPI.SUM, root=0)
+# --- 每个进程按块流式处理自己的样本 ---
+# 在 [0,1)^2 中取点，落在四分之一圆内的比例同样是 pi/4，省去 2x-1 的变换
+remaining = samples_per_process
+for _ in range(nb_rounds):
+    for _ in range(args.check_every):
+        m = min(args.chunk, remaining)
+        if m == 0:
+            break
+        xm, ym, im = x[:m], y[:m], inside[:m]
+        rng.random(out=xm, dtype=args.dtype)
+        rng.random(out=ym, dtype=args.dtype)
+        np.multiply(xm, xm, out=xm)
+        np.multiply(ym, ym, out=ym)
+        xm += ym
+        np.less(xm, 1., out=im)
+        local[0] += np.count_nonzero(im)
+        local[1] += m
+        remaining -= m
+    # --- 汇总当前结果 (int64，不会像 float 累加那样丢失精度) ---
+    comm.Allreduce(local, total, op=MPI.SUM)
+    approx_pi, std_error = estimate(*total)
+    if args.verbose and rank == 0:
+        print(f"{total[1]} échantillons : pi ≈ {approx_pi:.10f} ± {std_error:.2e}")
+    # 所有进程看到相同的 total，所以会在同一轮一起停止
+    if args.target > 0. and std_error <= args.target:
+        break
 
 if rank == 0:
-    approx_pi = 4. * total_sum / (samples_per_process * nbp)
     end = time.time()
     print(f"Total Processes: {nbp}")
     print(f"Temps pour calculer pi : {end - beg} secondes")
-    print(f"Pi vaut environ {approx_pi}")
\ No newline at end of file
+    print(f"Pi vaut environ {approx_pi} (erreur standard {std_error:.2e}, {total[1]} échantillons, "
+          f"écart à pi {abs(approx_pi - np.pi):.2e})")
@@ -42,8 +42,8 @@ scaleX, scaleY = 3./width, 2.25/height
 
 # 信号常量
 TAG_TASK = 1     # 发送任务
-TAG_RESULT = 2   # 接收结果
 TAG_DONE = 3     # 终止信号
+TAG_ROW0 = 10    # 结果的标签为 TAG_ROW0 + 行号：主进程据此直接把整行收进图像，不经过 pickle
 
 if rank == 0:
     # --- MASTER 逻辑 ---
@@ -62,13 +62,13 @@ if rank == 0:
     # 2. 动态分发循环
     while rows_received < height:
         status = MPI.Status()
-        # 接收任何一个 Slave 传回的整行结果
-        row_data = comm.recv(source=MPI.ANY_SOURCE, tag=TAG_RESULT, status=status)
+        # 探测任何一个 Slave 传回的整行结果，行号由标签给出
+        comm.Probe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status)
         slave_p = status.Get_source()
+        row_idx = status.Get_tag() - TAG_ROW0
         
-        # 记录结果（row_data 包含 [行号, 该行数组]）
-        row_idx, row_values = row_data
-        full_image[row_idx] = row_values
+        # 用缓冲区接口直接接收到图像的对应行 (没有中间拷贝)
+        comm.Recv([full_image[row_idx], MPI.DOUBLE], source=slave_p, tag=status.Get_tag())
         rows_received += 1
         
         # 如果还有任务，就发给刚空闲的这个 Slave
@@ -90,6 +90,7 @@ if rank == 0:
 
 else:
     # --- SLAVE 逻辑 ---
+    row_values = np.empty(width, dtype=np.double)
     while True:
         status = MPI.Status()
         # 等待任务
@@ -99,12 +100,11 @@ else:
             break
             
         y = task
-        row_values = np.empty(width, dtype=np.double)
         for x in range(width):
             c = complex(-2. + scaleX*x, -1.125 + scaleY * y)
             row_values[x] = mandelbrot_set.convergence(c)
         
-        # 发回 [行号, 数据]
-        comm.send([y, row_values], dest=0, tag=TAG_RESULT)
+        # 发回该行数据，标签带行号
+        comm.Send([row_values, MPI.DOUBLE], dest=0, tag=TAG_ROW0 + y)
 
 MPI.Finalize()
\ No newline at end of file
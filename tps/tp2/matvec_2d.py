@@ -0,0 +1,133 @@
+"""
+矩阵-向量乘积 v = A.u 的三种分布方式比较 (A[j, i] = (i + j) % N + 1)：
+    - row : 每个进程有 A 的一组行和完整的 u，最后 Allgather(v)，每个进程收到约 N 个数
+    - col : 每个进程有 A 的一组列和 u 的对应部分，最后 Allreduce 长度为 N 的部分和，每个进程收发约 2N 个数
+    - 2d  : pr x pc 进程网格，进程 (r, c) 有块 A[R_r, C_c]。u 的分段 u[C_c] 起初在第 0 行的进程上，
+            沿列通信子广播 (Bcast)；局部乘积沿行通信子归约 (Reduce) 到第 0 列，v[R_r] 在进程 (r, 0) 上。
+            总通信量约 (pr + pc - 2)N，而 row/col 约为 (p - 1)N / 2(p - 1)N，每个进程只收发 N/pr + N/pc 量级的数
+--cyclic nb 选择块循环分布：行 (列) 分成大小为 nb 的块，第 k 块属于网格的第 k % pr 行 (k % pc 列)。
+通信量为按算法计算的模型值 (收到的数据量，单位 Mo)，时间为各进程最大值中 --repeat 次的最小值。
+
+用法：
+    mpiexec -np 16 python matvec_2d.py 16384 --layout all
+    mpiexec -np 16 python matvec_2d.py 16384 --layout 2d --grid 2 8 --cyclic 64
+"""
+import argparse
+import numpy as np
+from mpi4py import MPI
+from matvec_operator import assemble_block, matvec_free
+
+LAYOUTS = ("row", "col", "2d")
+
+def owned_indices(N, nb_parts, part, cyclic=0):
+    """ 第 part 部分的全局下标：连续分块 (cyclic = 0) 或块大小为 cyclic 的块循环分布 """
+    if cyclic > 0:
+        indices = np.arange(N)
+        return indices[(indices // cyclic) % nb_parts == part]
+    return np.array_split(np.arange(N), nb_parts)[part]
+
+def timed(comm, operation, repeat):
+    """ 重复 repeat 次，返回 (最后一次的结果, 各进程最大时间中的最小值) """
+    best = np.inf
+    for _ in range(repeat):
+        comm.Barrier()
+        start = MPI.Wtime()
+        result = operation()
+        best = min(best, comm.allreduce(MPI.Wtime() - start, op=MPI.MAX))
+    return result, best
+
+def matvec_row(comm, N, repeat, cyclic=0):
+    """ 行划分。返回 (本进程的 (下标, v 的部分), 时间, 通信量 (数的个数)) """
+    nbp, rank = comm.Get_size(), comm.Get_rank()
+    rows = owned_indices(N, nbp, rank, cyclic)
+    A_local = assemble_block(rows, np.arange(N), N)
+    u = np.arange(1., N + 1.)
+    counts = np.array(comm.allgather(len(rows)))
+    displs = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    all_rows = np.concatenate(comm.allgather(rows))
+    def operation():
+        v_segment = A_local.dot(u)
+        v_gathered = np.empty(N)
+        comm.Allgatherv(v_segment, [v_gathered, counts, displs, MPI.DOUBLE])
+        v = np.empty(N)
+        v[all_rows] = v_gathered # 块循环分布时恢复全局顺序
+        return v
+    v, elapsed = timed(comm, operation, repeat)
+    return (rows, v[rows]), elapsed, (nbp - 1) * N
+
+def matvec_col(comm, N, repeat, cyclic=0):
+    """ 列划分 """
+    nbp, rank = comm.Get_size(), comm.Get_rank()
+    cols = owned_indices(N, nbp, rank, cyclic)
+    A_local = assemble_block(np.arange(N), cols, N)
+    u_local = cols + 1.
+    def operation():
+        v_local = A_local.dot(u_local)
+        v = np.empty(N)
+        comm.Allreduce(v_local, v, op=MPI.SUM)
+        return v
+    v, elapsed = timed(comm, operation, repeat)
+    rows = owned_indices(N, nbp, rank)
+    return (rows, v[rows]), elapsed, 2 * (nbp - 1) * N
+
+def matvec_2d(comm, N, repeat, grid=None, cyclic=0):
+    """ 二维网格划分：沿列广播 u 的分段，沿行归约局部乘积 """
+    nbp, rank = comm.Get_size(), comm.Get_rank()
+    pr, pc = grid if grid is not None else MPI.Compute_dims(nbp, 2)
+    r, c = divmod(rank, pc)
+    row_comm = comm.Split(r, c) # 同一行的进程 (沿行归约)
+    col_comm = comm.Split(c, r) # 同一列的进程 (沿列广播)
+    rows = owned_indices(N, pr, r, cyclic)
+    cols = owned_indices(N, pc, c, cyclic)
+    A_local = assemble_block(rows, cols, N)
+    u_segment = cols + 1. if r == 0 else np.empty(len(cols))
+    v_segment = np.empty(len(rows)) if c == 0 else None
+    def operation():
+        col_comm.Bcast(u_segment, root=0)
+        y = A_local.dot(u_segment)
+        row_comm.Reduce(y, v_segment, op=MPI.SUM, root=0)
+        return v_segment
+    v_segment, elapsed = timed(comm, operation, repeat)
+    row_comm.Free()
+    col_comm.Free()
+    if c != 0:
+        rows, v_segment = rows[:0], np.empty(0)
+    return (rows, v_segment), elapsed, (pr + pc - 2) * N, (pr, pc)
+
+if __name__ == "__main__":
+    comm = MPI.COMM_WORLD
+    nbp = comm.Get_size()
+    rank = comm.Get_rank()
+
+    parser = argparse.ArgumentParser(description="Produit matrice-vecteur : distribution par lignes, colonnes ou 2D")
+    parser.add_argument("N", nargs="?", type=int, default=16384, help="dimension du problème")
+    parser.add_argument("--layout", choices=LAYOUTS + ("all",), default="all")
+    parser.add_argument("--grid", nargs=2, type=int, help="dimensions pr pc de la grille 2D (pr*pc = nombre de processus)")
+    parser.add_argument("--cyclic", type=int, default=0, help="taille de bloc de la distribution bloc-cyclique (0 : blocs contigus)")
+    parser.add_argument("--repeat", type=int, default=5, help="nombre de produits chronométrés")
+    args = parser.parse_args()
+    N = args.N
+    if args.grid is not None and args.grid[0] * args.grid[1] != nbp:
+        if rank == 0:
+            print("Error: pr*pc must be equal to nbp")
+        comm.Abort()
+
+    reference = matvec_free(np.arange(1., N + 1.), 0, np.arange(N), N) if rank == 0 else None
+    for layout in (LAYOUTS if args.layout == "all" else (args.layout,)):
+        grid = ""
+        if layout == "row":
+            (rows, v), elapsed, volume = matvec_row(comm, N, args.repeat, args.cyclic)
+        elif layout == "col":
+            (rows, v), elapsed, volume = matvec_col(comm, N, args.repeat, args.cyclic)
+        else:
+            (rows, v), elapsed, volume, (pr, pc) = matvec_2d(comm, N, args.repeat, args.grid, args.cyclic)
+            grid = f" {pr}x{pc}"
+        # 检查 (不计时)：把分布的结果收集到 rank 0
+        pieces = comm.gather((rows, v), root=0)
+        if rank == 0:
+            v_final = np.empty(N)
+            for piece_rows, piece in pieces:
+                v_final[piece_rows] = piece
+            error = np.abs(v_final - reference).max() / np.abs(reference).max()
+            print(f"{layout + grid:>8} : time {elapsed:.6f} s, communication volume {volume * 8 / 2**20:.2f} Mo "
+                  f"({volume * 8 / 2**20 / nbp:.2f} Mo per process), max relative error {error:.2e}")
@@ -1,12 +1,20 @@
+import argparse
 import numpy as np
 from mpi4py import MPI
+from matvec_operator import OPERATORS, assemble_block, matvec_free, matvec_fft
 
 comm = MPI.COMM_WORLD
 nbp = comm.Get_size()
 rank = comm.Get_rank()
 
+parser = argparse.ArgumentParser(description="Produit matrice-vecteur parallèle")
+parser.add_argument("N", nargs="?", type=int, default=16384, help="dimension du problème")
+parser.add_argument("--operator", choices=OPERATORS, default="dense",
+                    help="dense : bloc de A assemblé ; free : sans matrice (sommes cumulées) ; fft : sans matrice (FFT)")
+args = parser.parse_args()
+
 # 总维度
-N = 16384
+N = args.N
 
 # 1. 计算 Nloc
 if N % nbp != 0:
@@ -21,13 +29,16 @@ Nloc = N // nbp
 start_col = rank * Nloc
 end_col = (rank + 1) * Nloc
 
-# 组装局部矩阵 A_local (形状: N x Nloc)
+setup_start = MPI.Wtime()
+cols = np.arange(start_col, end_col)
+# 组装局部矩阵 A_local (形状: N x Nloc)：向量化组装，直接写入预先分配的数组
 # 注意：j 对应行索引(0..N-1)，i 对应全局列索引(start..end)
-A_local = np.array([[(i + j) % N + 1. for i in range(start_col, end_col)] 
-                    for j in range(N)])
+if args.operator == "dense":
+    A_local = assemble_block(np.arange(N), cols, N, out=np.empty((N, Nloc)))
 
 # 组装局部向量 u_local (长度: Nloc)
-u_local = np.array([i + 1. for i in range(start_col, end_col)])
+u_local = cols + 1.
+setup_time = MPI.Wtime() - setup_start
 
 # 开始计时
 comm.Barrier()
@@ -35,7 +46,12 @@ start_time = MPI.Wtime()
 
 # 3. 计算局部贡献 (Partial Sum)
 # 结果是一个长度为 N 的向量
-v_local = A_local.dot(u_local)
+if args.operator == "dense":
+    v_local = A_local.dot(u_local)
+elif args.operator == "free":
+    v_local = matvec_free(u_local, start_col, np.arange(N), N)
+else:
+    v_local = matvec_fft(u_local, start_col, np.arange(N), N)
 
 # 4. 全局汇总：将所有进程的部分和相加，并将结果分发给所有人
 v_final = np.zeros(N, dtype=np.double)
@@ -47,4 +63,8 @@ end_time = MPI.Wtime()
 # 5. 输出结果
 if rank == 0:
     print(f"Number of processes: {nbp}")
-    print(f"Parallel computation time: {end_time - start_time:.6f} s")
\ No newline at end of file
+    print(f"Operator: {args.operator}, setup time: {setup_time:.6f} s")
+    print(f"Parallel computation time: {end_time - start_time:.6f} s")
+    # 用 O(N) 的公式检查结果
+    reference = matvec_free(np.arange(1., N + 1.), 0, np.arange(N), N)
+    print(f"Max relative error: {np.abs(v_final - reference).max() / np.abs(reference).max():.2e}")
@@ -0,0 +1,64 @@
+"""
+矩阵 A[j, i] = (i + j) % N + 1 的组装与乘法，供 matvec_row.py 和 matvec_col.py 共用。
+    - assemble_block : 向量化组装 A 的一个块 (np.add.outer 后减去 N 取模，原地写入预先分配的数组)，
+                       代替逐元素的 Python 列表推导
+    - matvec_free    : 不存矩阵，利用 A 的结构用前缀和在 O(N) 内计算 A.u 的一部分
+    - matvec_fft     : 不存矩阵，A.u 是循环互相关，用 FFT 在 O(N log N) 内计算
+blocked_dot 是稠密块的局部乘积核：float32 存储、float64 累加，可同时乘多个右端项。
+三个乘法函数都处理同一种情形：u_block 是 u 在列 col_start .. col_start+len(u_block)-1 上的部分，
+结果为 v = A[rows, cols].u_block (行方向划分时 u_block 为整个 u，列方向划分时 rows 为全部行)。
+"""
+import numpy as np
+
+OPERATORS = ("dense", "free", "fft")
+
+def assemble_block(rows, cols, N, out=None):
+    """
+    A[rows, cols] 写入 out (形状 len(rows) x len(cols) 的 float64 数组，None 时新分配)。
+    0 <= i + j < 2N，所以取模只需把大于 N 的元素减去 N (比浮点 np.remainder 快得多)。
+    """
+    if out is None:
+        out = np.empty((len(rows), len(cols)), dtype=np.float64)
+    np.add.outer(np.asarray(rows, dtype=np.float64) + 1., np.asarray(cols, dtype=np.float64), out=out)
+    np.subtract(out, N, out=out, where=out > N)
+    return out
+
+def matvec_free(u_block, col_start, rows, N):
+    """
+    (i + j) % N = i + j - N*[i >= N - j]，所以
+        v_j = (j + 1)*S + T - N * (列 i >= N - j 上 u_i 的和)
+    其中 S = sum u_i，T = sum i*u_i，最后一项由 u_block 的后缀和查表得到。
+    """
+    rows = np.asarray(rows)
+    cols = col_start + np.arange(len(u_block))
+    S = u_block.sum()
+    T = cols.dot(u_block)
+    # suffix[k] = u_block[k:] 的和，suffix[len] = 0
+    suffix = np.zeros(len(u_block) + 1)
+    suffix[:-1] = np.cumsum(u_block[::-1])[::-1]
+    first = np.clip(N - rows - col_start, 0, len(u_block)) # 第一个满足 i + j >= N 的局部列下标
+    return (rows + 1.) * S + T - N * suffix[first]
+
+def matvec_fft(u_block, col_start, rows, N):
+    """ v_j = sum_i c[(i + j) % N] u_i，c[k] = k + 1：循环互相关，其傅里叶变换为 C * conj(U) """
+    u = np.zeros(N)
+    u[col_start:col_start + len(u_block)] = u_block
+    c = np.arange(1., N + 1.)
+    return np.fft.irfft(np.fft.rfft(c) * np.conj(np.fft.rfft(u)), n=N)[rows]
+
+def blocked_dot(A_local, U, out, tile_bytes=2**20):
+    """
+    out = A_local.U，A_local 可以用 float32 存储 (从内存读取的字节数减半)，累加用 float64：
+    每次把 A_local 的若干行转换到一个约 tile_bytes 大小、留在缓存中的 float64 缓冲区，再调用 BLAS。
+    U 可以是向量或 N x k 矩阵 (k 个右端项一起做矩阵-矩阵乘积，A 只读一遍)。
+    """
+    if A_local.dtype == np.float64:
+        return np.dot(A_local, U, out=out)
+    nb_rows = max(1, tile_bytes // (8 * A_local.shape[1]))
+    tile = np.empty((nb_rows, A_local.shape[1]))
+    for start in range(0, A_local.shape[0], nb_rows):
+        end = min(start + nb_rows, A_local.shape[0])
+        block = tile[:end - start]
+        block[:] = A_local[start:end]
+        np.dot(block, U, out=out[start:end])
+    return out
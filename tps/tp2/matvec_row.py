@@ -1,12 +1,37 @@
+import argparse
 import numpy as np
 from mpi4py import MPI
+from matvec_operator import OPERATORS, assemble_block, blocked_dot, matvec_free, matvec_fft
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
 
 comm = MPI.COMM_WORLD
 nbp = comm.Get_size()
 rank = comm.Get_rank()
 
+parser = argparse.ArgumentParser(description="Produit matrice-vecteur parallèle")
+parser.add_argument("N", nargs="?", type=int, default=16384, help="dimension du problème")
+parser.add_argument("--operator", choices=OPERATORS, default="dense",
+                    help="dense : bloc de A assemblé ; free : sans matrice (sommes cumulées) ; fft : sans matrice (FFT)")
+parser.add_argument("--dtype", choices=("float64", "float32"), default="float64",
+                    help="stockage du bloc de A (float32 : moitié moins d'octets lus, accumulation en float64)")
+parser.add_argument("--threads", type=int, help="nombre de threads BLAS par processus (nécessite threadpoolctl)")
+parser.add_argument("--rhs", type=int, default=1, help="nombre de seconds membres traités ensemble (produit matrice-matrice)")
+parser.add_argument("--repeat", type=int, default=1, help="nombre de produits chronométrés (on garde le meilleur)")
+args = parser.parse_args()
+
+# 混合模式：限制每个进程的 BLAS 线程数 (进程数 x 线程数 <= 核数)
+if args.threads is not None:
+    if threadpool_limits is None:
+        if rank == 0:
+            print("Warning: threadpoolctl is not installed, --threads is ignored")
+    else:
+        threadpool_limits(limits=args.threads, user_api="blas")
+
 # 总维度
-N = 16384 
+N = args.N
 
 # 1. 计算 Nloc
 if N % nbp != 0:
@@ -21,30 +46,63 @@ Nloc = N // nbp
 start_row = rank * Nloc
 end_row = (rank + 1) * Nloc
 
-# 组装局部矩阵 A_local (形状: Nloc x N)
+setup_start = MPI.Wtime()
+rows = np.arange(start_row, end_row)
+# 组装局部矩阵 A_local (形状: Nloc x N)：向量化组装，直接写入预先分配的数组
 # 注意：j 对应局部行索引(从全局的 start..end)，i 对应列索引(0..N-1)
-A_local = np.array([[(i + j) % N + 1. for i in range(N)] 
-                    for j in range(start_row, end_row)])
+if args.operator == "dense":
+    A_local = assemble_block(rows, np.arange(N), N, out=np.empty((Nloc, N))).astype(args.dtype, copy=False)
 
 # 组装完整的向量 u (每个进程都需要完整副本进行局部计算)
-u = np.array([i + 1. for i in range(N)])
+# 多个右端项时 u 为 N x rhs 矩阵，第 c 列为 (c+1)*(1, ..., N)，结果的第 c 列为 (c+1)*v
+u = np.arange(1., N + 1.)
+if args.rhs > 1:
+    u = np.outer(u, np.arange(1., args.rhs + 1.))
+v_segment = np.empty((Nloc,) + u.shape[1:])
+v_final = np.empty((N,) + u.shape[1:], dtype=np.double)
+setup_time = MPI.Wtime() - setup_start
 
-# 开始计时
-comm.Barrier()
-start_time = MPI.Wtime()
+def local_product():
+    """ 3. 计算局部结果片段 (Local Segment)：长度为 Nloc (x rhs)，它是 v 的一部分 """
+    if args.operator == "dense":
+        return blocked_dot(A_local, u, v_segment)
+    operator = matvec_free if args.operator == "free" else matvec_fft
+    if args.rhs == 1:
+        v_segment[:] = operator(u, 0, rows, N)
+    else:
+        for c in range(args.rhs):
+            v_segment[:, c] = operator(u[:, c], 0, rows, N)
+    return v_segment
 
-# 3. 计算局部结果片段 (Local Segment)
-# 结果是一个长度为 Nloc 的向量，它是 v 的一部分
-v_segment = A_local.dot(u)
+best_time = best_kernel = np.inf
+for _ in range(args.repeat):
+    # 开始计时
+    comm.Barrier()
+    start_time = MPI.Wtime()
+    local_product()
+    kernel_time = MPI.Wtime() - start_time
 
-# 4. 全局汇总：收集所有进程的片段，使每个人都拥有完整的 v (长度为 N)
-v_final = np.empty(N, dtype=np.double)
-# Allgather 会自动根据 rank 顺序拼接数据
-comm.Allgather(v_segment, v_final)
+    # 4. 全局汇总：收集所有进程的片段，使每个人都拥有完整的 v (长度为 N)
+    # Allgather 会自动根据 rank 顺序拼接数据
+    comm.Allgather(v_segment, v_final)
 
-end_time = MPI.Wtime()
+    end_time = MPI.Wtime()
+    best_time = min(best_time, comm.allreduce(end_time - start_time, op=MPI.MAX))
+    best_kernel = min(best_kernel, comm.allreduce(kernel_time, op=MPI.MAX))
 
 # 5. 输出结果
 if rank == 0:
     print(f"Number of processes: {nbp}")
-    print(f"Parallel computation time: {end_time - start_time:.6f} s")
\ No newline at end of file
+    print(f"Operator: {args.operator}, setup time: {setup_time:.6f} s")
+    print(f"Parallel computation time: {best_time:.6f} s (local kernel: {best_kernel:.6f} s)")
+    if args.operator == "dense":
+        # 全局的浮点运算数和从内存读取的 A 的字节数，按最慢进程的局部计算时间计
+        flops = 2. * N * N * args.rhs
+        bytes_read = N * N * np.dtype(args.dtype).itemsize
+        print(f"Storage: {args.dtype}, right-hand sides: {args.rhs}, "
+              f"{flops / best_kernel / 1e9:.2f} GFLOP/s, {bytes_read / best_kernel / 1e9:.2f} GB/s (matrix reads)")
+    # 用 O(N) 的公式检查结果
+    reference = matvec_free(np.arange(1., N + 1.), 0, np.arange(N), N)
+    if args.rhs > 1:
+        reference = np.outer(reference, np.arange(1., args.rhs + 1.))
+    print(f"Max relative error: {np.abs(v_final - reference).max() / np.abs(reference).max():.2e}")
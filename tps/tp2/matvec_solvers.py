@@ -0,0 +1,239 @@
+"""
+在迭代算法中反复使用的分布式矩阵-向量乘积 (A[j, i] = (i + j) % N + 1，对称矩阵)。
+向量按连续分段分布在各进程上 (与 matvec_2d.owned_indices 相同的划分)。
+    - DistributedOperator : 按行或按列划分的算子，所有缓冲区 (输入段、halo/部分和、结果) 只分配一次。
+        行划分：Allgatherv 收集完整的 u (halo)，再做局部乘积；
+        列划分：局部乘积得到长度为 N 的部分和，Reduce_scatter 直接把求和后的结果分段发给各进程
+        (只需要自己的一段，比 Allreduce 整个向量的通信量少一半)。
+      MPI-4 实现上使用持久集合通信请求 (Allgatherv_init / Reduce_scatter_init)，否则用同样的缓冲区调用阻塞版本。
+    - power_iteration    : 幂迭代，求最大特征值
+    - lanczos            : Lanczos 迭代，三对角矩阵的特征值逼近 A 的极端特征值
+    - conjugate_gradient : 共轭梯度法解 (A + shift*I) x = b。A 不定，shift 取 Gershgorin 界 N(N+1)/2 使矩阵正定。
+      pipelined=True 时使用流水线 CG (Ghysels & Vanroose)：每次迭代只有一次 Iallreduce，与下一次矩阵-向量乘积重叠。
+每个驱动函数返回每次迭代的时间。
+
+用法：
+    mpiexec -np 4 python matvec_solvers.py 16384 --layout col --solver cg --iterations 50
+"""
+import argparse
+import numpy as np
+from mpi4py import MPI
+from matvec_operator import OPERATORS, assemble_block, matvec_free
+
+class DistributedOperator:
+    """ y = (A + shift*I).x，x 和 y 是本进程的一段 (长度 nloc，从全局下标 start 开始) """
+    def __init__(self, comm, N, layout="row", operator="dense", shift=0.):
+        self.comm = comm
+        self.N = N
+        self.layout = layout
+        self.operator = operator
+        self.shift = shift
+        nbp, rank = comm.Get_size(), comm.Get_rank()
+        self.counts = np.array([N // nbp + (1 if p < N % nbp else 0) for p in range(nbp)])
+        self.displs = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+        self.start = int(self.displs[rank])
+        self.nloc = int(self.counts[rank])
+        self.indices = np.arange(self.start, self.start + self.nloc)
+        # 预先分配的缓冲区，持久请求绑定在这些缓冲区上
+        self.x = np.empty(self.nloc)
+        self.y = np.empty(self.nloc)
+        if layout == "row":
+            self.halo = np.empty(N)
+            self.A_local = assemble_block(self.indices, np.arange(N), N) if operator == "dense" else None
+            self.args = ([self.x, MPI.DOUBLE], [self.halo, self.counts, self.displs, MPI.DOUBLE])
+            init = comm.Allgatherv_init
+        else:
+            self.partial = np.empty(N)
+            self.A_local = assemble_block(np.arange(N), self.indices, N) if operator == "dense" else None
+            self.args = ([self.partial, MPI.DOUBLE], [self.y, MPI.DOUBLE], self.counts)
+            init = comm.Reduce_scatter_init
+        try:
+            self.request = init(*self.args)
+        except NotImplementedError: # MPI-3 实现没有持久集合通信
+            self.request = None
+        self.persistent = self.request is not None
+
+    def communicate(self):
+        if self.request is not None:
+            self.request.Start()
+            self.request.Wait()
+        elif self.layout == "row":
+            self.comm.Allgatherv(*self.args)
+        else:
+            self.comm.Reduce_scatter(*self.args, op=MPI.SUM)
+
+    def apply(self, x, out):
+        """ out = (A + shift*I).x """
+        self.x[:] = x
+        if self.layout == "row":
+            self.communicate()
+            if self.A_local is not None:
+                np.dot(self.A_local, self.halo, out=self.y)
+            else:
+                self.y[:] = matvec_free(self.halo, 0, self.indices, self.N)
+        else:
+            if self.A_local is not None:
+                np.dot(self.A_local, self.x, out=self.partial)
+            else:
+                self.partial[:] = matvec_free(self.x, self.start, np.arange(self.N), self.N)
+            self.communicate()
+        np.copyto(out, self.y)
+        if self.shift != 0.:
+            out += self.shift * x
+        return out
+
+    def free(self):
+        if self.request is not None:
+            self.request.Free()
+
+def global_dot(comm, a, b):
+    return comm.allreduce(a.dot(b), op=MPI.SUM)
+
+def power_iteration(op, iterations, tol=1e-10, seed=0):
+    """ 返回 (最大特征值的估计, 每次迭代的时间) """
+    rng = np.random.default_rng([seed, op.comm.Get_rank()])
+    x = rng.random(op.nloc)
+    x /= np.sqrt(global_dot(op.comm, x, x))
+    y = np.empty_like(x)
+    eigenvalue = 0.
+    times = []
+    for _ in range(iterations):
+        start = MPI.Wtime()
+        op.apply(x, y)
+        previous, eigenvalue = eigenvalue, global_dot(op.comm, x, y) # Rayleigh 商
+        x[:] = y / np.sqrt(global_dot(op.comm, y, y))
+        times.append(MPI.Wtime() - start)
+        if abs(eigenvalue - previous) <= tol * abs(eigenvalue):
+            break
+    return eigenvalue, times
+
+def lanczos(op, iterations, seed=0):
+    """ 返回 (三对角矩阵 T 的特征值 (升序)，每次迭代的时间)；不做重正交化 """
+    comm = op.comm
+    rng = np.random.default_rng([seed, comm.Get_rank()])
+    v = rng.random(op.nloc)
+    v /= np.sqrt(global_dot(comm, v, v))
+    v_previous = np.zeros_like(v)
+    w = np.empty_like(v)
+    alphas, betas = [], []
+    beta = 0.
+    times = []
+    for _ in range(iterations):
+        start = MPI.Wtime()
+        op.apply(v, w)
+        w -= beta * v_previous
+        alpha = global_dot(comm, w, v)
+        w -= alpha * v
+        beta = np.sqrt(global_dot(comm, w, w))
+        alphas.append(alpha)
+        times.append(MPI.Wtime() - start)
+        if beta == 0.:
+            break
+        betas.append(beta)
+        v_previous, v = v, v_previous
+        np.divide(w, beta, out=v)
+    T = np.diag(alphas) + np.diag(betas[:len(alphas) - 1], 1) + np.diag(betas[:len(alphas) - 1], -1)
+    return np.linalg.eigvalsh(T), times
+
+def conjugate_gradient(op, b, iterations, tol=1e-10, pipelined=True):
+    """ 解 op.x = b (op 对称正定)，返回 (x, 相对残差, 每次迭代的时间) """
+    comm = op.comm
+    # 点积使用单独的通信子：非阻塞的 Iallreduce 与算子内部的集合通信互不干扰
+    dot_comm = comm.Dup()
+    x = np.zeros_like(b)
+    r = b.copy()
+    norm_b = np.sqrt(global_dot(comm, b, b))
+    local = np.empty(2)
+    reduced = np.empty(2)
+    times = []
+    residual = 1.
+    if pipelined:
+        w = op.apply(r, np.empty_like(b))
+        q = np.empty_like(b)
+        z, s, p = np.zeros_like(b), np.zeros_like(b), np.zeros_like(b)
+        gamma_old = alpha_old = 1.
+        for it in range(iterations):
+            start = MPI.Wtime()
+            local[0], local[1] = r.dot(r), w.dot(r)
+            request = dot_comm.Iallreduce(local, reduced, op=MPI.SUM)
+            op.apply(w, q) # 与点积的归约重叠
+            request.Wait()
+            gamma, delta = reduced
+            residual = np.sqrt(gamma) / norm_b
+            if residual <= tol:
+                times.append(MPI.Wtime() - start)
+                break
+            beta = gamma / gamma_old if it > 0 else 0.
+            alpha = gamma / (delta - beta * gamma / alpha_old)
+            z *= beta; z += q
+            s *= beta; s += w
+            p *= beta; p += r
+            x += alpha * p
+            r -= alpha * s
+            w -= alpha * z
+            gamma_old, alpha_old = gamma, alpha
+            times.append(MPI.Wtime() - start)
+    else:
+        p = r.copy()
+        q = np.empty_like(b)
+        gamma = global_dot(comm, r, r)
+        for it in range(iterations):
+            start = MPI.Wtime()
+            op.apply(p, q)
+            alpha = gamma / global_dot(comm, p, q)
+            x += alpha * p
+            r -= alpha * q
+            gamma, gamma_old = global_dot(comm, r, r), gamma
+            residual = np.sqrt(gamma) / norm_b
+            times.append(MPI.Wtime() - start)
+            if residual <= tol:
+                break
+            p *= gamma / gamma_old
+            p += r
+    dot_comm.Free()
+    return x, residual, times
+
+if __name__ == "__main__":
+    comm = MPI.COMM_WORLD
+    nbp = comm.Get_size()
+    rank = comm.Get_rank()
+
+    parser = argparse.ArgumentParser(description="Solveurs itératifs avec produit matrice-vecteur distribué")
+    parser.add_argument("N", nargs="?", type=int, default=16384, help="dimension du problème")
+    parser.add_argument("--layout", choices=("row", "col"), default="row")
+    parser.add_argument("--operator", choices=OPERATORS[:2], default="dense")
+    parser.add_argument("--solver", choices=("power", "lanczos", "cg"), default="cg")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--tol", type=float, default=1e-10)
+    parser.add_argument("--no-pipeline", action="store_true", help="CG classique (deux Allreduce bloquants par itération)")
+    args = parser.parse_args()
+    N = args.N
+
+    # 用 Gershgorin 界平移，使 CG 的矩阵正定
+    shift = N * (N + 1) / 2. if args.solver == "cg" else 0.
+    setup_start = MPI.Wtime()
+    op = DistributedOperator(comm, N, args.layout, args.operator, shift)
+    setup_time = comm.allreduce(MPI.Wtime() - setup_start, op=MPI.MAX)
+    if args.solver == "power":
+        eigenvalue, times = power_iteration(op, args.iterations, args.tol)
+        result = f"largest eigenvalue {eigenvalue:.10e} (exact {N * (N + 1) / 2:.10e})"
+    elif args.solver == "lanczos":
+        eigenvalues, times = lanczos(op, args.iterations)
+        result = f"extreme Ritz values {eigenvalues[0]:.6e}, {eigenvalues[-1]:.10e} (largest exact {N * (N + 1) / 2:.10e})"
+    else:
+        # 已知解 x_true，b = (A + shift*I).x_true
+        x_true = np.sin(op.indices + 1.)
+        b = op.apply(x_true, np.empty(op.nloc))
+        x, residual, times = conjugate_gradient(op, b, args.iterations, args.tol, not args.no_pipeline)
+        error = np.sqrt(global_dot(comm, x - x_true, x - x_true) / global_dot(comm, x_true, x_true))
+        result = f"{len(times)} iterations, relative residual {residual:.2e}, relative error {error:.2e}"
+    # 所有进程的迭代次数相同 (停止条件由全局归约的量决定)，逐次迭代取各进程的最大时间
+    times = np.array(times) if times else np.zeros(1)
+    comm.Allreduce(MPI.IN_PLACE, times, op=MPI.MAX)
+    op.free()
+    if rank == 0:
+        print(f"Number of processes: {nbp}, layout: {args.layout}, operator: {args.operator}, "
+              f"persistent collectives: {op.persistent}")
+        print(f"Setup time: {setup_time:.6f} s")
+        print(f"Time per iteration: mean {times.mean():.6f} s, min {times.min():.6f} s, max {times.max():.6f} s")
+        print(result)
@@ -1,85 +1,421 @@
 from mpi4py import MPI
+from mpi4py.util.dtlib import from_numpy_dtype
 import numpy as np
 import time
 
-def parallel_bucket_sort(N=100):
-    comm = MPI.COMM_WORLD
+# 记录 (带附加数据的键) 用 NumPy 结构化数组表示，通过 key 参数给出排序键的字段名。
+# 交换时使用由 dtype 导出的 MPI 派生数据类型，附加数据与键在同一次 Alltoallv 中移动。
+_mpi_datatypes = {}
+
+def mpi_datatype(dtype):
+    """ 与 dtype 对应的 (已提交的) MPI 数据类型，结构化 dtype 对应派生数据类型 """
+    if dtype not in _mpi_datatypes:
+        _mpi_datatypes[dtype] = from_numpy_dtype(dtype).Commit()
+    return _mpi_datatypes[dtype]
+
+def keys_of(data, key=None):
+    """ 排序键：普通数组为数组本身，记录数组为 key 字段 """
+    return data if key is None else data[key]
+
+def make_records(keys, payload=None, key="key"):
+    """
+    由键和附加数据 (一维或二维数组，每行对应一个键) 构造结构化数组，字段为 key 和 'payload'。
+    """
+    fields = [(key, keys.dtype)]
+    if payload is not None:
+        fields.append(('payload', payload.dtype, payload.shape[1:]))
+    records = np.empty(len(keys), dtype=fields)
+    records[key] = keys
+    if payload is not None:
+        records['payload'] = payload
+    return records
+
+def sort_by_key(data, key=None, kind=None):
+    """
+    原地排序。记录数组只对键做 argsort，再一次性应用排列，不比较附加数据。
+    """
+    if key is None:
+        data.sort(kind=kind)
+    else:
+        data[:] = data[np.argsort(data[key], kind=kind)]
+    return data
+
+def merge_sorted_runs(data, key=None):
+    """
+    原地合并 data 中首尾相接的若干已排序段 (runs)。
+    NumPy 的稳定排序 (timsort) 会识别已排序的段并只做归并，k 个段的代价为 O(n log k)，而不是重新排序。
+    """
+    return sort_by_key(data, key, kind="stable")
+
+def select_splitters(local_keys, comm, oversampling=4):
+    """
+    正规过采样：每个进程取 oversampling*size 个样本，每个样本带上 (值, rank, 局部下标) 作为全序键，
+    从全部样本中选出 size-1 个分割点 (同样是三元组)。
+    有大量重复值时，相同的值也会按 (rank, 下标) 被分到不同的桶里，不会全部挤进同一个桶。
+    """
+    nb_samples = min(oversampling * comm.Get_size(), len(local_keys))
+    indices = np.arange(nb_samples) * len(local_keys) // max(nb_samples, 1)
+    return choose_splitters(make_samples(local_keys[indices], indices, comm.Get_rank()), comm)
+
+def make_samples(values, indices, rank):
+    """ 样本数组：(值, rank, 下标) 三元组 """
+    samples = np.empty(len(values), dtype=[('value', values.dtype), ('rank', np.int64), ('index', np.int64)])
+    samples['value'] = values
+    samples['rank'] = rank
+    samples['index'] = indices
+    return samples
+
+def choose_splitters(local_samples, comm):
+    """ 收集所有进程的样本 (Allgatherv)，选出 size-1 个分割点 """
+    size = comm.Get_size()
+    sample_dtype = local_samples.dtype
+    nb_samples = len(local_samples)
+    sample_counts = np.empty(size, dtype=np.int64)
+    comm.Allgather([np.array([nb_samples], dtype=np.int64), MPI.INT64_T], [sample_counts, MPI.INT64_T])
+    sample_displs = np.concatenate(([0], np.cumsum(sample_counts)[:-1])).astype(np.int64)
+    all_samples = np.empty(sample_counts.sum(), dtype=sample_dtype)
+    sample_type = mpi_datatype(sample_dtype)
+    comm.Allgatherv([local_samples, sample_type], [all_samples, sample_counts, sample_displs, sample_type])
+    all_samples.sort(order=('value', 'rank', 'index'))
+    # 选取 size-1 个分割点作为桶的边界：数据分布相近时，各进程的第 j 个样本聚在一起 (每组 size 个)，
+    # 与 PSRS 一样取组的中间，而不是组的第一个 (否则分割点整体偏高)
+    splitter_indices = np.clip(np.arange(1, size) * len(all_samples) // size + size // 2 - 1, 0, len(all_samples) - 1)
+    return all_samples[splitter_indices]
+
+def split_positions(local_keys, splitters, rank, index_offset=0):
+    """
+    已排序的 local_keys 中每个分割点的位置：(值, rank, 下标) <= 分割点的元素属于较低的桶。
+    值相等的元素在 local_keys 中是连续的，按 (rank, 下标) 与分割点比较即可确定位置。
+    local_keys[0] 的下标为 index_offset (外部排序中一个有序段在本进程数据中的起点)。
+    """
+    low  = np.searchsorted(local_keys, splitters['value'], side='left')
+    high = np.searchsorted(local_keys, splitters['value'], side='right')
+    same_rank = np.clip(splitters['index'] + 1 - index_offset, low, high)
+    return np.where(rank < splitters['rank'], high, np.where(rank > splitters['rank'], low, same_rank))
+
+def rebalance(my_bucket, comm, stats=None):
+    """
+    第二轮均衡：桶之间已经全局有序，只需把连续的区间移动到相邻进程，使每个进程拿到 N/size 个元素。
+    收到的各段按 rank 顺序拼接后仍然有序，不需要再归并。
+    若给出 stats 字典，则把本进程发送给其它进程的字节数累加到 stats['bytes_sent']。
+    """
+    size = comm.Get_size()
+    mpi_type = mpi_datatype(my_bucket.dtype)
+    local_size = np.array([len(my_bucket)], dtype=np.int64)
+    offset = np.zeros(1, dtype=np.int64)
+    total = np.empty(1, dtype=np.int64)
+    comm.Exscan([local_size, MPI.INT64_T], [offset, MPI.INT64_T], op=MPI.SUM)
+    comm.Allreduce([local_size, MPI.INT64_T], [total, MPI.INT64_T], op=MPI.SUM)
+    if comm.Get_rank() == 0:
+        offset[0] = 0
+    targets = np.concatenate(([0], np.cumsum(local_counts(int(total[0]), size))))
+    # 本进程的全局区间 [offset, offset+len) 与每个目标区间的交集
+    begin = np.clip(targets[:-1], offset[0], offset[0] + len(my_bucket))
+    end   = np.clip(targets[1:],  offset[0], offset[0] + len(my_bucket))
+    send_counts = (end - begin).astype(np.int64)
+    send_displs = (begin - offset[0]).astype(np.int64)
+    recv_counts = np.empty(size, dtype=np.int64)
+    comm.Alltoall([send_counts, MPI.INT64_T], [recv_counts, MPI.INT64_T])
+    recv_displs = np.concatenate(([0], np.cumsum(recv_counts)[:-1])).astype(np.int64)
+    balanced = np.empty(recv_counts.sum(), dtype=my_bucket.dtype)
+    comm.Alltoallv([my_bucket, send_counts, send_displs, mpi_type],
+                   [balanced, recv_counts, recv_displs, mpi_type])
+    if stats is not None:
+        stats['bytes_sent'] = stats.get('bytes_sent', 0) + \
+            int(send_counts.sum() - send_counts[comm.Get_rank()]) * my_bucket.itemsize
+    return balanced
+
+def bucket_statistics(my_bucket, comm):
+    """ 所有进程的桶大小，以及不均衡度 (最大/平均) 和变异系数 (标准差/平均) """
+    sizes = np.empty(comm.Get_size(), dtype=np.int64)
+    comm.Allgather([np.array([len(my_bucket)], dtype=np.int64), MPI.INT64_T], [sizes, MPI.INT64_T])
+    mean = max(sizes.mean(), 1.)
+    return {'bucket_sizes': sizes, 'imbalance': sizes.max() / mean, 'cv': sizes.std() / mean}
+
+def sample_sort(local_data, comm, oversampling=4, rebalance_threshold=None, stats=None, key=None):
+    """
+    基于缓冲区的分布式采样排序：返回本进程负责的桶 (已排序)。
+    所有进程的桶按 rank 顺序拼接即为全局有序序列。local_data 会被原地排序。
+        - key : local_data 为结构化数组 (记录) 时排序键的字段名，整条记录随键一起移动
+        - oversampling : 每个进程的样本数为 oversampling*size
+        - rebalance_threshold : 若交换后桶大小的变异系数超过该阈值，则做第二轮均衡 (None 表示不做)
+        - stats : 若给出一个字典，则写入桶大小等统计信息，以及本进程发送给其它进程的数据字节数 (bytes_sent，不含样本和计数)
+    """
     size = comm.Get_size()
     rank = comm.Get_rank()
+    mpi_type = mpi_datatype(local_data.dtype)
 
-    # --- 1. 数据准备与分发 ---
-    if rank == 0:
-        data = np.random.uniform(0, 100, N).astype(np.float64)
-        print(f"Process 0 generated {N} random numbers.")
-        # 将数据切分为大致相等的块
-        chunks = np.array_split(data, size)
+    # --- 1. 局部排序 ---
+    sort_by_key(local_data, key)
+    local_keys = keys_of(local_data, key)
+
+    # --- 2. 过采样并确定全局分割点 ---
+    splitters = select_splitters(local_keys, comm, oversampling)
+
+    # --- 3. 数据划分 ---
+    # local_data 已经有序：每个桶的边界由 searchsorted 得到，发送时直接使用偏移量，无需拷贝
+    bounds = split_positions(local_keys, splitters, rank)
+    send_displs = np.concatenate(([0], bounds)).astype(np.int64)
+    send_counts = np.diff(np.concatenate((send_displs, [len(local_data)]))).astype(np.int64)
+
+    # --- 4. 全局交换 (All-to-all) ---
+    # 先用 Alltoall 交换每个桶的大小，再用 Alltoallv 直接把数据收到一个预先分配的缓冲区
+    recv_counts = np.empty(size, dtype=np.int64)
+    comm.Alltoall([send_counts, MPI.INT64_T], [recv_counts, MPI.INT64_T])
+    recv_displs = np.concatenate(([0], np.cumsum(recv_counts)[:-1])).astype(np.int64)
+    my_bucket = np.empty(recv_counts.sum(), dtype=local_data.dtype)
+    comm.Alltoallv([local_data, send_counts, send_displs, mpi_type],
+                   [my_bucket, recv_counts, recv_displs, mpi_type])
+
+    # --- 5. 本地归并 ---
+    # 收到的 size 段数据各自有序，只需要做 k 路归并
+    merge_sorted_runs(my_bucket, key)
+
+    # --- 6. 检查桶的大小，必要时做第二轮均衡 ---
+    bucket_stats = bucket_statistics(my_bucket, comm)
+    bucket_stats['sizes_before_rebalance'] = None
+    traffic = {'bytes_sent': int(send_counts.sum() - send_counts[rank]) * local_data.itemsize}
+    if rebalance_threshold is not None and bucket_stats['cv'] > rebalance_threshold:
+        my_bucket = rebalance(my_bucket, comm, traffic)
+        sizes_before = bucket_stats['bucket_sizes']
+        bucket_stats = bucket_statistics(my_bucket, comm)
+        bucket_stats['sizes_before_rebalance'] = sizes_before
+    bucket_stats.update(traffic)
+    if stats is not None:
+        stats.update(bucket_stats)
+    return my_bucket
+
+def local_counts(N, size):
+    """ 每个进程的数据量 (前 N % size 个进程多一个) """
+    return np.array([N // size + (1 if p < N % size else 0) for p in range(size)], dtype=np.int64)
+
+def global_offset(n, comm):
+    """ 本进程数据在全局序列中的起始位置 (各进程数据量的前缀和) """
+    offset = comm.exscan(n, op=MPI.SUM)
+    return 0 if offset is None else offset
+
+def global_argsort(local_keys, comm, with_keys=False, **options):
+    """
+    分布式 argsort：local_keys 为本进程的一段键 (全局序列按 rank 顺序拼接)。
+    返回本进程的桶中各元素在原始全局序列中的下标，按键的顺序排列。
+    只移动 (键, 下标) 记录，不移动附加数据；options 传给 sample_sort。
+    with_keys=True 时直接返回已排序的 (key, index) 记录数组 (便于验证)。
+    """
+    records = np.empty(len(local_keys), dtype=[('key', local_keys.dtype), ('index', np.int64)])
+    records['key'] = local_keys
+    records['index'] = global_offset(len(local_keys), comm) + np.arange(len(local_keys))
+    records = sample_sort(records, comm, key='key', **options)
+    if with_keys:
+        return records
+    # 字段视图是跨步的，复制为连续数组 (MPI-IO 写出等需要连续缓冲区)
+    return np.ascontiguousarray(records['index'])
+
+def global_ranks(local_keys, comm, **options):
+    """
+    每个本地键在全局排序中的位置 (秩)。在 global_argsort 之后，把 (下标, 秩) 发回下标所属的进程。
+    """
+    size = comm.Get_size()
+    sorted_indices = global_argsort(local_keys, comm, **options)
+    pairs = np.empty(len(sorted_indices), dtype=[('index', np.int64), ('rank', np.int64)])
+    pairs['index'] = sorted_indices
+    pairs['rank'] = global_offset(len(sorted_indices), comm) + np.arange(len(sorted_indices))
+    # 原始数据的划分：每个进程的下标区间 [starts[p], starts[p+1])
+    starts = np.concatenate(([0], np.cumsum(comm.allgather(len(local_keys)))))
+    owners = np.searchsorted(starts, pairs['index'], side='right') - 1
+    pairs = pairs[np.argsort(owners, kind="stable")]
+    send_counts = np.bincount(owners, minlength=size).astype(np.int64)
+    send_displs = np.concatenate(([0], np.cumsum(send_counts)[:-1])).astype(np.int64)
+    recv_counts = np.empty(size, dtype=np.int64)
+    comm.Alltoall([send_counts, MPI.INT64_T], [recv_counts, MPI.INT64_T])
+    recv_displs = np.concatenate(([0], np.cumsum(recv_counts)[:-1])).astype(np.int64)
+    received = np.empty(recv_counts.sum(), dtype=pairs.dtype)
+    pair_type = mpi_datatype(pairs.dtype)
+    comm.Alltoallv([pairs, send_counts, send_displs, pair_type], [received, recv_counts, recv_displs, pair_type])
+    ranks = np.empty(len(local_keys), dtype=np.int64)
+    ranks[received['index'] - starts[comm.Get_rank()]] = received['rank']
+    return ranks
+
+DISTRIBUTIONS = ("uniform", "duplicates", "skewed")
+
+def generate_local_data(N, comm, seed=None, distribution="uniform"):
+    """
+    每个进程独立生成自己的一段数据 (随机流由 seed 和 rank 决定)，不经过 rank 0。
+        - uniform    : [0, 100) 上的均匀分布
+        - duplicates : [-32768, 32768) 中的整数 (与 Course3 中的排序相同)，大量重复值
+        - skewed     : 对数正态分布，大部分值集中在很小的区间
+    """
+    rank = comm.Get_rank()
+    rng = np.random.default_rng(None if seed is None else [seed, rank])
+    n = local_counts(N, comm.Get_size())[rank]
+    if distribution == "duplicates":
+        return rng.integers(-32768, 32768, n).astype(np.float64)
+    if distribution == "skewed":
+        return rng.lognormal(0., 3., n)
+    return rng.uniform(0, 100, n)
+
+def read_local_data(filename, comm):
+    """
+    以内存映射方式打开输入文件 (.npy 或 float64 原始二进制文件)，每个进程只读取自己那一段。
+    """
+    if filename.endswith(".npy"):
+        data = np.load(filename, mmap_mode='r')
     else:
-        chunks = None
+        data = np.memmap(filename, dtype=np.float64, mode='r')
+    counts = local_counts(len(data), comm.Get_size())
+    start = counts[:comm.Get_rank()].sum()
+    # 复制到内存中，因为之后要原地排序
+    return np.array(data[start:start + counts[comm.Get_rank()]])
 
-    # 分发数据给每个进程
-    local_data = comm.scatter(chunks, root=0)
+def write_sorted(filename, my_bucket, comm):
+    """
+    用 MPI-IO 并行写出排序结果：每个进程的写入位置由桶大小的前缀和 (Exscan) 得到。
+    文件名以 .npy 结尾时写成 NumPy 格式 (rank 0 写文件头)，否则写原始二进制。
+    """
+    local_size = np.array([len(my_bucket)], dtype=np.int64)
+    offset = np.zeros(1, dtype=np.int64)
+    total = np.empty(1, dtype=np.int64)
+    comm.Exscan([local_size, MPI.INT64_T], [offset, MPI.INT64_T], op=MPI.SUM)
+    comm.Allreduce([local_size, MPI.INT64_T], [total, MPI.INT64_T], op=MPI.SUM)
+    if comm.Get_rank() == 0:
+        offset[0] = 0 # Exscan 在 rank 0 上的结果未定义
+    header = b""
+    if filename.endswith(".npy"):
+        import io
+        buffer = io.BytesIO()
+        np.lib.format.write_array_header_1_0(buffer, {'descr': np.lib.format.dtype_to_descr(my_bucket.dtype),
+                                                      'fortran_order': False, 'shape': (int(total[0]),)})
+        header = buffer.getvalue()
+    fh = MPI.File.Open(comm, filename, MPI.MODE_WRONLY | MPI.MODE_CREATE)
+    fh.Set_size(0)
+    if comm.Get_rank() == 0 and header:
+        fh.Write_at(0, header)
+    fh.Write_at_all(len(header) + offset[0] * my_bucket.itemsize, [my_bucket, mpi_datatype(my_bucket.dtype)])
+    fh.Close()
 
-    # --- 2. 局部排序 ---
-    local_data.sort()
+def _max_ignoring_none(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
 
-    # --- 3. 正规采样 (Regular Sampling) ---
-    # 每个进程选取 size 个样本 (讲义第54页提到选取 nbp+1 个值)
-    indices = np.linspace(0, len(local_data) - 1, size, dtype=int)
-    local_samples = local_data[indices]
+def is_globally_sorted(my_bucket, comm, key=None):
+    """
+    分布式有序性检查：本地检查 + 每个进程的第一个元素不小于之前所有进程的最大值 (Exscan MAX)。
+    空桶也能正确处理。记录数组只检查 key 字段。
+    """
+    my_bucket = keys_of(my_bucket, key)
+    # 只交换一个标量，用小写 exscan 即可 (rank 0 上结果为 None)
+    local_max = my_bucket[-1] if len(my_bucket) > 0 else None
+    previous_max = comm.exscan(local_max, op=_max_ignoring_none)
+    ok = bool(np.all(my_bucket[:-1] <= my_bucket[1:]))
+    if len(my_bucket) > 0 and previous_max is not None:
+        ok = ok and previous_max <= my_bucket[0]
+    return comm.allreduce(ok, op=MPI.LAND)
 
-    # --- 4. 确定全局桶边界 (Pivots) ---
-    all_samples = comm.gather(local_samples, root=0)
+def _xor_upto(n):
+    """ 0 ^ 1 ^ ... ^ (n-1) """
+    return (0, n - 1, 1, n)[n % 4]
 
-    pivots = None
-    if rank == 0:
-        # 将所有样本汇总并排序
-        global_samples = np.concatenate(all_samples)
-        global_samples.sort()
-        # 选取 size-1 个枢轴(pivots)作为桶的边界
-        # 比如有4个进程，我们需要3个边界来分出4个区间
-        pivot_indices = np.linspace(0, len(global_samples) - 1, size + 1, dtype=int)[1:-1]
-        pivots = global_samples[pivot_indices]
-    
-    # 广播边界给所有进程
-    pivots = comm.bcast(pivots, root=0)
-
-    # --- 5. 数据划分与全局交换 (All-to-all) ---
-    # 每个进程根据 pivots 将本地数据分成 size 份
-    # 使用 np.searchsorted 查找数据应该去哪个桶
-    bucket_indices = np.searchsorted(pivots, local_data)
-    
-    # 准备要发送给各个进程的数据列表
-    data_to_send = [local_data[bucket_indices == i] for i in range(size)]
-    
-    # 全局交换：每个进程发送数据给对应的桶进程，同时也接收属于自己的桶的数据
-    received_chunks = comm.alltoall(data_to_send)
-
-    # --- 6. 本地最终排序 ---
-    # 将接收到的所有块合并并排序
-    my_bucket = np.concatenate(received_chunks)
-    my_bucket.sort()
-
-    # --- 7. 汇总结果 ---
-    sorted_all = comm.gather(my_bucket, root=0)
+def is_permutation(indices, N, comm):
+    """
+    分布式检查：各进程的下标合起来是否为 0..N-1 的一个排列。
+    只归约几个标量 (个数、最小值、最大值、和、异或)，不需要 O(N) 的直方图；这是必要条件，足以发现丢失或重复的下标。
+    """
+    count = comm.allreduce(len(indices), op=MPI.SUM)
+    low = comm.allreduce(int(indices.min()) if len(indices) > 0 else 0, op=MPI.MIN)
+    high = comm.allreduce(int(indices.max()) if len(indices) > 0 else N - 1, op=MPI.MAX)
+    total = comm.allreduce(int(indices.sum()), op=MPI.SUM)
+    xor = comm.allreduce(int(np.bitwise_xor.reduce(indices)) if len(indices) > 0 else 0, op=MPI.BXOR)
+    return count == N and low == 0 and high == N - 1 and total == N * (N - 1) // 2 and xor == _xor_upto(N)
 
-    if rank == 0:
-        final_array = np.concatenate(sorted_all)
-        return final_array
-    return None
+def parallel_bucket_sort(N=100, input_file=None, seed=None, distribution="uniform", oversampling=4,
+                         rebalance_threshold=None, stats=None, payload=0, argsort=False):
+    """
+    分布式桶排序：每个进程生成 (或从 input_file 读取) 自己的一段数据，返回本进程的已排序桶。
+    不再把全部数据集中到 rank 0，rank 0 的内存不再限制问题规模。其余参数见 sample_sort。
+        - payload > 0 : 每个键附带 payload 列 float64 数据 (第 j 列为 键*(j+1)，便于检查)，返回记录数组
+        - argsort : 返回按键排序的 (key, index) 记录，index 为各元素的原始全局下标
+    """
+    comm = MPI.COMM_WORLD
+
+    # --- 1. 数据准备 ---
+    if input_file is not None:
+        local_data = read_local_data(input_file, comm)
+    else:
+        local_data = generate_local_data(N, comm, seed, distribution)
+
+    # --- 2. 采样排序 ---
+    if argsort:
+        return global_argsort(local_data, comm, with_keys=True, oversampling=oversampling,
+                              rebalance_threshold=rebalance_threshold, stats=stats)
+    if payload > 0:
+        local_data = make_records(local_data, local_data[:, None] * np.arange(1, payload + 1))
+        return sample_sort(local_data, comm, oversampling, rebalance_threshold, stats, key="key")
+    return sample_sort(local_data, comm, oversampling, rebalance_threshold, stats)
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tri par paquets parallèle (sample sort)")
     # 测试数据量
-    N_TOTAL = 100000000
-    
+    parser.add_argument("N", nargs="?", type=int, default=100000000)
+    parser.add_argument("--input", help="fichier d'entrée (.npy ou binaire float64), lu par projection mémoire")
+    parser.add_argument("--output", help="fichier de sortie (.npy ou binaire), écrit en parallèle par MPI-IO")
+    parser.add_argument("--seed", type=int, help="graine du générateur (combinée avec le rang)")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--oversampling", type=int, default=4, help="nombre d'échantillons par processus et par paquet")
+    parser.add_argument("--rebalance-threshold", type=float,
+                        help="second tour d'équilibrage si le coefficient de variation des tailles de paquets dépasse ce seuil")
+    parser.add_argument("--payload", type=int, default=0, help="nombre de colonnes float64 attachées à chaque clé")
+    parser.add_argument("--argsort", action="store_true", help="ne renvoie que les indices globaux d'origine, dans l'ordre trié")
+    parser.add_argument("--memory-budget", type=float,
+                        help="tri externe avec au plus ce nombre de Mo par processus (nécessite --input et --output)")
+    parser.add_argument("--tmpdir", help="répertoire local des séquences triées du tri externe")
+    args = parser.parse_args()
+
     comm = MPI.COMM_WORLD
     rank = comm.Get_rank()
-    
+
+    if args.memory_budget is not None:
+        # 外部排序：数据不全部放入内存，见 external_sort.py
+        if args.input is None or args.output is None:
+            parser.error("--memory-budget nécessite --input et --output")
+        from external_sort import external_sort, check_sorted_file
+        comm.Barrier()
+        start_time = time.time()
+        external_sort(args.input, args.output, comm, int(args.memory_budget * 2**20), args.tmpdir, args.oversampling)
+        comm.Barrier()
+        end_time = time.time()
+        is_sorted = check_sorted_file(args.output, comm)
+        if rank == 0:
+            print(f"Sorting complete! Time taken: {end_time - start_time:.4f} s")
+            print(f"The result is sorted: {is_sorted}")
+        raise SystemExit
+
+    comm.Barrier()
     start_time = time.time()
-    result = parallel_bucket_sort(N_TOTAL)
+    stats = {}
+    my_bucket = parallel_bucket_sort(args.N, args.input, args.seed, args.distribution, args.oversampling,
+                                     args.rebalance_threshold, stats, args.payload, args.argsort)
+    comm.Barrier()
     end_time = time.time()
 
+    if args.output is not None:
+        write_sorted(args.output, np.ascontiguousarray(my_bucket['index']) if args.argsort else my_bucket, comm)
+    # 验证是否有序 (argsort 模式下还验证下标构成一个排列)
+    if args.argsort:
+        N = comm.allreduce(len(my_bucket), op=MPI.SUM) if args.input is not None else args.N
+        is_sorted = is_globally_sorted(my_bucket, comm, key="key") and is_permutation(my_bucket['index'], N, comm)
+    elif args.payload > 0:
+        is_sorted = is_globally_sorted(my_bucket, comm, key="key") and comm.allreduce(
+            bool(np.all(my_bucket['payload'] == my_bucket['key'][:, None] * np.arange(1, args.payload + 1))), op=MPI.LAND)
+    else:
+        is_sorted = is_globally_sorted(my_bucket, comm)
     if rank == 0:
-        print(f"Sorting complete! Time taken: {end_time - start_time:.4f} s")        
-        # 验证是否有序
-        is_sorted = np.all(result[:-1] <= result[1:])
-        print(f"The result is sorted: {is_sorted}")
\ No newline at end of file
+        print(f"Sorting complete! Time taken: {end_time - start_time:.4f} s")
+        print(f"The result is sorted: {is_sorted}")
+        if stats['sizes_before_rebalance'] is not None:
+            print(f"Bucket sizes before rebalancing: {stats['sizes_before_rebalance'].tolist()}")
+        print(f"Bucket sizes: {stats['bucket_sizes'].tolist()}")
+        print(f"Max/mean: {stats['imbalance']:.3f}, coefficient of variation: {stats['cv']:.3f}")
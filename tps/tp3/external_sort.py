@@ -0,0 +1,217 @@
+"""
+外部排序 (out-of-core)：数据总量超过所有进程内存之和时使用。
+每个进程只占用 memory_budget 字节左右的内存，其余数据都在磁盘上：
+    1. 分段：按块读取 (内存映射) 本进程的输入，每块在内存中排序后写成本地磁盘上的一个有序段 (run)，同时取样
+    2. 与 sample_sort 相同的方式选出全局分割点 (样本带 (值, rank, 下标) 键，重复值也能均匀分配)
+    3. 交换：每轮每个进程发送自己的一个有序段，按分割点切开后点对点发送，
+       收到的每个片段直接写成一个本地有序段 (接收端内存中最多一个片段)
+    4. 多路归并：用有限的缓冲区流式归并收到的有序段，通过 MPI-IO 直接写到输出文件的对应位置
+
+用法：
+    mpiexec -np 4 python external_sort.py donnees.npy trie.npy --memory-budget 256 --tmpdir /scratch
+"""
+import os
+import io
+import shutil
+import tempfile
+import numpy as np
+from mpi4py import MPI
+from bucket_sort import (local_counts, merge_sorted_runs, make_samples, choose_splitters, split_positions,
+                         mpi_datatype)
+
+def open_input(filename):
+    """ 内存映射方式打开输入文件 (.npy 或 float64 原始二进制文件) """
+    if filename.endswith(".npy"):
+        return np.load(filename, mmap_mode='r')
+    return np.memmap(filename, dtype=np.float64, mode='r')
+
+def open_run(run, dtype):
+    """ 以只读内存映射打开一个有序段 (path, 起点下标, 长度) """
+    path, _, length = run
+    if length == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(length,))
+
+def make_runs(data, start, n, chunk, workdir, nb_samples, rank):
+    """
+    把 data[start:start+n] 按 chunk 个元素一块排序后写成有序段文件。
+    每个有序段取 nb_samples 个正规样本，下标为元素在本进程有序段序列中的位置 (段起点 + 段内位置)，
+    这样 (值, rank, 下标) 在各段之间也是一个全序。返回 (有序段列表, 样本)。
+    """
+    runs = []
+    samples = []
+    for run_start in range(0, n, chunk):
+        block = np.array(data[start + run_start:start + min(run_start + chunk, n)])
+        block.sort(kind="stable")
+        path = os.path.join(workdir, f"run{len(runs):05d}.bin")
+        block.tofile(path)
+        runs.append((path, run_start, len(block)))
+        nb = min(nb_samples, len(block))
+        indices = np.arange(nb) * len(block) // max(nb, 1)
+        samples.append(make_samples(block[indices], run_start + indices, rank))
+        del block
+    samples = np.concatenate(samples) if samples else make_samples(np.empty(0, data.dtype), np.empty(0, np.int64), rank)
+    # 把所有段的样本合并后重新正规取样，使每个进程贡献的样本数与内存中的 sample_sort 相同
+    samples.sort(order=('value', 'index'))
+    nb = min(nb_samples, len(samples))
+    return runs, samples[np.arange(nb) * len(samples) // max(nb, 1)]
+
+def exchange_runs(runs, splitters, comm, dtype, workdir, chunk):
+    """
+    分轮交换：第 r 轮每个进程发送自己的第 r 个有序段 (没有则发送空段)。
+    先用 Alltoall 交换各片段的长度，然后逐个来源接收：每个来源的片段 (最多 chunk 个元素，因为有序段不超过
+    chunk) 收到同一个缓冲区中，直接写成一个新的有序段，交给 merge_runs 归并。
+    这样无论数据如何倾斜，接收端内存中最多只有 chunk 个元素 (而不是 size * chunk)。返回收到的有序段。
+    """
+    size = comm.Get_size()
+    rank = comm.Get_rank()
+    mpi_type = mpi_datatype(dtype)
+    nb_rounds = comm.allreduce(len(runs), op=MPI.MAX)
+    buffer = np.empty(chunk, dtype=dtype)
+    received_runs = []
+    for r in range(nb_rounds):
+        if r < len(runs):
+            keys = open_run(runs[r], dtype)
+            bounds = split_positions(keys, splitters, rank, runs[r][1])
+        else:
+            keys = np.empty(0, dtype=dtype)
+            bounds = np.zeros(size - 1, dtype=np.int64)
+        send_displs = np.concatenate(([0], bounds)).astype(np.int64)
+        send_counts = np.diff(np.concatenate((send_displs, [len(keys)]))).astype(np.int64)
+        recv_counts = np.empty(size, dtype=np.int64)
+        comm.Alltoall([send_counts, MPI.INT64_T], [recv_counts, MPI.INT64_T])
+        # 发送直接从内存映射的有序段读取；接收按来源依次进行 (从 rank 的下一个开始，错开各进程的来源)
+        requests = [comm.Isend([keys[send_displs[q]:send_displs[q] + send_counts[q]], mpi_type], dest=q)
+                    for q in range(size) if q != rank and send_counts[q] > 0]
+        for k in range(size):
+            source = (rank + k) % size
+            n = int(recv_counts[source])
+            if n == 0:
+                continue
+            piece = buffer[:n]
+            if source == rank:
+                piece[:] = keys[send_displs[rank]:send_displs[rank] + n]
+            else:
+                comm.Recv([piece, mpi_type], source=source)
+            path = os.path.join(workdir, f"recv{r:05d}_{source:04d}.bin")
+            piece.tofile(path)
+            received_runs.append((path, 0, n))
+        MPI.Request.Waitall(requests)
+        del keys
+        if r < len(runs):
+            os.remove(runs[r][0]) # 已经发送的段不再需要
+    return received_runs
+
+def merge_runs(runs, dtype, block, write):
+    """
+    有界内存的多路归并：每个有序段只在内存中保留最多 block 个元素。
+    每一步输出所有不超过 limit 的已读入元素，limit 为各段已读入部分最后一个元素的最小值：
+    之后读入的元素都不小于 limit，因此输出是有序的；最后一个元素等于 limit 的段每步都会被读完。
+    write(chunk) 依次接收归并后的数据块。
+    """
+    sources = [open_run(run, dtype) for run in runs]
+    positions = [0] * len(runs)
+    buffers = [np.empty(0, dtype=dtype)] * len(runs)
+    while True:
+        for i, source in enumerate(sources):
+            if len(buffers[i]) == 0 and positions[i] < len(source):
+                buffers[i] = np.array(source[positions[i]:positions[i] + block])
+                positions[i] += len(buffers[i])
+        active = [i for i in range(len(sources)) if len(buffers[i]) > 0]
+        if not active:
+            break
+        limit = min(buffers[i][-1] for i in active)
+        pieces = []
+        for i in active:
+            take = np.searchsorted(buffers[i], limit, side='right')
+            pieces.append(buffers[i][:take])
+            buffers[i] = buffers[i][take:]
+        write(merge_sorted_runs(np.concatenate(pieces)))
+
+def external_sort(input_file, output_file, comm, memory_budget=256 * 2**20, tmpdir=None, oversampling=4):
+    """
+    外部排序：output_file 的格式与 bucket_sort.write_sorted 相同 (.npy 或原始二进制)。
+    memory_budget 为每个进程可使用的内存 (字节)，tmpdir 为存放有序段的本地目录。
+    返回本进程输出的元素个数。
+    """
+    size = comm.Get_size()
+    rank = comm.Get_rank()
+    data = open_input(input_file)
+    dtype = data.dtype
+    # 分段和交换时内存中同时有发送段 (内存映射) 和接收缓冲区，各占预算的一半
+    chunk = max(memory_budget // (2 * dtype.itemsize), 1)
+    counts = local_counts(len(data), size)
+    start = int(counts[:rank].sum())
+    workdir = tempfile.mkdtemp(prefix=f"runs{rank:03d}_", dir=tmpdir)
+    try:
+        # --- 1. 分段并取样 ---
+        runs, samples = make_runs(data, start, int(counts[rank]), chunk, workdir, oversampling * size, rank)
+        del data
+        # --- 2. 全局分割点 ---
+        splitters = choose_splitters(samples, comm)
+        # --- 3. 按有序段分轮交换 ---
+        received_runs = exchange_runs(runs, splitters, comm, dtype, workdir, chunk)
+        # --- 4. 多路归并并写出 ---
+        local_size = sum(run[2] for run in received_runs)
+        offset = comm.exscan(local_size, op=MPI.SUM) or 0
+        total = comm.allreduce(local_size, op=MPI.SUM)
+        header = b""
+        if output_file.endswith(".npy"):
+            buffer = io.BytesIO()
+            np.lib.format.write_array_header_1_0(buffer, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                                          'fortran_order': False, 'shape': (total,)})
+            header = buffer.getvalue()
+        fh = MPI.File.Open(comm, output_file, MPI.MODE_WRONLY | MPI.MODE_CREATE)
+        fh.Set_size(0)
+        if rank == 0 and header:
+            fh.Write_at(0, header)
+        position = [len(header) + offset * dtype.itemsize]
+        def write(merged):
+            fh.Write_at(position[0], [merged, mpi_datatype(dtype)])
+            position[0] += merged.nbytes
+        block = max(memory_budget // (2 * dtype.itemsize * max(len(received_runs), 1)), 1)
+        merge_runs(received_runs, dtype, block, write)
+        fh.Close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return local_size
+
+def check_sorted_file(filename, comm, block=2**22):
+    """
+    分块检查输出文件是否有序：每个进程检查文件的一段 (与前一段重叠一个元素以覆盖边界)，内存占用为 block 个元素。
+    """
+    data = open_input(filename)
+    counts = local_counts(len(data), comm.Get_size())
+    start = max(int(counts[:comm.Get_rank()].sum()) - 1, 0)
+    end = int(counts[:comm.Get_rank() + 1].sum())
+    ok = True
+    for beg in range(start, end - 1, block):
+        piece = np.array(data[beg:min(beg + block + 1, end)])
+        ok = ok and bool(np.all(piece[:-1] <= piece[1:]))
+    return comm.allreduce(ok, op=MPI.LAND)
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Tri externe parallèle (données plus grandes que la mémoire)")
+    parser.add_argument("input", help="fichier d'entrée (.npy ou binaire float64)")
+    parser.add_argument("output", help="fichier de sortie (.npy ou binaire)")
+    parser.add_argument("--memory-budget", type=float, default=256, help="mémoire par processus en Mo")
+    parser.add_argument("--tmpdir", help="répertoire local pour les séquences triées intermédiaires")
+    parser.add_argument("--oversampling", type=int, default=4)
+    args = parser.parse_args()
+
+    comm = MPI.COMM_WORLD
+    comm.Barrier()
+    start_time = time.time()
+    local_size = external_sort(args.input, args.output, comm, int(args.memory_budget * 2**20), args.tmpdir,
+                               args.oversampling)
+    comm.Barrier()
+    end_time = time.time()
+    sizes = comm.gather(local_size, root=0)
+    is_sorted = check_sorted_file(args.output, comm)
+    if comm.Get_rank() == 0:
+        print(f"Sorting complete! Time taken: {end_time - start_time:.4f} s")
+        print(f"The result is sorted: {is_sorted}")
+        print(f"Bucket sizes: {sizes}")
@@ -0,0 +1,106 @@
+"""
+Communications de tableaux numpy sans sérialisation des données
+###############################################################
+Les appels en minuscules de mpi4py (scatter, gather, send, ...) sérialisent leurs arguments : les octets d'un
+tableau sont recopiés dans le flux pickle, puis recopiés à nouveau à la réception. Ce module offre les mêmes appels,
+mais :
+    - si toutes les données sont des tableaux homogènes (même type, mêmes dimensions hormis la première), ils
+      utilisent directement les versions tampon Scatterv / Gatherv, éventuellement dans un tableau de réception
+      fourni par l'appelant (out) ;
+    - sinon, ils passent par mpi4py.util.pkl5 : pickle protocole 5, les tampons des tableaux sont envoyés à part
+      (out-of-band) au lieu d'être copiés dans le flux.
+Seules quelques métadonnées (type, forme, nombre de lignes) transitent sérialisées ; pour gather, passer counts
+(nombre de lignes de chaque processus) quand il est déjà connu évite d'échanger les nombres de lignes (seuls les
+types et formes sont encore comparés, pour que tous les processus envoient le même genre de tableau).
+
+    pkl5(comm)                              communicateur dont les appels en minuscules utilisent pickle 5
+    scatter(comm, data, root, out, counts)  data : tableau (coupé en nbp morceaux selon la première dimension)
+                                            ou liste de nbp objets sur root
+    gather(comm, obj, root, out, counts)    tableau concaténé (ou liste d'objets) sur root, None ailleurs
+"""
+import numpy as np
+from mpi4py.util.dtlib import from_numpy_dtype
+try:
+    from mpi4py.util import pkl5 as _pkl5
+except ImportError:  # mpi4py < 3.1
+    _pkl5 = None
+
+def pkl5( comm ):
+    """ comm enveloppé par mpi4py.util.pkl5 (comm lui-même si pkl5 n'est pas disponible) """
+    if _pkl5 is None or isinstance(comm, _pkl5.Comm):
+        return comm
+    return _pkl5.Intracomm(comm)
+
+def _signature( obj ):
+    """ (type, dimensions hormis la première) d'un tableau homogène, None sinon """
+    if isinstance(obj, np.ndarray) and obj.ndim > 0 and obj.dtype.kind in "biufc":
+        return obj.dtype.str, obj.shape[1:]
+    return None
+
+def _displacements( counts ):
+    return np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+
+def scatter( comm, data, root : int = 0, out=None, counts=None ):
+    """
+    Équivalent de comm.scatter. Sur root, data est une liste de nbp objets ou un tableau, coupé selon la première
+    dimension en morceaux de counts[p] lignes (np.array_split si counts est None).
+    """
+    nbp, rank = comm.size, comm.rank
+    meta = full = None
+    if rank == root:
+        if isinstance(data, np.ndarray):
+            full = data
+            rows = [len(c) for c in np.array_split(np.empty(len(data)), nbp)] if counts is None else counts
+            signature = _signature(data)
+        else:
+            chunks = list(data)
+            rows = [len(c) if isinstance(c, np.ndarray) and c.ndim > 0 else 0 for c in chunks]
+            signatures = {_signature(c) for c in chunks}
+            signature = signatures.pop() if len(signatures) == 1 else None
+            full = np.concatenate(chunks) if signature is not None else chunks
+        if signature is not None:
+            meta = (signature, np.asarray(rows, dtype=np.int64))
+            full = np.ascontiguousarray(full)
+        elif isinstance(full, np.ndarray):
+            full = np.array_split(full, np.cumsum(rows)[:-1])
+    # Seules les métadonnées sont diffusées sérialisées (None : données hétérogènes)
+    meta = comm.bcast(meta, root=root)
+    if meta is None:
+        return pkl5(comm).scatter(full, root=root)
+    (dtype, tail), rows = meta
+    rowSize = int(np.prod(tail, dtype=np.int64))
+    if out is None:
+        out = np.empty((rows[rank],) + tuple(tail), dtype=dtype)
+    sizes = rows * rowSize
+    sendbuf = [full, sizes, _displacements(sizes), from_numpy_dtype(dtype)] if rank == root else None
+    comm.Scatterv(sendbuf, out, root=root)
+    return out
+
+def gather( comm, obj, root : int = 0, out=None, counts=None ):
+    """
+    Équivalent de comm.gather, mais des tableaux homogènes sont concaténés selon la première dimension dans out
+    (alloué si None) au lieu d'être retournés sous forme de liste.
+    """
+    nbp, rank = comm.size, comm.rank
+    signature = _signature(obj)
+    # Tous les processus prennent la même décision à partir des mêmes métadonnées : un seul processus avec des
+    # données hétérogènes, ou un tableau d'un autre type ou d'une autre forme, impose pkl5 à tous
+    if counts is None:
+        metas = comm.allgather((signature, len(obj) if signature is not None else 0))
+        signatures = {m[0] for m in metas}
+    else:
+        signatures = set(comm.allgather(signature))
+    if None in signatures or len(signatures) > 1:
+        return pkl5(comm).gather(obj, root=root)
+    rows = np.array([m[1] for m in metas], dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+    dtype, tail = signature
+    rowSize = int(np.prod(tail, dtype=np.int64))
+    sendbuf = np.ascontiguousarray(obj)
+    if rank == root:
+        if out is None:
+            out = np.empty((rows.sum(),) + tuple(tail), dtype=dtype)
+        sizes = rows * rowSize
+        comm.Gatherv(sendbuf, [out, sizes, _displacements(sizes), from_numpy_dtype(dtype)], root=root)
+        return out
+    comm.Gatherv(sendbuf, None, root=root)
+    return None
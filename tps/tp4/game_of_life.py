@@ -33,14 +33,18 @@ class Grille:
         - init_pattern est une liste de cellules initialement vivantes sur cette grille (les autres sont considérées comme mortes)
         - color_life est la couleur dans laquelle on affiche une cellule vivante
         - color_dead est la couleur dans laquelle on affiche une cellule morte
+        - init_cells est un tableau (nombre lignes, nombre colonnes) donnant directement l'état des cellules
+          (par exemple relu dans un fichier de simulation, voir life_snapshot.py). Il remplace init_pattern.
     Si aucun pattern n'est donné, on tire au hasard quels sont les cellules vivantes et les cellules mortes
     Exemple :
        grid = Grille( (10,10), init_pattern=[(2,2),(0,2),(4,2),(2,0),(2,4)], color_life=pg.Color("red"), color_dead=pg.Color("black"))
     """
-    def __init__(self, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white")):
+    def __init__(self, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white"), init_cells=None):
         import random
         self.dimensions = dim
-        if init_pattern is not None:
+        if init_cells is not None:
+            self.cells = np.array(init_cells, dtype=np.uint8)
+        elif init_pattern is not None:
             self.cells = np.zeros(self.dimensions, dtype=np.uint8)
             indices_i = [v[0] for v in init_pattern]
             indices_j = [v[1] for v in init_pattern]
@@ -150,34 +154,86 @@ if __name__ == '__main__':
         "u" : ((200,200), [(101,101),(102,102),(103,102),(103,101),(104,103),(105,103),(105,102),(105,101),(105,105),(103,105),(102,105),(101,105),(101,104)]),
         "flat" : ((200,400), [(80,200),(81,200),(82,200),(83,200),(84,200),(85,200),(86,200),(87,200), (89,200),(90,200),(91,200),(92,200),(93,200),(97,200),(98,200),(99,200),(106,200),(107,200),(108,200),(109,200),(110,200),(111,200),(112,200),(114,200),(115,200),(116,200),(117,200),(118,200)])
     }
-    choice = 'glider'
-    if len(sys.argv) > 1 :
-        choice = sys.argv[1]
-    resx = 800
-    resy = 800
-    if len(sys.argv) > 3 :
-        resx = int(sys.argv[2])
-        resy = int(sys.argv[3])
-    print(f"Pattern initial choisi : {choice}")
+    import argparse
+    import os
+    from life_snapshot import SnapshotReader, SnapshotWriter, read_pattern
+    from life_cycles import CycleDetector
+
+    parser = argparse.ArgumentParser(description="Jeu de la vie")
+    parser.add_argument("choice", nargs="?", default="glider",
+                        help="nom d'un motif prédéfini ou fichier de motif (.rle, .lif, .life)")
+    parser.add_argument("resx", nargs="?", type=int, default=800)
+    parser.add_argument("resy", nargs="?", type=int, default=800)
+    parser.add_argument("--save", metavar="FICHIER", help="enregistre la simulation dans FICHIER (.gol)")
+    parser.add_argument("--keyframe-interval", type=int, default=32,
+                        help="nombre de générations enregistrées entre deux images clés")
+    parser.add_argument("--resume", metavar="FICHIER", help="reprend la simulation à la dernière image clé de FICHIER")
+    parser.add_argument("--generations", type=int, help="arrête la simulation à cette génération")
+    parser.add_argument("--on-cycle", choices=("report", "stop", "fast-forward"),
+                        help="détecte les cycles (configurations stables, oscillateurs) : les signale, arrête la simulation, "
+                             "ou saute directement à la génération --generations")
+    parser.add_argument("--cycle-history", type=int, default=64, help="période maximale détectable")
+    args = parser.parse_args()
+    choice = args.choice
+    resx = args.resx
+    resy = args.resy
+    generation = 0
+    if args.resume is not None:
+        reader = SnapshotReader(args.resume)
+        generation, cells = reader.load_rows(0, reader.dimensions[0])
+        print(f"Reprise de {args.resume} à la génération {generation}")
+        init_pattern = (reader.dimensions, None)
+    else:
+        print(f"Pattern initial choisi : {choice}")
+        cells = None
+        try:
+            if os.path.splitext(choice)[1] in (".rle", ".lif", ".life"):
+                init_pattern = read_pattern(choice)
+            else:
+                init_pattern = dico_patterns[choice]
+        except KeyError:
+            print("No such pattern. Available ones are:", dico_patterns.keys())
+            exit(1)
     print(f"resolution ecran : {resx,resy}")
-    try:
-        init_pattern = dico_patterns[choice]
-    except KeyError:
-        print("No such pattern. Available ones are:", dico_patterns.keys())
-        exit(1)
-    grid = Grille(*init_pattern)
+    grid = Grille(*init_pattern, init_cells=cells)
     appli = App((resx, resy), grid)
+    writer = None
+    if args.save is not None:
+        writer = SnapshotWriter(args.save, grid.dimensions, args.keyframe_interval)
+        writer.write(grid.cells, generation)
+    detector = None
+    if args.on_cycle is not None:
+        detector = CycleDetector(grid.dimensions, args.cycle_history)
+        detector.update(grid.cells, generation)
 
-    mustContinue = True
+    mustContinue = args.generations is None or generation < args.generations
     while mustContinue:
         # time.sleep(0.5) # A régler ou commenter pour vitesse maxi
         t1 = time.time()
         diff = grid.compute_next_iteration()
         t2 = time.time()
+        generation += 1
+        if writer is not None:
+            writer.write(grid.cells, generation)
+        if detector is not None and detector.update(grid.cells, generation) is not None:
+            print(f"\n{detector.report()}")
+            if args.on_cycle == "stop":
+                mustContinue = False
+            elif args.on_cycle == "fast-forward" and args.generations is not None:
+                # L'état à la génération visée est celui de la même phase du cycle
+                for _ in range(detector.steps_to(generation, args.generations)):
+                    grid.compute_next_iteration()
+                generation = args.generations
+                if writer is not None:
+                    writer.write(grid.cells, generation)
+        if args.generations is not None and generation >= args.generations:
+            mustContinue = False
         appli.draw()
         t3 = time.time()
         for event in pg.event.get():
             if event.type == pg.QUIT:
                 mustContinue = False
         print(f"Temps calcul prochaine generation : {t2-t1:2.2e} secondes, temps affichage : {t3-t2:2.2e} secondes\r", end='');
+    if writer is not None:
+        writer.close()
     pg.quit()
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+Simulation d'un ensemble de grilles du jeu de la vie
+####################################################
+Pour faire des statistiques sur des milliers de petites grilles aléatoires, créer un objet Grille et une boucle
+Python par grille coûte plus cher que le calcul lui-même. On stocke donc toutes les grilles dans un seul tableau
+(B, ny, nx) et on avance toute la pile d'une génération avec un seul stencil vectorisé.
+
+Pour chaque grille, on mesure en bloc :
+    - la population (minimum, maximum, moyenne, finale)
+    - l'entrée dans un cycle (empreintes de Zobrist comparées à un historique, voir life_cycles.py) : période et
+      génération de début du cycle. Une grille entrée dans un cycle est retirée de la pile, son avenir étant connu.
+
+Avec MPI, les indices des grilles sont répartis entre les processus par Scatterv. Le contenu initial de chaque grille
+ne dépend que de son indice et de la graine : les résultats ne dépendent pas du nombre de processus.
+
+Exemple :
+    mpiexec -np 4 python game_of_life_ensemble.py --grids 10000 --size 16 16 --generations 2000
+"""
+import numpy as np
+from life_cycles import splitmix64, zobrist_keys
+
+
+class EnsembleGrilles:
+    """
+    Pile de grilles toriques avancées ensemble.
+        - cells est un tableau (B, ny, nx) d'entiers 0/1
+        - indices est l'indice global de chaque grille (conservé dans les résultats)
+        - history est le nombre de générations mémorisées pour la détection des cycles (période maximale détectable)
+    """
+    def __init__(self, cells, indices, history=64):
+        self.cells = np.ascontiguousarray(cells, dtype=np.uint8)
+        nb_grids, ny, nx = self.cells.shape
+        self.dimensions = (ny, nx)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.generation = 0
+        self.history = history
+        self.keys = zobrist_keys(self.dimensions).ravel()
+        # Historique circulaire des empreintes : ligne k = génération self.hist_gen[k]
+        self.hist = np.zeros((history, nb_grids), dtype=np.uint64)
+        self.hist_gen = np.full(history, -1, dtype=np.int64)
+        # Statistiques des grilles encore actives
+        population = self.populations()
+        self.pop_min = population.copy()
+        self.pop_max = population.copy()
+        self.pop_sum = population.astype(np.int64)
+        self._record_fingerprints()
+        # Résultats des grilles terminées : indice, période (0 si pas de cycle), début du cycle,
+        # population finale, min, max, moyenne
+        self.results = []
+
+    @classmethod
+    def random(cls, indices, dimensions, density=0.5, seed=0, history=64):
+        """
+        Grilles aléatoires dont chaque cellule est vivante avec la probabilité density. Le tirage ne dépend que de
+        l'indice global de la grille, de la cellule et de seed.
+        """
+        ny, nx = dimensions
+        indices = np.asarray(indices, dtype=np.int64)
+        cell_ids = indices[:, None]*(ny*nx) + np.arange(ny*nx)
+        threshold = np.uint64(min(int(density * 2**64), 2**64 - 1))
+        cells = (splitmix64(cell_ids, seed) < threshold).astype(np.uint8)
+        return cls(cells.reshape(-1, ny, nx), indices, history)
+
+    def populations(self):
+        return np.count_nonzero(self.cells.reshape(self.cells.shape[0], -1), axis=1)
+
+    def compute_next_iteration(self):
+        """
+        Calcule la génération suivante de toutes les grilles actives (stencil 3x3 sur un tableau avec bords repliés).
+        """
+        c = self.cells
+        padded = np.empty((c.shape[0], c.shape[1]+2, c.shape[2]+2), dtype=np.uint8)
+        padded[:, 1:-1, 1:-1] = c
+        padded[:, 0, 1:-1]  = c[:, -1, :]
+        padded[:, -1, 1:-1] = c[:, 0, :]
+        padded[:, :, 0]  = padded[:, :, -2]
+        padded[:, :, -1] = padded[:, :, 1]
+        nb_neighbors = padded[:, :-2, :-2] + padded[:, :-2, 1:-1]
+        nb_neighbors += padded[:, :-2, 2:]
+        nb_neighbors += padded[:, 1:-1, :-2]
+        nb_neighbors += padded[:, 1:-1, 2:]
+        nb_neighbors += padded[:, 2:, :-2]
+        nb_neighbors += padded[:, 2:, 1:-1]
+        nb_neighbors += padded[:, 2:, 2:]
+        # Naissance avec 3 voisines, survie avec 2 ou 3
+        self.cells = ((nb_neighbors == 3) | ((nb_neighbors == 2) & (c == 1))).astype(np.uint8)
+        self.generation += 1
+
+    def _fingerprints(self):
+        return np.dot(self.cells.reshape(self.cells.shape[0], -1), self.keys)
+
+    def _record_fingerprints(self, fingerprints=None):
+        if fingerprints is None:
+            fingerprints = self._fingerprints()
+        slot = self.generation % self.history
+        self.hist[slot] = fingerprints
+        self.hist_gen[slot] = self.generation
+
+    def step(self):
+        """
+        Avance les grilles actives d'une génération, met à jour les statistiques et retire les grilles entrées
+        dans un cycle. Retourne le nombre de grilles encore actives.
+        """
+        self.compute_next_iteration()
+        population = self.populations()
+        np.minimum(self.pop_min, population, out=self.pop_min)
+        np.maximum(self.pop_max, population, out=self.pop_max)
+        self.pop_sum += population
+        fingerprints = self._fingerprints()
+        valid = self.hist_gen >= 0
+        matches = (self.hist[valid] == fingerprints)
+        cyclic = matches.any(axis=0)
+        if np.any(cyclic):
+            previous = self.hist_gen[valid][np.argmax(matches[:, cyclic], axis=0)]
+            self._retire(cyclic, self.generation - previous, previous, population)
+            fingerprints = fingerprints[~cyclic]
+        self._record_fingerprints(fingerprints)
+        return self.cells.shape[0]
+
+    def _retire(self, mask, periods, starts, population):
+        nb_gen = self.generation + 1
+        self.results.append(np.column_stack((self.indices[mask], periods, starts, population[mask],
+                                             self.pop_min[mask], self.pop_max[mask], self.pop_sum[mask]//nb_gen)))
+        keep = ~mask
+        self.cells   = self.cells[keep]
+        self.indices = self.indices[keep]
+        self.hist    = self.hist[:, keep]
+        self.pop_min = self.pop_min[keep]
+        self.pop_max = self.pop_max[keep]
+        self.pop_sum = self.pop_sum[keep]
+
+    def run(self, generations):
+        """
+        Avance jusqu'à la génération generations ou jusqu'à ce que toutes les grilles soient dans un cycle.
+        Retourne le tableau des résultats (une ligne par grille, voir RESULT_COLUMNS).
+        """
+        while self.generation < generations and self.cells.shape[0] > 0:
+            self.step()
+        if self.cells.shape[0] > 0:
+            nb = self.cells.shape[0]
+            self._retire(np.ones(nb, dtype=bool), np.zeros(nb, dtype=np.int64), np.full(nb, -1, dtype=np.int64),
+                         self.populations())
+        results = np.concatenate(self.results) if self.results else np.empty((0, len(RESULT_COLUMNS)), dtype=np.int64)
+        return results[np.argsort(results[:, 0])].astype(np.int64)
+
+
+RESULT_COLUMNS = ("indice", "periode", "debut_cycle", "population_finale", "population_min", "population_max",
+                  "population_moyenne")
+
+
+if __name__ == '__main__':
+    import argparse
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    nbp = comm.Get_size()
+
+    parser = argparse.ArgumentParser(description="Statistiques sur un ensemble de grilles aléatoires du jeu de la vie")
+    parser.add_argument("--grids", type=int, default=10000, help="nombre total de grilles")
+    parser.add_argument("--size", type=int, nargs=2, default=(16, 16), metavar=("NY", "NX"))
+    parser.add_argument("--generations", type=int, default=2000, help="nombre maximal de générations")
+    parser.add_argument("--density", type=float, default=0.5, help="probabilité qu'une cellule soit vivante au départ")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--history", type=int, default=64, help="période maximale détectable")
+    parser.add_argument("--batch", type=int, default=4096, help="nombre de grilles avancées ensemble par processus")
+    parser.add_argument("--csv", metavar="FICHIER", help="écrit les résultats de chaque grille dans FICHIER")
+    args = parser.parse_args()
+
+    # Répartition des indices de grilles entre les processus
+    counts = np.array([args.grids//nbp + (1 if p < args.grids % nbp else 0) for p in range(nbp)], dtype=np.int64)
+    displs = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    all_indices = np.arange(args.grids, dtype=np.int64) if rank == 0 else None
+    local_indices = np.empty(counts[rank], dtype=np.int64)
+    comm.Scatterv([all_indices, counts, displs, MPI.INT64_T], [local_indices, MPI.INT64_T], root=0)
+
+    comm.Barrier()
+    debut = MPI.Wtime()
+    local_results = []
+    for beg in range(0, local_indices.size, args.batch):
+        ensemble = EnsembleGrilles.random(local_indices[beg:beg+args.batch], tuple(args.size), args.density,
+                                          args.seed, args.history)
+        local_results.append(ensemble.run(args.generations))
+    nb_cols = len(RESULT_COLUMNS)
+    local_results = np.concatenate(local_results) if local_results else np.empty((0, nb_cols), dtype=np.int64)
+    fin = MPI.Wtime()
+
+    results = np.empty((args.grids, nb_cols), dtype=np.int64) if rank == 0 else None
+    comm.Gatherv([np.ascontiguousarray(local_results), MPI.INT64_T],
+                 [results, counts*nb_cols, displs*nb_cols, MPI.INT64_T], root=0)
+    elapsed = comm.reduce(fin - debut, op=MPI.MAX, root=0)
+
+    if rank == 0:
+        periods = results[:, 1]
+        cyclic = periods > 0
+        print(f"{args.grids} grilles {args.size[0]}x{args.size[1]}, {nbp} processus : {elapsed:.3f} secondes "
+              f"({args.grids/elapsed:.0f} grilles/s)")
+        print(f"Grilles entrées dans un cycle avant {args.generations} générations : {np.count_nonzero(cyclic)}")
+        if np.any(cyclic):
+            values, nb = np.unique(periods[cyclic], return_counts=True)
+            print("Périodes : " + ", ".join(f"{v} ({n})" for v, n in zip(values, nb)))
+            print(f"Génération moyenne d'entrée dans le cycle : {results[cyclic, 2].mean():.1f} "
+                  f"(max {results[cyclic, 2].max()})")
+            print(f"Extinctions : {np.count_nonzero(cyclic & (results[:, 3] == 0))}")
+        if args.csv is not None:
+            np.savetxt(args.csv, results, fmt="%d", delimiter=",", header=",".join(RESULT_COLUMNS), comments="")
@@ -4,6 +4,7 @@ from mpi4py import MPI
 import time
 import sys
 import warnings
+import comm_helpers
 
 # 禁用烦人的警告
 warnings.filterwarnings("ignore")
@@ -14,16 +15,22 @@ rank = comm.Get_rank()
 nbp = comm.Get_size()
 
 class Grille:
-    def __init__(self, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white")):
+    def __init__(self, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white"), init_cells=None):
         self.dimensions = dim 
         # 确保行数能被进程数整除 (TD要求)
+        if self.dimensions[0] % nbp != 0:
+            if rank == 0: print(f"Error: ny ({self.dimensions[0]}) must be divisible by nbp ({nbp})")
+            comm.Abort()
         self.local_height = self.dimensions[0] // nbp
         self.width = self.dimensions[1]
         
         # 本地网格：真实数据 + 上下各1行 ghost cells
         self.cells = np.zeros((self.local_height + 2, self.width), dtype=np.uint8)
         
-        if rank == 0:
+        if init_cells is not None:
+            # 每个进程直接提供自己的行 (例如从快照文件读取)，无需分发
+            chunks = None
+        elif rank == 0:
             full_grid = np.zeros(self.dimensions, dtype=np.uint8)
             if init_pattern is not None:
                 indices_i = [v[0] for v in init_pattern]
@@ -32,13 +39,16 @@ class Grille:
             else:
                 full_grid = np.random.randint(2, size=dim, dtype=np.uint8)
             
-            # 切分数据
-            chunks = [full_grid[i*self.local_height:(i+1)*self.local_height, :] for i in range(nbp)]
+            # 每个进程 local_height 行
+            chunks = full_grid
         else:
             chunks = None
 
-        # 使用小写 scatter 确保分发安全
-        self.cells[1:-1, :] = comm.scatter(chunks, root=0)
+        if init_cells is not None:
+            self.cells[1:-1, :] = init_cells
+        else:
+            # Scatterv 直接写入本地网格的有效区域，不经过 pickle
+            comm_helpers.scatter(comm, chunks, root=0, out=self.cells[1:-1, :], counts=[self.local_height]*nbp)
 
         self.col_life = color_life
         self.col_dead = color_dead
@@ -47,12 +57,12 @@ class Grille:
 
     def update_ghost_cells(self):
         if nbp > 1:
-            # 向上交换
+            # 向上发送第一行，同时从下方邻居接收其第一行作为底部 ghost 行
             comm.Sendrecv(sendbuf=self.cells[1, :], dest=self.prev_rank,
-                          recvbuf=self.cells[0, :], source=self.prev_rank)
-            # 向下交换
-            comm.Sendrecv(sendbuf=self.cells[-2, :], dest=self.next_rank,
                           recvbuf=self.cells[-1, :], source=self.next_rank)
+            # 向下发送最后一行，同时从上方邻居接收其最后一行作为顶部 ghost 行
+            comm.Sendrecv(sendbuf=self.cells[-2, :], dest=self.next_rank,
+                          recvbuf=self.cells[0, :], source=self.prev_rank)
         else:
             # 单进程回绕
             self.cells[0, :] = self.cells[-2, :]
@@ -98,11 +108,12 @@ class App:
 
     def draw(self):
         # 汇总数据
-        all_chunks = comm.gather(self.grid.cells[1:-1, :], root=0)
+        # Gatherv 直接写入汇总缓冲区 (不经过 pickle，也不需要 vstack)
+        comm_helpers.gather(comm, self.grid.cells[1:-1, :], root=0,
+                            out=self.full_grid_buffer if rank == 0 else None, counts=[self.grid.local_height]*nbp)
 
         if rank == 0:
             # 1. 填充背景并转换细胞数据
-            self.full_grid_buffer = np.vstack(all_chunks)
             img_array = np.zeros((self.grid.dimensions[1], self.grid.dimensions[0], 3), dtype=np.uint8)
             
             # 翻转数据以匹配原始坐标系（逻辑 (0,0) 在左下）
@@ -155,18 +166,74 @@ if __name__ == '__main__':
         "u" : ((200,200), [(101,101),(102,102),(103,102),(103,101),(104,103),(105,103),(105,102),(105,101),(105,105),(103,105),(102,105),(101,105),(101,104)]),
         "flat" : ((200,400), [(80,200),(81,200),(82,200),(83,200),(84,200),(85,200),(86,200),(87,200), (89,200),(90,200),(91,200),(92,200),(93,200),(97,200),(98,200),(99,200),(106,200),(107,200),(108,200),(109,200),(110,200),(111,200),(112,200),(114,200),(115,200),(116,200),(117,200),(118,200)])
     }
-    choice = 'glider'
-    init_pattern = dico_patterns.get(choice, dico_patterns['glider'])
+    import argparse
+    import os
+    from life_snapshot import SnapshotReader, SnapshotWriter, read_pattern
+    from life_cycles import CycleDetector
+
+    parser = argparse.ArgumentParser(description="Jeu de la vie (MPI)")
+    parser.add_argument("choice", nargs="?", default="glider",
+                        help="nom d'un motif prédéfini ou fichier de motif (.rle, .lif, .life)")
+    parser.add_argument("--save", metavar="FICHIER", help="enregistre la simulation dans FICHIER (.gol) par MPI-IO")
+    parser.add_argument("--keyframe-interval", type=int, default=32,
+                        help="nombre de générations enregistrées entre deux images clés")
+    parser.add_argument("--resume", metavar="FICHIER", help="reprend la simulation à la dernière image clé de FICHIER")
+    parser.add_argument("--generations", type=int, help="arrête la simulation à cette génération")
+    parser.add_argument("--on-cycle", choices=("report", "stop", "fast-forward"),
+                        help="détecte les cycles (configurations stables, oscillateurs) : les signale, arrête la simulation, "
+                             "ou saute directement à la génération --generations")
+    parser.add_argument("--cycle-history", type=int, default=64, help="période maximale détectable")
+    args = parser.parse_args()
+
+    generation = 0
+    cells = None
+    if args.resume is not None:
+        # 每个进程用 MPI-IO 直接读取自己的行
+        reader = SnapshotReader(args.resume)
+        local_height = reader.dimensions[0] // nbp
+        generation, cells = reader.load_rows(rank*local_height, local_height, comm=comm)
+        init_pattern = (reader.dimensions, None)
+    elif os.path.splitext(args.choice)[1] in (".rle", ".lif", ".life"):
+        init_pattern = read_pattern(args.choice)
+    else:
+        init_pattern = dico_patterns.get(args.choice, dico_patterns['glider'])
     
-    grid = Grille(*init_pattern)
+    grid = Grille(*init_pattern, init_cells=cells)
     appli = App((800, 800), grid)
+    writer = None
+    if args.save is not None:
+        writer = SnapshotWriter(args.save, grid.dimensions, args.keyframe_interval, comm=comm)
+        writer.write(grid.cells[1:-1, :], generation)
+    detector = None
+    if args.on_cycle is not None:
+        # 每个进程只计算自己行的指纹，再用一次 Allreduce 合并
+        detector = CycleDetector(grid.dimensions, args.cycle_history, comm=comm,
+                                 row_start=rank*grid.local_height, nb_rows=grid.local_height)
+        detector.update(grid.cells[1:-1, :], generation)
 
-    mustContinue = True
+    mustContinue = args.generations is None or generation < args.generations
     while mustContinue:
         # 1. 计算
         t1 = time.time()
         grid.compute_next_iteration()
         t2 = time.time()
+        generation += 1
+        if writer is not None:
+            writer.write(grid.cells[1:-1, :], generation)
+        # 所有进程得到相同的指纹，因此停止的决定是一致的
+        stop = args.generations is not None and generation >= args.generations
+        if detector is not None and detector.update(grid.cells[1:-1, :], generation) is not None:
+            if rank == 0: print(f"\n{detector.report()}")
+            if args.on_cycle == "stop":
+                stop = True
+            elif args.on_cycle == "fast-forward" and args.generations is not None:
+                # 目标代的状态与周期中相同相位的状态一致
+                for _ in range(detector.steps_to(generation, args.generations)):
+                    grid.compute_next_iteration()
+                generation = args.generations
+                if writer is not None:
+                    writer.write(grid.cells[1:-1, :], generation)
+                stop = True
         # 2. 汇总并显示
         appli.draw()
         t3 = time.time()
@@ -181,6 +248,9 @@ if __name__ == '__main__':
             mustContinue = comm.bcast(mustContinue, root=0)
         else:
             mustContinue = comm.bcast(None, root=0)
+        mustContinue = mustContinue and not stop
 
+    if writer is not None:
+        writer.close()
     if rank == 0: pg.quit()
     MPI.Finalize()
\ No newline at end of file
@@ -5,6 +5,7 @@ from scipy.signal import convolve2d
 import time
 import sys
 import warnings
+import comm_helpers
 
 # 禁用警告
 warnings.filterwarnings("ignore")
@@ -15,7 +16,7 @@ rank = comm.Get_rank()
 nbp = comm.Get_size()
 
 class Grille:
-    def __init__(self, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white")):
+    def __init__(self, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white"), init_cells=None):
         self.dimensions = dim  # 全局维度 (ny, nx)
         self.ny, self.nx = dim
         
@@ -30,8 +31,10 @@ class Grille:
         # 形状为 (local_ny + 2, nx)
         self.cells = np.zeros((self.local_ny + 2, self.nx), dtype=np.uint8)
         
-        # Rank 0 初始化全局数据并分发
-        if rank == 0:
+        # Rank 0 初始化全局数据并分发 (若每个进程已提供自己的行，例如从快照文件读取，则无需分发)
+        if init_cells is not None:
+            chunks = None
+        elif rank == 0:
             full_grid = np.zeros(self.dimensions, dtype=np.uint8)
             if init_pattern is not None:
                 indices_i = [v[0] for v in init_pattern]
@@ -40,12 +43,15 @@ class Grille:
             else:
                 full_grid = np.random.randint(2, size=dim, dtype=np.uint8)
             
-            chunks = np.array_split(full_grid, nbp, axis=0)
+            chunks = full_grid
         else:
             chunks = None
 
-        # 分发数据到本地有效区域 [1:-1]
-        self.cells[1:-1, :] = comm.scatter(chunks, root=0)
+        # 分发数据到本地有效区域 [1:-1] (Scatterv 直接写入，不经过 pickle)
+        if init_cells is not None:
+            self.cells[1:-1, :] = init_cells
+        else:
+            comm_helpers.scatter(comm, chunks, root=0, out=self.cells[1:-1, :], counts=[self.local_ny]*nbp)
 
         self.col_life = color_life
         self.col_dead = color_dead
@@ -65,11 +71,11 @@ class Grille:
     def update_ghost_cells(self):
         if nbp > 1:
             # 垂直方向：进程间交换边界行
-            # 向上发送 [1] 接收到 [0]；向下发送 [-2] 接收到 [-1]
+            # 向上发送 [1]，从下方邻居接收到 [-1]；向下发送 [-2]，从上方邻居接收到 [0]
             comm.Sendrecv(sendbuf=self.cells[1, :], dest=self.top_neighbor,
-                        recvbuf=self.cells[0, :], source=self.top_neighbor)
-            comm.Sendrecv(sendbuf=self.cells[-2, :], dest=self.bottom_neighbor,
                         recvbuf=self.cells[-1, :], source=self.bottom_neighbor)
+            comm.Sendrecv(sendbuf=self.cells[-2, :], dest=self.bottom_neighbor,
+                        recvbuf=self.cells[0, :], source=self.top_neighbor)
         else:
             # 单进程回绕
             self.cells[0, :] = self.cells[-2, :]
@@ -124,10 +130,11 @@ class App:
 
     def draw(self):
         # 汇总各进程计算的 [1:-1] 区域
-        all_chunks = comm.gather(self.grid.cells[1:-1, :], root=0)
+        # Gatherv 直接写入汇总缓冲区 (不经过 pickle，也不需要 vstack)
+        comm_helpers.gather(comm, self.grid.cells[1:-1, :], root=0,
+                            out=self.full_grid_buffer if rank == 0 else None, counts=[self.grid.local_ny]*nbp)
 
         if rank == 0:
-            self.full_grid_buffer = np.vstack(all_chunks)
             
             # 高效渲染
             img_array = np.zeros((self.grid.nx, self.grid.ny, 3), dtype=np.uint8)
@@ -183,18 +190,74 @@ if __name__ == '__main__':
         "flat" : ((200,400), [(80,200),(81,200),(82,200),(83,200),(84,200),(85,200),(86,200),(87,200), (89,200),(90,200),(91,200),(92,200),(93,200),(97,200),(98,200),(99,200),(106,200),(107,200),(108,200),(109,200),(110,200),(111,200),(112,200),(114,200),(115,200),(116,200),(117,200),(118,200)])
     }
     
-    choice = sys.argv[1] if len(sys.argv) > 1 else 'glider'
-    init_pattern = dico_patterns.get(choice, dico_patterns['glider'])
+    import argparse
+    import os
+    from life_snapshot import SnapshotReader, SnapshotWriter, read_pattern
+    from life_cycles import CycleDetector
+
+    parser = argparse.ArgumentParser(description="Jeu de la vie vectorisé (MPI)")
+    parser.add_argument("choice", nargs="?", default="glider",
+                        help="nom d'un motif prédéfini ou fichier de motif (.rle, .lif, .life)")
+    parser.add_argument("--save", metavar="FICHIER", help="enregistre la simulation dans FICHIER (.gol) par MPI-IO")
+    parser.add_argument("--keyframe-interval", type=int, default=32,
+                        help="nombre de générations enregistrées entre deux images clés")
+    parser.add_argument("--resume", metavar="FICHIER", help="reprend la simulation à la dernière image clé de FICHIER")
+    parser.add_argument("--generations", type=int, help="arrête la simulation à cette génération")
+    parser.add_argument("--on-cycle", choices=("report", "stop", "fast-forward"),
+                        help="détecte les cycles (configurations stables, oscillateurs) : les signale, arrête la simulation, "
+                             "ou saute directement à la génération --generations")
+    parser.add_argument("--cycle-history", type=int, default=64, help="période maximale détectable")
+    args = parser.parse_args()
+
+    generation = 0
+    cells = None
+    if args.resume is not None:
+        # 每个进程用 MPI-IO 直接读取自己的行
+        reader = SnapshotReader(args.resume)
+        local_ny = reader.dimensions[0] // nbp
+        generation, cells = reader.load_rows(rank*local_ny, local_ny, comm=comm)
+        init_pattern = (reader.dimensions, None)
+    elif os.path.splitext(args.choice)[1] in (".rle", ".lif", ".life"):
+        init_pattern = read_pattern(args.choice)
+    else:
+        init_pattern = dico_patterns.get(args.choice, dico_patterns['glider'])
     
-    grid = Grille(*init_pattern)
+    grid = Grille(*init_pattern, init_cells=cells)
     appli = App((800, 800), grid)
+    writer = None
+    if args.save is not None:
+        writer = SnapshotWriter(args.save, grid.dimensions, args.keyframe_interval, comm=comm)
+        writer.write(grid.cells[1:-1, :], generation)
+    detector = None
+    if args.on_cycle is not None:
+        # 每个进程只计算自己行的指纹，再用一次 Allreduce 合并
+        detector = CycleDetector(grid.dimensions, args.cycle_history, comm=comm,
+                                 row_start=rank*grid.local_ny, nb_rows=grid.local_ny)
+        detector.update(grid.cells[1:-1, :], generation)
 
-    mustContinue = True
+    mustContinue = args.generations is None or generation < args.generations
     while mustContinue:
         # 1. 计算
         t1 = time.time()
         grid.compute_next_iteration()
         t2 = time.time()
+        generation += 1
+        if writer is not None:
+            writer.write(grid.cells[1:-1, :], generation)
+        # 所有进程得到相同的指纹，因此停止的决定是一致的
+        stop = args.generations is not None and generation >= args.generations
+        if detector is not None and detector.update(grid.cells[1:-1, :], generation) is not None:
+            if rank == 0: print(f"\n{detector.report()}")
+            if args.on_cycle == "stop":
+                stop = True
+            elif args.on_cycle == "fast-forward" and args.generations is not None:
+                # 目标代的状态与周期中相同相位的状态一致
+                for _ in range(detector.steps_to(generation, args.generations)):
+                    grid.compute_next_iteration()
+                generation = args.generations
+                if writer is not None:
+                    writer.write(grid.cells[1:-1, :], generation)
+                stop = True
         # 2. 汇总并显示
         appli.draw()
         t3 = time.time()
@@ -207,6 +270,9 @@ if __name__ == '__main__':
             print(f"Temps calcul prochaine generation : {t2-t1:2.2e} secondes, temps affichage : {t3-t2:2.2e} secondes\r", end='');
         else:
             mustContinue = comm.bcast(None, root=0)
+        mustContinue = mustContinue and not stop
 
+    if writer is not None:
+        writer.close()
     if rank == 0: pg.quit()
     MPI.Finalize()
\ No newline at end of file
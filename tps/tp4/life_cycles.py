@@ -0,0 +1,109 @@
+"""
+Détection des cycles et des configurations stables du jeu de la vie
+###################################################################
+Sur un tore fini, toute simulation finit par entrer dans un cycle : configuration stable (période 1,
+y compris l'extinction), oscillateur de période 2 (blinker, toad, beacon), de période 3 (pulsar), etc.
+Pour le détecter sans stocker les grilles, on calcule à chaque génération une empreinte de Zobrist :
+chaque cellule (i,j) de la grille globale reçoit une clé aléatoire de 64 bits et l'empreinte est la somme
+(modulo 2^64) des clés des cellules vivantes. La somme est associative : chaque processus MPI calcule
+l'empreinte de ses lignes et un seul Allreduce donne l'empreinte globale (avec la population).
+Une empreinte déjà vue p générations plus tôt signale un cycle de période p.
+"""
+import numpy as np
+
+
+def splitmix64(indices, seed=0x5EED):
+    """
+    Mélangeur splitmix64 : associe à chaque entier de indices un entier pseudo-aléatoire de 64 bits
+    qui ne dépend que de cet entier et de seed.
+    """
+    z = np.array(indices, dtype=np.uint64)
+    z += np.uint64((seed * 0x9E3779B97F4A7C15) % 2**64)
+    z ^= z >> np.uint64(30)
+    z *= np.uint64(0xBF58476D1CE4E5B9)
+    z ^= z >> np.uint64(27)
+    z *= np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return z
+
+
+def zobrist_keys(dimensions, row_start=0, nb_rows=None, seed=0x5EED):
+    """
+    Clés de Zobrist des lignes [row_start, row_start+nb_rows[ d'une grille globale de dimensions (ny, nx).
+    Chaque clé ne dépend que de l'indice global de la cellule : l'empreinte d'une grille
+    est donc indépendante de son découpage entre processus.
+    """
+    ny, nx = dimensions
+    if nb_rows is None:
+        nb_rows = ny - row_start
+    return splitmix64(np.arange(row_start*nx, (row_start+nb_rows)*nx, dtype=np.uint64), seed).reshape(nb_rows, nx)
+
+
+class CycleDetector:
+    """
+    Garde les empreintes des history dernières générations et détecte l'entrée dans un cycle.
+        - dimensions est le tuple (ny, nx) de la grille globale
+        - history est le nombre de générations mémorisées (période maximale détectable)
+        - comm est un communicateur MPI (None en séquentiel) ; row_start et nb_rows donnent alors
+          les lignes globales possédées par le processus. update est collective sur comm.
+    Après détection, period contient la période et cycle_start la première génération du cycle.
+    populations contient la population de chaque génération passée à update.
+    """
+    def __init__(self, dimensions, history=64, comm=None, row_start=0, nb_rows=None):
+        self.keys = zobrist_keys(dimensions, row_start, nb_rows)
+        self.history = history
+        self.comm = comm
+        self.seen = {}
+        self.generations = []
+        self.populations = []
+        self.period = None
+        self.cycle_start = None
+        self.detected_at = None
+        self._local = np.empty(2, dtype=np.uint64)
+
+    def update(self, cells, generation):
+        """
+        Enregistre la génération generation (cells : lignes locales sans cellules fantômes).
+        Retourne la période si un cycle vient d'être détecté, None sinon.
+        """
+        alive = cells != 0
+        self._local[0] = self.keys[alive].sum(dtype=np.uint64)
+        self._local[1] = np.count_nonzero(alive)
+        if self.comm is not None:
+            from mpi4py import MPI
+            self.comm.Allreduce(MPI.IN_PLACE, self._local, op=MPI.SUM)
+        fingerprint = int(self._local[0])
+        self.populations.append(int(self._local[1]))
+        if self.period is not None:
+            return None
+        previous = self.seen.get(fingerprint)
+        if previous is not None:
+            self.period = generation - previous
+            self.cycle_start = previous
+            self.detected_at = generation
+            return self.period
+        self.seen[fingerprint] = generation
+        self.generations.append(fingerprint)
+        if len(self.generations) > self.history:
+            del self.seen[self.generations.pop(0)]
+        return None
+
+    def steps_to(self, generation, target):
+        """
+        Une fois le cycle détecté, nombre de générations qu'il reste réellement à calculer depuis generation
+        pour obtenir l'état de la génération target (avance rapide).
+        """
+        return (target - generation) % self.period
+
+    def report(self):
+        if self.period is None:
+            return "Aucun cycle détecté"
+        population = self.populations[-1]
+        if population == 0:
+            kind = "extinction"
+        elif self.period == 1:
+            kind = "configuration stable"
+        else:
+            kind = f"oscillation de période {self.period}"
+        return (f"Cycle détecté à la génération {self.detected_at} ({kind}, début à la génération {self.cycle_start}), "
+                f"population {population} (min {min(self.populations)}, max {max(self.populations)})")
@@ -0,0 +1,344 @@
+"""
+Sauvegarde et relecture d'une simulation du jeu de la vie
+#########################################################
+Format binaire compact d'un fichier de simulation (extension conseillée : .gol) :
+
+    - un en-tête de fichier : signature, dimensions (ny, nx), intervalle entre deux images clés
+    - une suite d'enregistrements, chacun composé d'un en-tête (type, génération, taille des données)
+      suivi des données :
+        * image clé ('K') : la grille complète, compressée à un bit par cellule (np.packbits ligne par ligne)
+        * delta ('D')     : le XOR entre la grille compressée et la précédente, codé par plages (RLE)
+
+Le codage RLE est une suite de jetons (nombre d'octets nuls, nombre d'octets littéraux, octets littéraux).
+La concaténation de deux flux RLE valides est encore un flux valide : chaque processus MPI peut donc coder
+les lignes qu'il possède et écrire son morceau directement à sa place dans le fichier avec
+MPI.File.Write_at_all, sans rassembler la grille sur le processus 0.
+
+Le module sait aussi lire les fichiers de motifs classiques (RLE et Life 1.06) et reprendre une simulation
+à partir d'une image clé. Lancé comme un script, il rejoue un fichier de simulation hors ligne :
+    python life_snapshot.py simulation.gol
+"""
+import os
+import re
+import struct
+import numpy as np
+
+MAGIC = b"GOLSNAP1"
+# Signature, ny, nx, intervalle entre images clés
+_HEADER = struct.Struct("<8sqqq")
+# Type d'enregistrement, génération, taille des données en octets
+_RECORD = struct.Struct("<c7xqq")
+KEYFRAME = b"K"
+DELTA    = b"D"
+# Nombre d'octets nuls en dessous duquel on préfère prolonger une plage littérale plutôt que d'ouvrir un jeton
+_MIN_GAP = 8
+
+
+def rle_encode(data):
+    """
+    Code le tableau d'octets data (uint8, une dimension) en jetons (zéros, littéraux) sur deux entiers
+    de 32 bits suivis des octets littéraux. Le codage est entièrement vectoriel.
+    """
+    n = data.size
+    nz = np.flatnonzero(data)
+    if nz.size > 0:
+        breaks = np.flatnonzero(np.diff(nz) > _MIN_GAP)
+        starts = np.concatenate(([nz[0]], nz[breaks+1]))
+        ends   = np.concatenate((nz[breaks]+1, [nz[-1]+1]))
+    else:
+        starts = np.empty(0, dtype=np.int64)
+        ends   = np.empty(0, dtype=np.int64)
+    zeros = starts - np.concatenate(([0], ends[:-1]))
+    lits  = ends - starts
+    tail  = n - (ends[-1] if ends.size > 0 else 0)
+    if tail > 0:
+        zeros = np.append(zeros, tail)
+        lits  = np.append(lits, 0)
+    nb_tokens = zeros.size
+    heads = np.empty((nb_tokens, 2), dtype="<u4")
+    heads[:, 0] = zeros
+    heads[:, 1] = lits
+    out = np.empty(8*nb_tokens + lits.sum(), dtype=np.uint8)
+    token_offsets = 8*np.arange(nb_tokens) + np.concatenate(([0], np.cumsum(lits)[:-1]))
+    is_head = np.zeros(out.size, dtype=bool)
+    head_indices = (token_offsets[:, None] + np.arange(8)).ravel()
+    is_head[head_indices] = True
+    out[head_indices] = heads.view(np.uint8).ravel()
+    # Marque les octets littéraux de data par une somme cumulée de +1 (début de plage) et -1 (fin de plage)
+    marks = np.zeros(n+1, dtype=np.int64)
+    np.add.at(marks, starts, 1)
+    np.add.at(marks, ends, -1)
+    in_literal = np.cumsum(marks[:-1]) > 0
+    out[~is_head] = data[in_literal]
+    return out
+
+
+def rle_apply_xor(encoded, target):
+    """
+    Décode le flux RLE encoded et applique le résultat par XOR sur le tableau d'octets target (en place).
+    """
+    pos = 0
+    dst = 0
+    encoded = memoryview(encoded)
+    while pos < len(encoded):
+        zeros, lits = struct.unpack_from("<II", encoded, pos)
+        pos += 8
+        dst += zeros
+        if lits > 0:
+            target[dst:dst+lits] ^= np.frombuffer(encoded[pos:pos+lits], dtype=np.uint8)
+            pos += lits
+            dst += lits
+    return target
+
+
+class SnapshotWriter:
+    """
+    Écrit une simulation dans un fichier au format décrit plus haut.
+        - filename est le nom du fichier (écrasé s'il existe)
+        - dimensions est le tuple (ny, nx) de la grille globale
+        - keyframe_interval est le nombre de générations enregistrées entre deux images clés
+        - comm est un communicateur MPI (None en séquentiel). Chaque processus possède alors un bloc de
+          lignes contiguës, les blocs étant rangés dans l'ordre des rangs.
+    Toutes les méthodes sont collectives sur comm.
+    """
+    def __init__(self, filename, dimensions, keyframe_interval=32, comm=None):
+        self.dimensions = dimensions
+        self.keyframe_interval = keyframe_interval
+        self.comm = comm
+        self.nb_frames = 0
+        self.previous = None
+        header = _HEADER.pack(MAGIC, dimensions[0], dimensions[1], keyframe_interval)
+        if comm is None:
+            self.file = open(filename, "wb")
+            self.file.write(header)
+        else:
+            from mpi4py import MPI
+            self.file = MPI.File.Open(comm, filename, MPI.MODE_WRONLY | MPI.MODE_CREATE)
+            self.file.Set_size(0)
+            self.file.Write_at_all(0, header if comm.rank == 0 else b"")
+        self.offset = _HEADER.size
+
+    def write(self, cells, generation):
+        """
+        Enregistre la génération generation. cells contient les lignes locales de la grille
+        (toute la grille en séquentiel), sans les cellules fantômes.
+        """
+        packed = np.packbits(np.asarray(cells, dtype=np.uint8), axis=1)
+        if self.nb_frames % self.keyframe_interval == 0:
+            kind = KEYFRAME
+            payload = packed.ravel()
+        else:
+            kind = DELTA
+            payload = rle_encode(np.bitwise_xor(packed, self.previous).ravel())
+        self.previous = packed
+        self.nb_frames += 1
+
+        if self.comm is None:
+            self.file.write(_RECORD.pack(kind, generation, payload.size))
+            self.file.write(payload.tobytes())
+            self.offset += _RECORD.size + payload.size
+            return
+        # Chaque processus écrit son morceau à l'emplacement déduit des tailles des morceaux précédents
+        sizes = self.comm.allgather(payload.size)
+        rank = self.comm.rank
+        local_offset = self.offset + _RECORD.size + sum(sizes[:rank])
+        if rank == 0:
+            buffer = _RECORD.pack(kind, generation, sum(sizes)) + payload.tobytes()
+            local_offset = self.offset
+        else:
+            buffer = payload
+        self.file.Write_at_all(local_offset, buffer)
+        self.offset += _RECORD.size + sum(sizes)
+
+    def close(self):
+        if self.comm is None:
+            self.file.close()
+        else:
+            self.file.Close()
+
+
+class SnapshotReader:
+    """
+    Lit un fichier de simulation. La lecture des en-têtes d'enregistrements est faite à l'ouverture
+    (les données ne sont lues qu'à la demande).
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            magic, ny, nx, self.keyframe_interval = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{filename} n'est pas un fichier de simulation du jeu de la vie")
+            self.dimensions = (ny, nx)
+            self.row_bytes = (nx + 7)//8
+            # Index des enregistrements : (type, génération, position des données, taille des données)
+            self.records = []
+            offset = _HEADER.size
+            file_size = os.fstat(f.fileno()).st_size
+            while offset + _RECORD.size <= file_size:
+                f.seek(offset)
+                kind, generation, size = _RECORD.unpack(f.read(_RECORD.size))
+                if offset + _RECORD.size + size > file_size:
+                    break # Dernier enregistrement incomplet (simulation interrompue pendant l'écriture)
+                self.records.append((kind, generation, offset + _RECORD.size, size))
+                offset += _RECORD.size + size
+
+    @property
+    def keyframes(self):
+        """ Liste des générations enregistrées comme images clés """
+        return [r[1] for r in self.records if r[0] == KEYFRAME]
+
+    def _unpack(self, packed):
+        return np.unpackbits(packed.reshape(-1, self.row_bytes), axis=1, count=self.dimensions[1])
+
+    def frames(self, start=0):
+        """
+        Itère sur les couples (génération, grille) enregistrés, à partir de l'enregistrement numéro start
+        (qui doit être une image clé).
+        """
+        packed = None
+        with open(self.filename, "rb") as f:
+            for kind, generation, offset, size in self.records[start:]:
+                f.seek(offset)
+                payload = np.frombuffer(f.read(size), dtype=np.uint8)
+                if kind == KEYFRAME:
+                    packed = payload.copy()
+                elif packed is None:
+                    raise ValueError("La relecture doit commencer par une image clé")
+                else:
+                    rle_apply_xor(payload, packed)
+                yield generation, self._unpack(packed)
+
+    def load(self, generation=None):
+        """
+        Retourne (génération, grille) pour la génération demandée (la dernière enregistrée par défaut).
+        La grille est reconstruite depuis l'image clé précédente en rejouant les deltas.
+        """
+        if generation is None:
+            generation = self.records[-1][1]
+        start = None
+        for i, (kind, gen, _, _) in enumerate(self.records):
+            if kind == KEYFRAME and gen <= generation:
+                start = i
+        if start is None:
+            raise ValueError(f"Aucune image clé avant la génération {generation}")
+        result = None
+        for gen, cells in self.frames(start):
+            if gen > generation:
+                break
+            result = (gen, cells)
+        return result
+
+    def keyframe_before(self, generation=None):
+        """ Retourne l'enregistrement de la dernière image clé de génération inférieure ou égale à generation """
+        keys = [r for r in self.records if r[0] == KEYFRAME and (generation is None or r[1] <= generation)]
+        if len(keys) == 0:
+            raise ValueError(f"Aucune image clé avant la génération {generation}")
+        return keys[-1]
+
+    def load_rows(self, row_start, nb_rows, generation=None, comm=None):
+        """
+        Reprise à partir d'une image clé : retourne (génération, lignes [row_start, row_start+nb_rows[ de la grille)
+        pour la dernière image clé de génération inférieure ou égale à generation.
+        Avec un communicateur MPI, chaque processus lit directement ses lignes par MPI.File.Read_at_all.
+        """
+        _, gen, offset, _ = self.keyframe_before(generation)
+        packed = np.empty((nb_rows, self.row_bytes), dtype=np.uint8)
+        offset += row_start*self.row_bytes
+        if comm is None:
+            with open(self.filename, "rb") as f:
+                f.seek(offset)
+                packed[:] = np.frombuffer(f.read(packed.nbytes), dtype=np.uint8).reshape(packed.shape)
+        else:
+            from mpi4py import MPI
+            fh = MPI.File.Open(comm, self.filename, MPI.MODE_RDONLY)
+            fh.Read_at_all(offset, packed)
+            fh.Close()
+        return gen, np.unpackbits(packed, axis=1, count=self.dimensions[1])
+
+
+def read_pattern(filename, dimensions=None, margin=10):
+    """
+    Lit un fichier de motif au format RLE (.rle) ou Life 1.06 (.lif, .life) et retourne un tuple
+    (dimensions, liste des cellules vivantes) utilisable tel quel par Grille (comme les entrées de dico_patterns).
+    Si dimensions n'est pas donné, la grille est la boîte englobante du motif augmentée de margin cellules
+    de chaque côté. Le motif est centré, la première ligne du fichier étant affichée en haut de la fenêtre.
+    """
+    with open(filename) as f:
+        text = f.read()
+    if text.lstrip().startswith("#Life 1.06"):
+        coords = [tuple(int(v) for v in line.split()) for line in text.splitlines()
+                  if line.strip() and not line.startswith("#")]
+        cols = np.array([c[0] for c in coords], dtype=np.int64)
+        rows = np.array([c[1] for c in coords], dtype=np.int64)
+    else:
+        rows, cols = _parse_rle(text)
+    if rows.size > 0:
+        rows -= rows.min()
+        cols -= cols.min()
+    height = int(rows.max()) + 1 if rows.size > 0 else 0
+    width  = int(cols.max()) + 1 if cols.size > 0 else 0
+    if dimensions is None:
+        dimensions = (height + 2*margin, width + 2*margin)
+    if height > dimensions[0] or width > dimensions[1]:
+        raise ValueError(f"Le motif ({height}x{width}) ne tient pas dans une grille {dimensions}")
+    shift_i = (dimensions[0] - height)//2
+    shift_j = (dimensions[1] - width)//2
+    # L'indice de ligne 0 est affiché en bas de la fenêtre : on retourne le motif verticalement
+    pattern = [(int(shift_i + height - 1 - i), int(shift_j + j)) for i, j in zip(rows, cols)]
+    return dimensions, pattern
+
+
+def _parse_rle(text):
+    body = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#") or line.startswith("x") or not line:
+            continue
+        body.append(line)
+    rows = []
+    cols = []
+    i = j = 0
+    for count, tag in re.findall(r"(\d*)([a-zA-Z$!])", "".join(body)):
+        count = int(count) if count else 1
+        if tag == "!":
+            break
+        if tag == "$":
+            i += count
+            j = 0
+        elif tag == "b" or tag == ".":
+            j += count
+        else:
+            rows.extend([i]*count)
+            cols.extend(range(j, j+count))
+            j += count
+    return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    import pygame as pg
+
+    if len(sys.argv) < 2:
+        print(f"Usage : python {sys.argv[0]} simulation.gol [délai entre images en secondes]")
+        exit(1)
+    reader = SnapshotReader(sys.argv[1])
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.
+    ny, nx = reader.dimensions
+    print(f"Grille {ny}x{nx}, {len(reader.records)} générations enregistrées, images clés : {reader.keyframes}")
+    pg.init()
+    screen = pg.display.set_mode((800, 800))
+    surface = pg.Surface((nx, ny))
+    col_life = np.array(pg.Color("black")[:3], dtype=np.uint8)
+    col_dead = np.array(pg.Color("white")[:3], dtype=np.uint8)
+    for generation, cells in reader.frames():
+        # Même convention que l'affichage de la simulation : la ligne 0 est en bas
+        data = np.flip(cells, axis=0).T
+        pg.surfarray.blit_array(surface, np.where(data[:, :, None] == 1, col_life, col_dead))
+        screen.blit(pg.transform.scale(surface, screen.get_size()), (0, 0))
+        pg.display.set_caption(f"Génération {generation}")
+        pg.display.flip()
+        if any(event.type == pg.QUIT for event in pg.event.get()):
+            break
+        time.sleep(delay)
+    pg.quit()